@@ -0,0 +1,206 @@
+"""Benchmark: meeting signaling latency across several daphne workers.
+
+Starts ``--workers`` daphne processes serving ``benchmarks.signaling_app``,
+all sharing one Redis channel layer (a local fakeredis server unless
+``--redis`` is given), and connects ``--clients`` simulated participants to
+one meeting, spread round-robin over the workers as a non-sticky load
+balancer would. Once everyone has joined, each client sends ``--candidates``
+ICE candidates to random peers. Every candidate carries its send time, so the
+receiving client measures end-to-end latency through the worker(s) and Redis.
+The fakeredis stand-in is pure Python and much slower than Redis: it shows the
+multi-worker setup works, while latency figures need ``--redis`` and a real
+server.
+
+Usage (from the project root; needs ``pip install websockets`` and requirements-dev.txt):
+    python benchmarks/bench_meeting_signaling.py --workers 3 --clients 60
+    python benchmarks/bench_meeting_signaling.py --workers 1 --memory   # in-memory baseline
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import websockets
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"worker on port {port} did not start")
+
+
+def start_workers(count, redis_url):
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    env.pop('REDIS_URL', None)
+    if redis_url:
+        env['REDIS_URL'] = redis_url
+    workers = []
+    for _ in range(count):
+        port = free_port()
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'daphne', '-b', '127.0.0.1', '-p', str(port),
+             'benchmarks.signaling_app:application'],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        workers.append((port, process))
+    for port, _ in workers:
+        wait_for_port(port)
+    return workers
+
+
+class Client:
+    def __init__(self, user_id, port, meeting):
+        self.user_id = user_id
+        self.url = f'ws://127.0.0.1:{port}/ws/meeting/{meeting}/?uid={user_id}'
+        self.latencies = []
+        self.joined = set()
+        self.socket = None
+        self.reader = None
+
+    async def connect(self):
+        self.socket = await websockets.connect(self.url, max_queue=None)
+        self.reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        try:
+            async for text in self.socket:
+                received = time.perf_counter()
+                message = json.loads(text)
+                if message['type'] == 'user_joined':
+                    self.joined.add(message['user_id'])
+                elif message['type'] == 'ice_candidates':
+                    self.latencies.extend(received - candidate['sent'] for candidate in message['candidates'])
+        except websockets.ConnectionClosed:
+            pass
+
+    async def send_candidates(self, peers, count, interval):
+        for _ in range(count):
+            await self.socket.send(json.dumps({
+                'type': 'ice_candidate',
+                'to_user_id': random.choice(peers),
+                'candidate': {'candidate': 'candidate:1 1 udp 2122260223 10.0.0.1 5000 typ host',
+                              'sent': time.perf_counter()},
+            }))
+            await asyncio.sleep(interval)
+
+    async def close(self):
+        await self.socket.close()
+        await self.reader
+
+
+async def run(ports, args):
+    clients = [Client(user_id, ports[user_id % len(ports)], 'bench')
+               for user_id in range(1, args.clients + 1)]
+
+    started = time.perf_counter()
+    for index in range(0, len(clients), args.join_batch):
+        await asyncio.gather(*(client.connect() for client in clients[index:index + args.join_batch]))
+    # Everyone has seen every later joiner once the last one's broadcast arrived
+    last = clients[-1].user_id
+    while not all(last in client.joined for client in clients[:-1]):
+        await asyncio.sleep(0.01)
+        if time.perf_counter() - started > args.timeout:
+            break
+    join_seconds = time.perf_counter() - started
+    await asyncio.sleep(0.5)
+
+    user_ids = [client.user_id for client in clients]
+    expected = args.clients * args.candidates
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        client.send_candidates([uid for uid in user_ids if uid != client.user_id],
+                               args.candidates, args.interval)
+        for client in clients
+    ))
+    while sum(len(client.latencies) for client in clients) < expected:
+        await asyncio.sleep(0.01)
+        if time.perf_counter() - started > args.timeout:
+            break
+    send_seconds = time.perf_counter() - started
+
+    for client in clients:
+        await client.close()
+    latencies = sorted(latency for client in clients for latency in client.latencies)
+    return join_seconds, send_seconds, expected, latencies
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--clients', type=int, default=60)
+    parser.add_argument('--candidates', type=int, default=20, help='ICE candidates sent per client')
+    parser.add_argument('--interval', type=float, default=0.01, help='seconds between one client\'s candidates')
+    parser.add_argument('--join-batch', type=int, default=10, help='clients connecting at once')
+    parser.add_argument('--redis', help='Redis URL (default: a local fakeredis server)')
+    parser.add_argument('--memory', action='store_true', help='in-memory layer (only valid with one worker)')
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    if args.memory and args.workers != 1:
+        sys.exit("The in-memory layer cannot span workers; use --workers 1")
+
+    fake = None
+    redis_url = None
+    if not args.memory:
+        redis_url = args.redis
+        if redis_url is None:
+            # Its own process, so the stand-in and the measuring clients do not
+            # share one GIL
+            port = free_port()
+            fake = subprocess.Popen([sys.executable, str(ROOT / 'benchmarks' / 'fake_redis.py'), '--port', str(port)],
+                                    stdout=subprocess.DEVNULL)
+            wait_for_port(port)
+            redis_url = f'redis://127.0.0.1:{port}/0'
+
+    workers = start_workers(args.workers, redis_url)
+    try:
+        join_seconds, send_seconds, expected, latencies = asyncio.run(
+            run([port for port, _ in workers], args))
+    finally:
+        for _, process in workers:
+            process.terminate()
+        for _, process in workers:
+            process.wait()
+        if fake is not None:
+            fake.terminate()
+            fake.wait()
+
+    layer = 'in-memory' if args.memory else ('fakeredis' if fake else redis_url)
+    print(f"{args.clients} clients on {args.workers} worker(s), layer: {layer}")
+    print(f"join storm: {join_seconds:.2f}s until every client saw the last joiner")
+    print(f"candidates: {len(latencies)}/{expected} delivered in {send_seconds:.2f}s")
+    if latencies:
+        ms = [latency * 1000 for latency in latencies]
+        print(f"latency ms: p50 {statistics.median(ms):.1f}  p95 {percentile(ms, 0.95):.1f}  "
+              f"p99 {percentile(ms, 0.99):.1f}  max {ms[-1]:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""Benchmark: SFU forwarding with headless synthetic participants.
+
+Runs an ``meetings.sfu.SfuRoom`` in-process with ``--clients`` aiortc peers.
+Each publishes one synthetic video track (moving gradient, ``--size`` at
+``--fps``) and subscribes to everyone else's through the server-offer
+renegotiation used by the meeting page. Reports the time until every
+subscription delivered its first frame, received frames per second per
+subscription, and CPU use, next to the connection and uplink counts a full
+mesh would need for the same room. Clients and SFU share one process, so CPU
+is an upper bound for the server alone.
+
+Usage (from the project root; needs ``pip install aiortc``):
+    python benchmarks/bench_sfu.py --clients 6 --seconds 10
+"""
+import argparse
+import asyncio
+import fractions
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'school_project.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from aiortc import RTCPeerConnection, RTCSessionDescription, VideoStreamTrack  # noqa: E402
+from av import VideoFrame  # noqa: E402
+
+from meetings.sfu import SfuRoom, description  # noqa: E402
+
+
+class SyntheticVideoTrack(VideoStreamTrack):
+    """Moving gradient frames at a fixed rate"""
+
+    def __init__(self, width, height, fps, shade):
+        super().__init__()
+        self.fps = fps
+        self.shade = shade
+        self.frame_index = 0
+        x = np.linspace(0, 255, width, dtype=np.uint8)
+        self.base = np.broadcast_to(x, (height, width))
+
+    async def recv(self):
+        await asyncio.sleep(1 / self.fps)
+        self.frame_index += 1
+        shift = (self.frame_index * 4) % self.base.shape[1]
+        gray = np.roll(self.base, shift, axis=1)
+        image = np.dstack([gray, np.full_like(gray, self.shade), 255 - gray])
+        frame = VideoFrame.from_ndarray(image, format='bgr24')
+        frame.pts = self.frame_index
+        frame.time_base = fractions.Fraction(1, self.fps)
+        return frame
+
+
+class Participant:
+    def __init__(self, user_id, room, args):
+        self.user_id = user_id
+        self.room = room
+        self.pc = RTCPeerConnection()
+        self.pc.addTrack(SyntheticVideoTrack(args.width, args.height, args.fps, shade=user_id * 30 % 256))
+        self.tracks = {}
+        self.frames = {}
+        self.first_frame = {}
+        self.readers = []
+        self.messages = asyncio.Queue()
+        self.signaling = asyncio.ensure_future(self._handle_messages())
+        self.pc.on('track', self._on_track)
+
+    def _on_track(self, track):
+        mid = next((t.mid for t in self.pc.getTransceivers() if t.receiver.track is track), None)
+        publisher = self.tracks.get(mid)
+        if publisher is not None:
+            self.readers.append(asyncio.ensure_future(self._read(publisher, track)))
+
+    async def _read(self, publisher, track):
+        try:
+            while True:
+                await track.recv()
+                self.frames[publisher] = self.frames.get(publisher, 0) + 1
+                self.first_frame.setdefault(publisher, time.perf_counter())
+        except Exception:
+            pass
+
+    async def join(self):
+        await self.pc.setLocalDescription(await self.pc.createOffer())
+        await self.room.join(self.user_id, self.messages.put, description(self.pc.localDescription))
+
+    async def _handle_messages(self):
+        # Stand-in for the WebSocket: messages are handled in order, off the server's task
+        while True:
+            message = await self.messages.get()
+            if message['type'] == 'sfu_answer':
+                await self.pc.setRemoteDescription(RTCSessionDescription(**message['answer']))
+            elif message['type'] == 'sfu_offer':
+                self.tracks = message['tracks']
+                await self.pc.setRemoteDescription(RTCSessionDescription(**message['offer']))
+                await self.pc.setLocalDescription(await self.pc.createAnswer())
+                await self.room.answer(self.user_id, description(self.pc.localDescription))
+
+    async def close(self):
+        self.signaling.cancel()
+        for reader in self.readers:
+            reader.cancel()
+        await self.pc.close()
+
+
+async def run(args):
+    room = SfuRoom('bench')
+    participants = [Participant(user_id, room, args) for user_id in range(1, args.clients + 1)]
+    expected = args.clients * (args.clients - 1)
+
+    cpu_started, started = time.process_time(), time.perf_counter()
+    for participant in participants:
+        await participant.join()
+    while sum(len(p.first_frame) for p in participants) < expected:
+        await asyncio.sleep(0.05)
+        if time.perf_counter() - started > args.timeout:
+            break
+    setup_seconds = time.perf_counter() - started
+    flowing = sum(len(p.first_frame) for p in participants)
+
+    before = {(p.user_id, pub): count for p in participants for pub, count in p.frames.items()}
+    measure_started, cpu_measure = time.perf_counter(), time.process_time()
+    await asyncio.sleep(args.seconds)
+    elapsed = time.perf_counter() - measure_started
+    cpu = time.process_time() - cpu_measure
+    rates = [(count - before.get((p.user_id, pub), 0)) / elapsed
+             for p in participants for pub, count in p.frames.items()]
+
+    for participant in participants:
+        await participant.close()
+    for user_id in list(room.peers):
+        await room.leave(user_id)
+    return setup_seconds, flowing, expected, rates, cpu / elapsed, time.process_time() - cpu_started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=6)
+    parser.add_argument('--seconds', type=float, default=10.0, help='measurement length after setup')
+    parser.add_argument('--fps', type=int, default=15)
+    parser.add_argument('--size', default='320x240')
+    parser.add_argument('--timeout', type=float, default=60.0, help='max seconds to wait for setup')
+    args = parser.parse_args()
+    args.width, args.height = (int(v) for v in args.size.split('x'))
+
+    setup, flowing, expected, rates, cpu_share, cpu_total = asyncio.run(run(args))
+    n = args.clients
+    print(f"{n} participants, {args.size} @ {args.fps} fps synthetic video")
+    print(f"setup: {flowing}/{expected} subscriptions delivering after {setup:.2f}s")
+    if rates:
+        print(f"received fps per subscription: mean {statistics.mean(rates):.1f}  min {min(rates):.1f}")
+        print(f"forwarded frames/s in total: {sum(rates):.0f}")
+    print(f"CPU (clients + SFU): {cpu_share * 100:.0f}% of one core while streaming, {cpu_total:.1f}s total")
+    print(f"per client: SFU 1 connection / 1 uplink stream; mesh {n - 1} connections / {n - 1} uplink streams")
+
+
+if __name__ == '__main__':
+    main()
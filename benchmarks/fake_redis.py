@@ -0,0 +1,34 @@
+"""Local stand-in for a Redis server, for trying the Redis channel layer.
+
+Runs meetings.fake_redis (a fakeredis TCP server with Lua scripting) so several
+daphne workers can share a channel layer without installing Redis. Data lives
+in this process's memory only. Requires ``pip install -r requirements-dev.txt``.
+
+Usage (from the project root):
+    python benchmarks/fake_redis.py --port 6379
+    REDIS_URL=redis://127.0.0.1:6379/0 daphne -p 8000 school_project.asgi:application
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from meetings.fake_redis import FakeRedisServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6379)
+    args = parser.parse_args()
+
+    server = FakeRedisServer((args.host, args.port), server_type='redis')
+    print(f"fake redis listening on redis://{args.host}:{args.port}/0")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""ASGI app for signaling benchmarks: the meeting WebSocket routes without login.
+
+Each connection is given the user named by its ``?uid=`` query parameter
+instead of a session, so simulated clients need no accounts or database
+rows. Never deploy this.
+
+    daphne -p 8100 benchmarks.signaling_app:application
+"""
+import os
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'school_project.settings')
+django.setup()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+
+from meetings.routing import websocket_urlpatterns  # noqa: E402
+
+
+class QueryStringUser:
+    """Puts a stand-in user with the ``uid`` from the query string into the scope"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        query = parse_qs(scope.get('query_string', b'').decode())
+        user_id = int(query.get('uid', ['0'])[0])
+        scope = dict(scope, user=SimpleNamespace(id=user_id, username=f'bench{user_id}'))
+        return await self.app(scope, receive, send)
+
+
+application = ProtocolTypeRouter({
+    'websocket': QueryStringUser(URLRouter(websocket_urlpatterns)),
+})
@@ -0,0 +1,113 @@
+"""Benchmark: async MJPEG fan-out latency vs. number of concurrent viewers.
+
+Publishes synthetic frames at a fixed FPS from a producer thread (like a real
+CameraStreamer) and attaches N asyncio viewers through ``aiter_parts``. Each
+frame carries its publish timestamp, so every viewer measures publish->send
+latency. Reports p50/p99 per viewer count and the first count at which p99
+degrades past the threshold.
+
+Usage (from camera_service/):
+    python benchmarks/bench_asgi_viewers.py --fps 20 --frame-kb 40
+"""
+import argparse
+import asyncio
+import statistics
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from camera_api.frame_bus import FrameBus, aiter_parts
+from camera_api.metrics import Counter
+
+TIMESTAMP = struct.Struct('<d')
+
+
+class SyntheticStreamer:
+    """Minimal stand-in for CameraStreamer that publishes timestamped frames"""
+
+    def __init__(self, fps, frame_bytes):
+        self.bus = FrameBus()
+        self.buses = {'sd': self.bus}
+        self.bytes_out = Counter()
+        self.fps = fps
+        self.padding = b'\x00' * max(0, frame_bytes - TIMESTAMP.size)
+        self.running = False
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        self.bus.close()
+
+    def _run(self):
+        interval = 1.0 / self.fps
+        deadline = time.perf_counter()
+        while self.running:
+            self.bus.publish(TIMESTAMP.pack(time.perf_counter()) + self.padding)
+            deadline += interval
+            time.sleep(max(0.0, deadline - time.perf_counter()))
+
+    async def wait_for_frame_async(self, last_seq, timeout=1.0, rendition='sd'):
+        return await self.bus.wait_async(last_seq, timeout)
+
+    def placeholder_part(self, rendition):
+        return None
+
+
+async def viewer(streamer, latencies, stop):
+    async for part in aiter_parts(streamer, 'sd'):
+        body = part.index(b'\r\n\r\n') + 4
+        latencies.append(time.perf_counter() - TIMESTAMP.unpack_from(part, body)[0])
+        # Yield to the loop like a transport write would
+        await asyncio.sleep(0)
+        if stop.is_set():
+            break
+
+
+async def run_level(viewers, fps, frame_bytes, seconds):
+    streamer = SyntheticStreamer(fps, frame_bytes)
+    streamer.start()
+    latencies, stop = [], asyncio.Event()
+    tasks = [asyncio.ensure_future(viewer(streamer, latencies, stop)) for _ in range(viewers)]
+    await asyncio.sleep(seconds)
+    stop.set()
+    streamer.stop()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else float('inf')
+    return statistics.median(latencies) if latencies else float('inf'), p99, len(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fps', type=int, default=20)
+    parser.add_argument('--frame-kb', type=int, default=40)
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--levels', default='1,10,50,100,200,400,800,1600')
+    parser.add_argument('--threshold-ms', type=float, default=None,
+                        help='p99 that counts as degraded (default: half a frame interval)')
+    args = parser.parse_args()
+
+    threshold = (args.threshold_ms / 1000.0) if args.threshold_ms else 0.5 / args.fps
+    degraded_at = None
+
+    print(f"{'viewers':>8} {'frames':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for level in [int(v) for v in args.levels.split(',')]:
+        p50, p99, count = asyncio.run(run_level(level, args.fps, args.frame_kb * 1024, args.seconds))
+        print(f"{level:>8} {count:>9} {p50 * 1000:>8.2f} {p99 * 1000:>8.2f}")
+        if degraded_at is None and p99 > threshold:
+            degraded_at = level
+
+    if degraded_at is None:
+        print(f"p99 stayed under {threshold * 1000:.1f} ms at every level")
+    else:
+        print(f"p99 exceeded {threshold * 1000:.1f} ms at {degraded_at} viewers")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Benchmark: JPEG encoder backends across resolutions and qualities.
+
+Encodes the same frame set with every available backend from
+``camera_api.encoders`` at each resolution/quality pair and reports the mean
+ms/frame and bytes/frame, so CAMERA_JPEG_ENCODER can be chosen from data.
+Frames are resized the way the streamers do it before encoding. Without
+recordings it synthesizes classroom-like frames (gradients, shapes, sensor
+noise).
+
+Record frames from a camera first (from camera_service/):
+    python benchmarks/bench_jpeg_encoders.py --record rtsp://CAMERA/stream frames/
+Then run:
+    python benchmarks/bench_jpeg_encoders.py --frames frames/ --qualities 50,60,75
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from camera_api.encoders import available_encoders, get_encoder
+from camera_api.renditions import RENDITIONS
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.bmp'}
+
+
+def record(source, directory, count):
+    """Save ``count`` frames from a camera URL or video file as PNGs"""
+    out = Path(directory)
+    out.mkdir(parents=True, exist_ok=True)
+    cap = cv2.VideoCapture(source)
+    saved = 0
+    while saved < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        cv2.imwrite(str(out / f'frame_{saved:04d}.png'), frame)
+        saved += 1
+    cap.release()
+    print(f"Recorded {saved} frames to {out}")
+
+
+def load_frames(path, count):
+    """Frames from a directory of images or a video file"""
+    path = Path(path)
+    if path.is_dir():
+        files = sorted(p for p in path.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+        frames = [cv2.imread(str(p), cv2.IMREAD_COLOR) for p in files[:count]]
+        return [frame for frame in frames if frame is not None]
+    cap = cv2.VideoCapture(str(path))
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def synthesize(count, width=1920, height=1080, seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    blue = np.broadcast_to(180 - y * 0.4, (height, width))
+    base = np.dstack([x * 0.6 + y * 0.2, x * 0.3 + y * 0.5, blue]).clip(0, 255).astype(np.uint8)
+    for _ in range(25):
+        x0, y0 = int(rng.integers(0, width - 200)), int(rng.integers(0, height - 200))
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        cv2.rectangle(base, (x0, y0), (x0 + int(rng.integers(40, 200)), y0 + int(rng.integers(40, 200))), color, -1)
+    frames = []
+    for _ in range(count):
+        noise = rng.normal(0, 4, base.shape).astype(np.int16)
+        frames.append(np.clip(base.astype(np.int16) + noise, 0, 255).astype(np.uint8))
+    return frames
+
+
+def parse_resolutions(text):
+    resolutions = []
+    for item in text.split(','):
+        if item in RENDITIONS:
+            resolutions.append((RENDITIONS[item].width, RENDITIONS[item].height))
+        else:
+            width, height = item.lower().split('x')
+            resolutions.append((int(width), int(height)))
+    return resolutions
+
+
+def bench(encoder, frames, quality, repeat):
+    """Best-of-``repeat`` mean ms/frame and mean bytes/frame"""
+    best = float('inf')
+    sizes = []
+    for _ in range(repeat):
+        sizes = []
+        started = time.perf_counter()
+        for frame in frames:
+            sizes.append(len(encoder.encode(frame, quality)))
+        best = min(best, time.perf_counter() - started)
+    return best / len(frames) * 1000, statistics.mean(sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', help='directory of recorded frames or a video file')
+    parser.add_argument('--record', nargs=2, metavar=('SOURCE', 'DIR'), help='save frames from a camera URL or video')
+    parser.add_argument('--count', type=int, default=50, help='frames to record / load / synthesize')
+    parser.add_argument('--resolutions', default='thumb,sd,hd,1920x1080',
+                        help='rendition names or WxH, comma separated')
+    parser.add_argument('--qualities', default='50,60,75,90')
+    parser.add_argument('--encoders', help='comma separated (default: all available)')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record[0], args.record[1], args.count)
+        return
+
+    frames = load_frames(args.frames, args.count) if args.frames else synthesize(args.count)
+    if not frames:
+        sys.exit(f"No frames found in {args.frames}")
+    names = args.encoders.split(',') if args.encoders else available_encoders()
+    encoders = [(name, get_encoder(name, fallback=False)) for name in names]
+    qualities = [int(q) for q in args.qualities.split(',')]
+    source = f"{len(frames)} frames from {args.frames}" if args.frames else f"{len(frames)} synthetic frames"
+    print(f"{source}, encoders: {', '.join(names)}")
+
+    print(f"{'resolution':>11} {'quality':>7} {'encoder':>12} {'ms/frame':>9} {'bytes/frame':>12}")
+    for width, height in parse_resolutions(args.resolutions):
+        # Same resize as the streamers, done once outside the timed loop
+        resized = [cv2.resize(frame, (width, height), interpolation=cv2.INTER_NEAREST) for frame in frames]
+        for quality in qualities:
+            for name, encoder in encoders:
+                ms, size = bench(encoder, resized, quality, args.repeat)
+                print(f"{width:>5}x{height:<5} {quality:>7} {name:>12} {ms:>9.2f} {size:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Microbenchmark: MJPEGParser vs. the old bytes-concatenation splitter.
+
+Replays recorded mobile camera streams (raw HTTP bodies) in fixed-size chunks.
+Without recordings it synthesizes an IP Webcam-style stream (parts with
+Content-Length headers) and a DroidCam-style stream (bare JPEG parts), which
+exercise the length path and the EOI-scan path respectively.
+
+Record a real stream first (from camera_service/):
+    python benchmarks/bench_mjpeg_parser.py --record http://PHONE:4747/mjpegfeed droidcam.mjpeg
+Then run:
+    python benchmarks/bench_mjpeg_parser.py --droidcam droidcam.mjpeg --ipwebcam ipwebcam.mjpeg
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from camera_api.mjpeg import MJPEGParser
+
+
+def legacy_split(chunks):
+    """The splitter MobileCameraStreamer used before MJPEGParser"""
+    frames = 0
+    bytes_data = bytes()
+    for chunk in chunks:
+        bytes_data += chunk
+        a = bytes_data.find(b'\xff\xd8')
+        b = bytes_data.find(b'\xff\xd9')
+        if a != -1 and b != -1:
+            bytes_data = bytes_data[b + 2:]
+            frames += 1
+    return frames
+
+
+def parser_split(chunks):
+    parser = MJPEGParser()
+    frames = 0
+    for chunk in chunks:
+        frames += len(parser.feed(chunk))
+    return frames
+
+
+def fake_jpeg(size):
+    # Random entropy-coded-looking payload with no stray 0xFF markers
+    body = os.urandom(size).replace(b'\xff', b'\xfe')
+    return b'\xff\xd8' + body + b'\xff\xd9'
+
+
+def synthesize(kind, frames, frame_kb):
+    parts = []
+    for _ in range(frames):
+        jpg = fake_jpeg(frame_kb * 1024)
+        if kind == 'ipwebcam':
+            parts.append(b'--Ba4oTvQMY8ew04N8dcnM\r\nContent-Type: image/jpeg\r\n'
+                         b'Content-Length: ' + str(len(jpg)).encode() + b'\r\n\r\n' + jpg + b'\r\n')
+        else:
+            parts.append(b'--dcmjpeg\r\nContent-Type: image/jpeg\r\n\r\n' + jpg + b'\r\n')
+    return b''.join(parts)
+
+
+def record(url, path, seconds):
+    import requests
+    deadline = time.time() + seconds
+    with requests.get(url, stream=True, timeout=10) as response, open(path, 'wb') as out:
+        for chunk in response.iter_content(chunk_size=8192):
+            out.write(chunk)
+            if time.time() > deadline:
+                break
+
+
+def bench(name, data, chunk_size, repeat):
+    chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+    for label, split in (('legacy', legacy_split), ('parser', parser_split)):
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            count = split(chunks)
+            best = min(best, time.perf_counter() - started)
+        mb_s = len(data) / best / 1e6
+        print(f"{name:>10} {label:>7} {count:>7} frames {best * 1000:>9.1f} ms {mb_s:>9.1f} MB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--droidcam', help='recorded DroidCam stream body')
+    parser.add_argument('--ipwebcam', help='recorded IP Webcam stream body')
+    parser.add_argument('--record', nargs=2, metavar=('URL', 'FILE'))
+    parser.add_argument('--seconds', type=float, default=10.0, help='recording length')
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--frame-kb', type=int, default=60)
+    parser.add_argument('--chunk-size', type=int, default=1024)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record[0], args.record[1], args.seconds)
+        return
+
+    for kind in ('droidcam', 'ipwebcam'):
+        path = getattr(args, kind)
+        if path:
+            data = Path(path).read_bytes()
+        else:
+            data = synthesize(kind, args.frames, args.frame_kb)
+        bench(kind, data, args.chunk_size, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Asyncio MJPEG streaming front-end for the camera service.
+
+Feed URLs are served directly as ASGI responses: each viewer is a coroutine
+awaiting the streamer's frame bus, so an idle viewer costs no thread. All other
+paths fall through to the regular Django application.
+"""
+import asyncio
+import json
+import logging
+import re
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+
+from .frame_bus import aiter_parts
+from .pacing import viewer_fps
+from .renditions import pick_rendition
+from . import views
+
+logger = logging.getLogger('camera_api')
+
+MJPEG_HEADERS = [
+    (b'content-type', b'multipart/x-mixed-replace; boundary=frame'),
+    (b'cache-control', b'no-cache, no-store, must-revalidate'),
+    (b'pragma', b'no-cache'),
+    (b'expires', b'0'),
+    (b'x-accel-buffering', b'no'),
+    (b'access-control-allow-origin', b'*'),
+]
+
+FEED_ROUTES = [
+    (re.compile(r'^/api/cameras/(?P<camera_id>\d+)/feed/$'), 'camera'),
+    (re.compile(r'^/api/mobile-cameras/(?P<camera_id>\d+)/feed/$'), 'mobile'),
+]
+
+
+class MJPEGStreamingApp:
+    """ASGI app that streams camera feeds and delegates everything else"""
+
+    def __init__(self, django_app):
+        self.django_app = django_app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            for pattern, kind in FEED_ROUTES:
+                match = pattern.match(scope['path'])
+                if match:
+                    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+                    rendition = pick_rendition(query.get('quality', [None])[0],
+                                               query.get('width', [None])[0])
+                    fps = viewer_fps(query.get('fps', [None])[0])
+                    await self.stream(kind, int(match['camera_id']), rendition, fps, receive, send)
+                    return
+        await self.django_app(scope, receive, send)
+
+    async def stream(self, kind, camera_id, rendition, fps, receive, send):
+        try:
+            if kind == 'camera':
+                streamer = await sync_to_async(views.open_camera_stream)(camera_id)
+            else:
+                streamer = await sync_to_async(views.open_mobile_camera_stream)(camera_id)
+        except views.Camera.DoesNotExist:
+            await self.send_json(send, {'error': 'Camera not found'}, 404)
+            return
+        except views.CameraPaused:
+            await self.send_json(send, {'error': 'Camera is paused'}, 503)
+            return
+        except Exception as e:
+            logger.error(f"Error opening {kind} camera {camera_id}: {e}")
+            await self.send_json(send, {'error': str(e)}, 500)
+            return
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': MJPEG_HEADERS})
+
+        frames = aiter_parts(streamer, rendition, fps)
+
+        async def pump():
+            async for part in frames:
+                await send({'type': 'http.response.body', 'body': part, 'more_body': True})
+
+        pump_task = asyncio.ensure_future(pump())
+        disconnect_task = asyncio.ensure_future(self.wait_for_disconnect(receive))
+        try:
+            done, _ = await asyncio.wait(
+                {pump_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            for task in (pump_task, disconnect_task):
+                task.cancel()
+            await asyncio.gather(pump_task, disconnect_task, return_exceptions=True)
+            await frames.aclose()
+
+        if disconnect_task in done:
+            logger.info(f"Client disconnected from {kind} camera {camera_id}")
+        elif pump_task.exception() is None:
+            # Streamer shut down; end the response cleanly
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+    @staticmethod
+    async def wait_for_disconnect(receive):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+
+    @staticmethod
+    async def send_json(send, payload, status):
+        body = json.dumps(payload).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json'),
+                        (b'content-length', str(len(body)).encode())],
+        })
+        await send({'type': 'http.response.body', 'body': body})
@@ -0,0 +1,103 @@
+"""Per-camera circuit breaker with exponential backoff and jitter"""
+import random
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Numeric codes for shared-memory stats and metrics
+STATE_CODES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+STATE_NAMES = {code: name for name, code in STATE_CODES.items()}
+
+
+def circuit_snapshot(state, failures, retry_at, now=None):
+    """State for the stats API; an open circuit past its retry time reports half-open"""
+    now = time.time() if now is None else now
+    if state == OPEN and now >= retry_at:
+        state = HALF_OPEN
+    return {
+        'state': state,
+        'failures': failures,
+        'retry_in': round(max(0.0, retry_at - now), 1) if state == OPEN else 0.0,
+    }
+
+
+class CircuitBreaker:
+    """Decides when a streamer may try to (re)connect its source.
+
+    Every failed attempt schedules the next one after
+    ``base_delay * 2 ** (failures - 1)`` seconds, capped at ``max_delay`` and
+    scaled by a random factor in ``[1 - jitter, 1]`` so offline cameras do not
+    retry in lockstep. After ``failure_threshold`` consecutive failures the
+    circuit opens; once the delay has passed it goes half-open and allows a
+    single trial, which closes it on success or reopens it with a longer delay.
+    """
+
+    def __init__(self, failure_threshold=3, base_delay=1.0, max_delay=300.0, jitter=0.5):
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self.failures = 0
+        self.retry_at = 0.0
+
+    @property
+    def state(self):
+        return self.snapshot()['state']
+
+    @property
+    def is_open(self):
+        return self.state == OPEN
+
+    def allow(self, now=None):
+        """True if an attempt may be made now (moves an expired open circuit to half-open)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            if now < self.retry_at:
+                return False
+            if self._state == OPEN:
+                self._state = HALF_OPEN
+            return True
+
+    def wait_time(self, now=None):
+        now = time.time() if now is None else now
+        return max(0.0, self.retry_at - now)
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self.failures = 0
+            self.retry_at = 0.0
+
+    def record_failure(self, now=None):
+        """Count a failed attempt and schedule the next one; returns the delay"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self.failures += 1
+            delay = min(self.max_delay, self.base_delay * 2 ** (self.failures - 1))
+            delay *= random.uniform(1.0 - self.jitter, 1.0)
+            self.retry_at = now + delay
+            if self._state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self._state = OPEN
+            return delay
+
+    def fields(self):
+        """(state code, failures, retry_at) for sharing with another process"""
+        with self._lock:
+            return STATE_CODES[self._state], self.failures, self.retry_at
+
+    def restore(self, state_code, failures, retry_at):
+        """Adopt state written by ``fields`` in another process"""
+        with self._lock:
+            self._state = STATE_NAMES[state_code]
+            self.failures = failures
+            self.retry_at = retry_at
+
+    def snapshot(self):
+        """State for the stats API"""
+        with self._lock:
+            return circuit_snapshot(self._state, self.failures, self.retry_at)
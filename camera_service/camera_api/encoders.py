@@ -0,0 +1,96 @@
+"""Pluggable JPEG encoder backends.
+
+``opencv`` is the historical encoder (libjpeg with an optimized Huffman
+pass), ``opencv-fast`` skips that second pass for somewhat larger frames, and
+``turbojpeg`` goes through libjpeg-turbo's SIMD paths via PyTurboJPEG when it
+and the shared library are installed. Run ``benchmarks/bench_jpeg_encoders.py``
+on recorded frames to pick one per camera.
+"""
+import logging
+import threading
+
+import cv2
+
+try:
+    from turbojpeg import TurboJPEG
+except ImportError:
+    TurboJPEG = None
+
+logger = logging.getLogger('camera_api')
+
+DEFAULT_ENCODER = 'opencv'
+
+
+class OpenCVEncoder:
+    """``cv2.imencode``, optionally with the optimized (two-pass) Huffman tables"""
+
+    def __init__(self, optimize=True):
+        self.optimize = optimize
+
+    def encode(self, image, quality):
+        """JPEG bytes of a BGR ``image``, or None if encoding failed"""
+        ret, jpeg = cv2.imencode('.jpg', image, [
+            cv2.IMWRITE_JPEG_QUALITY, quality,
+            cv2.IMWRITE_JPEG_OPTIMIZE, int(self.optimize),
+        ])
+        return jpeg.tobytes() if ret else None
+
+
+class TurboJPEGEncoder:
+    """libjpeg-turbo through PyTurboJPEG"""
+
+    def __init__(self):
+        if TurboJPEG is None:
+            raise RuntimeError('PyTurboJPEG is not installed')
+        # Raises if the libturbojpeg shared library cannot be found
+        self._jpeg = TurboJPEG()
+
+    def encode(self, image, quality):
+        return self._jpeg.encode(image, quality=quality)
+
+
+_FACTORIES = {
+    'opencv': lambda: OpenCVEncoder(optimize=True),
+    'opencv-fast': lambda: OpenCVEncoder(optimize=False),
+    'turbojpeg': TurboJPEGEncoder,
+}
+ENCODER_NAMES = list(_FACTORIES)
+
+_lock = threading.Lock()
+_encoders = {}
+
+
+def available_encoders():
+    """Names of the backends that can be created in this environment"""
+    names = []
+    for name, factory in _FACTORIES.items():
+        try:
+            factory()
+        except (RuntimeError, OSError):
+            continue
+        names.append(name)
+    return names
+
+
+def get_encoder(name=DEFAULT_ENCODER, fallback=True):
+    """Shared encoder instance for ``name``.
+
+    An unknown or unavailable backend falls back to the default one (logged
+    once) unless ``fallback`` is False, in which case the error is raised.
+    """
+    with _lock:
+        encoder = _encoders.get(name)
+        if encoder is not None:
+            return encoder
+        try:
+            if name not in _FACTORIES:
+                raise ValueError(f'Unknown JPEG encoder {name!r}')
+            encoder = _FACTORIES[name]()
+        except (RuntimeError, OSError, ValueError) as e:
+            if not fallback or name == DEFAULT_ENCODER:
+                raise
+            logger.warning(f"JPEG encoder {name!r} unavailable ({e}); using {DEFAULT_ENCODER!r}")
+            encoder = _encoders.get(DEFAULT_ENCODER) or _FACTORIES[DEFAULT_ENCODER]()
+            _encoders[DEFAULT_ENCODER] = encoder
+        _encoders[name] = encoder
+        return encoder
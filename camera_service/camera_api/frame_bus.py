@@ -0,0 +1,250 @@
+"""Single-producer / many-consumer frame bus for camera streamers"""
+import asyncio
+import threading
+import time
+from typing import Optional, Tuple
+
+from .pacing import FramePacer
+
+# While a camera's circuit is open, viewers get the placeholder this often
+PLACEHOLDER_INTERVAL = 5.0
+
+
+def mjpeg_part(frame: bytes) -> bytes:
+    """Wrap a JPEG frame as one multipart/x-mixed-replace part"""
+    return (b'--frame\r\n'
+            b'Content-Type: image/jpeg\r\n'
+            b'Content-Length: ' + str(len(frame)).encode() + b'\r\n'
+            b'\r\n' + frame + b'\r\n')
+
+
+class FrameBus:
+    """Holds the latest encoded frame and wakes every subscriber when it changes.
+
+    The producer publishes each frame exactly once. The multipart part is built
+    at publish time so every viewer sends the very same bytes object instead of
+    re-wrapping the frame per connection.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._frame: Optional[bytes] = None
+        self._part: Optional[bytes] = None
+        # Seq of the publish that produced the current bytes (republish keeps it)
+        self._frame_seq = 0
+        self._closed = False
+        # Wall-clock time of the newest publish, for last-frame-age reporting
+        self.published_at: Optional[float] = None
+        # One shared future per event loop; resolved from the producer thread
+        self._async_waiters = {}
+        self._listeners = []
+        self.subscribers = 0
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def publish(self, frame: bytes) -> int:
+        """Publish a new frame and wake all waiting subscribers"""
+        part = mjpeg_part(frame)
+        with self._cond:
+            self._seq += 1
+            self._frame = frame
+            self._part = part
+            self._frame_seq = self._seq
+            seq = self._wake()
+        for callback in self._listeners:
+            callback(seq, frame)
+        return seq
+
+    def republish(self) -> Optional[int]:
+        """Send the current frame again under a new seq (keep-alive for static scenes).
+
+        Subscribers wake as for a new frame and get the very same part bytes;
+        nothing is rebuilt. Returns None if nothing was published yet.
+        """
+        with self._cond:
+            if self._frame is None:
+                return None
+            self._seq += 1
+            seq, frame = self._wake(), self._frame
+        for callback in self._listeners:
+            callback(seq, frame)
+        return seq
+
+    def _wake(self) -> int:
+        # Caller holds self._cond
+        self.published_at = time.time()
+        self._cond.notify_all()
+        self._wake_async_waiters()
+        return self._seq
+
+    def add_listener(self, callback):
+        """Call ``callback(seq, frame)`` on the producer thread after every publish"""
+        self._listeners = self._listeners + [callback]
+
+    def remove_listener(self, callback):
+        self._listeners = [listener for listener in self._listeners if listener is not callback]
+
+    def latest(self) -> Tuple[int, Optional[bytes]]:
+        """Return (seq, frame) without blocking"""
+        with self._cond:
+            return self._seq, self._frame
+
+    def latest_frame(self) -> Tuple[int, Optional[bytes]]:
+        """Return (frame_seq, frame); keep-alive republishes do not change frame_seq"""
+        with self._cond:
+            return self._frame_seq, self._frame
+
+    def latest_part(self) -> Tuple[int, Optional[bytes]]:
+        """Return (seq, part) of the newest frame without blocking"""
+        with self._cond:
+            return self._seq, self._part
+
+    def wait(self, last_seq: int, timeout: Optional[float] = None) -> Tuple[int, Optional[bytes]]:
+        """Block until a frame newer than ``last_seq`` is published.
+
+        Returns ``(seq, part)`` where ``part`` is the ready-to-send multipart
+        chunk, or ``(last_seq, None)`` on timeout or when the bus is closed.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq != last_seq or self._closed, timeout)
+            if self._seq == last_seq or self._part is None:
+                return last_seq, None
+            return self._seq, self._part
+
+    async def wait_async(self, last_seq: int, timeout: Optional[float] = None) -> Tuple[int, Optional[bytes]]:
+        """Awaitable counterpart of :meth:`wait` for asyncio consumers.
+
+        All coroutines on the same loop share one future, so a published frame
+        costs one ``call_soon_threadsafe`` per loop rather than per viewer.
+        """
+        with self._cond:
+            if self._seq != last_seq or self._closed:
+                if self._seq == last_seq or self._part is None:
+                    return last_seq, None
+                return self._seq, self._part
+            loop = asyncio.get_running_loop()
+            future = self._async_waiters.get(loop)
+            if future is None or future.done():
+                future = loop.create_future()
+                self._async_waiters[loop] = future
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            pass
+        with self._cond:
+            if self._seq == last_seq or self._part is None:
+                return last_seq, None
+            return self._seq, self._part
+
+    def _wake_async_waiters(self):
+        # Caller holds self._cond
+        waiters, self._async_waiters = self._async_waiters, {}
+        for loop, future in waiters.items():
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                # Loop already closed
+                pass
+
+    def close(self):
+        """Wake all subscribers so their generators can finish"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            self._wake_async_waiters()
+
+    def subscribe(self):
+        with self._cond:
+            self.subscribers += 1
+
+    def unsubscribe(self):
+        with self._cond:
+            self.subscribers = max(0, self.subscribers - 1)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def _due_placeholder(streamer, rendition, sent_at):
+    """Placeholder part to send now (or None) and the updated last-sent time.
+
+    A viewer of an open-circuit camera gets the card at once instead of a
+    hanging response, then again every ``PLACEHOLDER_INTERVAL`` so the page
+    keeps showing it; the first real frame replaces it.
+    """
+    part = streamer.placeholder_part(rendition)
+    if part is None:
+        return None, None
+    now = time.monotonic()
+    if sent_at is not None and now - sent_at < PLACEHOLDER_INTERVAL:
+        return None, sent_at
+    streamer.bytes_out.inc(len(part))
+    return part, now
+
+
+def iter_parts(streamer, rendition, fps=None, timeout=1.0):
+    """Yield multipart parts of one rendition as they are published (WSGI).
+
+    With ``fps`` set, parts are sent on a deadline clock at that rate; each slot
+    carries the newest frame available when it opens.
+    """
+    bus = streamer.buses[rendition]
+    pacer = FramePacer(fps) if fps else None
+    bus.subscribe()
+    try:
+        seq = 0
+        placeholder_at = None
+        while not bus.closed:
+            placeholder, placeholder_at = _due_placeholder(streamer, rendition, placeholder_at)
+            if placeholder is not None:
+                yield placeholder
+            # Sleeps on the bus condition until the streamer publishes
+            seq, part = streamer.wait_for_frame(seq, timeout, rendition)
+            if part is None:
+                continue
+            if pacer is not None:
+                delay = pacer.delay(time.monotonic())
+                if delay:
+                    time.sleep(delay)
+                    seq, part = bus.latest_part()
+                pacer.mark(time.monotonic())
+            streamer.bytes_out.inc(len(part))
+            yield part
+    finally:
+        bus.unsubscribe()
+
+
+async def aiter_parts(streamer, rendition, fps=None, timeout=1.0):
+    """Async variant of :func:`iter_parts`; holds no thread while waiting (ASGI)"""
+    bus = streamer.buses[rendition]
+    pacer = FramePacer(fps) if fps else None
+    bus.subscribe()
+    try:
+        seq = 0
+        placeholder_at = None
+        while not bus.closed:
+            placeholder, placeholder_at = _due_placeholder(streamer, rendition, placeholder_at)
+            if placeholder is not None:
+                yield placeholder
+            seq, part = await streamer.wait_for_frame_async(seq, timeout, rendition)
+            if part is None:
+                continue
+            if pacer is not None:
+                delay = pacer.delay(time.monotonic())
+                if delay:
+                    await asyncio.sleep(delay)
+                    seq, part = bus.latest_part()
+                pacer.mark(time.monotonic())
+            streamer.bytes_out.inc(len(part))
+            yield part
+    finally:
+        bus.unsubscribe()
@@ -0,0 +1,201 @@
+"""Shared-memory frame rings for handing encoded JPEGs between processes.
+
+Used by the capture pool (worker -> serving process) and by frame exports
+(camera service -> main app). Kept free of Django so the main app can import it.
+"""
+import struct
+import sys
+from multiprocessing import resource_tracker, shared_memory
+
+from .circuit import STATE_NAMES, circuit_snapshot
+from .renditions import RENDITIONS
+
+RING_SLOTS = 4
+RENDITION_NAMES = list(RENDITIONS)
+
+# Control block: last_access (f64), closed flag (u32), pad, worker pipeline
+# stats (capture fps, encode fps, dropped frames, source fps, reconnects,
+# connect failures),
+# circuit breaker (state code, failures, retry_at), then one i32 subscriber
+# count per rendition and the reader slots
+_CONTROL = struct.Struct('<dI4xddQdQQIId')
+_STATS = struct.Struct('<ddQdQQ')
+_STATS_OFFSET = 16
+_CIRCUIT = struct.Struct('<IId')
+_CIRCUIT_OFFSET = _STATS_OFFSET + _STATS.size
+_COUNT = struct.Struct('<i')
+# Reader slot, one per process reading one rendition of an exported camera:
+# last refresh (f64), rendition index (u32), viewers (u32), bytes sent to
+# them (u64) and the Unix datagram socket to notify on every publish
+_READER = struct.Struct('<dIIQ108s')
+READER_SLOTS = 16
+# A reader slot not refreshed for this long is free and no longer counts
+READER_TTL = 2.0
+# Slot header: seq (u64, 0 while being written), payload length (u32), pad
+_SLOT = struct.Struct('<QI4x')
+
+
+def _align(offset, boundary=64):
+    return (offset + boundary - 1) // boundary * boundary
+
+
+def channel_name(kind, camera_id):
+    """Well-known shared-memory name of an exported camera"""
+    return f'edumi_{kind}_{camera_id}'
+
+
+class SharedFrameChannel:
+    """Shared-memory block for one camera: control words plus a frame ring per rendition"""
+
+    def __init__(self, name=None, create=False):
+        self.counts_offset = _CONTROL.size
+        self.readers_offset = _align(self.counts_offset + _COUNT.size * len(RENDITION_NAMES), 8)
+        offset = _align(self.readers_offset + _READER.size * READER_SLOTS)
+        self.rings = []
+        for name_ in RENDITION_NAMES:
+            capacity = RENDITIONS[name_].max_bytes
+            slot_size = _align(_SLOT.size + capacity)
+            self.rings.append((offset, slot_size, capacity))
+            offset += slot_size * RING_SLOTS
+        self.size = offset
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=self.size if create else 0)
+        if create:
+            self.shm.buf[:self.size] = bytes(self.size)
+
+    @classmethod
+    def attach(cls, name):
+        """Open a channel created by an unrelated process, or None if it does not exist.
+
+        The segment is not registered with this process's resource tracker,
+        which would otherwise unlink it from under its owner at exit.
+        """
+        try:
+            channel = cls(name)
+        except FileNotFoundError:
+            return None
+        if sys.platform != 'win32':
+            resource_tracker.unregister(channel.shm._name, 'shared_memory')
+        return channel
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def released(self):
+        """True once this process has closed its mapping"""
+        return self.shm.buf is None
+
+    @property
+    def last_access(self):
+        return _CONTROL.unpack_from(self.shm.buf, 0)[0]
+
+    @last_access.setter
+    def last_access(self, value):
+        struct.pack_into('<d', self.shm.buf, 0, value)
+
+    @property
+    def closed(self):
+        return bool(_CONTROL.unpack_from(self.shm.buf, 0)[1])
+
+    def mark_closed(self):
+        struct.pack_into('<I', self.shm.buf, 8, 1)
+
+    def write_stats(self, capture_fps, encode_fps, dropped_frames, source_fps, reconnects, connect_failures):
+        _STATS.pack_into(self.shm.buf, _STATS_OFFSET, capture_fps, encode_fps, dropped_frames,
+                         source_fps, reconnects, connect_failures)
+
+    def read_stats(self):
+        return _STATS.unpack_from(self.shm.buf, _STATS_OFFSET)
+
+    def write_circuit(self, state_code, failures, retry_at):
+        _CIRCUIT.pack_into(self.shm.buf, _CIRCUIT_OFFSET, state_code, failures, retry_at)
+
+    def read_circuit_fields(self):
+        """(state code, failures, retry_at) as last written"""
+        return _CIRCUIT.unpack_from(self.shm.buf, _CIRCUIT_OFFSET)
+
+    def read_circuit(self, now=None):
+        """Circuit snapshot as last written by the channel's owner"""
+        state_code, failures, retry_at = self.read_circuit_fields()
+        return circuit_snapshot(STATE_NAMES[state_code], failures, retry_at, now)
+
+    def get_subscribers(self, index):
+        return _COUNT.unpack_from(self.shm.buf, self.counts_offset + index * _COUNT.size)[0]
+
+    def set_subscribers(self, index, count):
+        _COUNT.pack_into(self.shm.buf, self.counts_offset + index * _COUNT.size, count)
+
+    def _reader_offset(self, slot):
+        return self.readers_offset + slot * _READER.size
+
+    def claim_reader(self, address, now, ttl):
+        """Slot for the reader identified by ``address`` (its own or a free one), or None if all are taken"""
+        key = address.encode()
+        free = None
+        for slot in range(READER_SLOTS):
+            stamp, _, _, _, current = _READER.unpack_from(self.shm.buf, self._reader_offset(slot))
+            if current.rstrip(b'\0') == key:
+                return slot
+            if free is None and now - stamp >= ttl:
+                free = slot
+        if free is None:
+            return None
+        _READER.pack_into(self.shm.buf, self._reader_offset(free), now, 0, 0, 0, key)
+        # Another process may have claimed the same slot at the same moment
+        return free if _READER.unpack_from(self.shm.buf, self._reader_offset(free))[4].rstrip(b'\0') == key else None
+
+    def update_reader(self, slot, address, now, index, viewers, bytes_sent):
+        _READER.pack_into(self.shm.buf, self._reader_offset(slot), now, index, viewers, bytes_sent, address.encode())
+
+    def readers(self, now, ttl):
+        """Live reader slots as (slot, address, rendition index, viewers, bytes sent)"""
+        live = []
+        for slot in range(READER_SLOTS):
+            stamp, index, viewers, bytes_sent, address = _READER.unpack_from(self.shm.buf, self._reader_offset(slot))
+            if now - stamp < ttl:
+                live.append((slot, address.rstrip(b'\0').decode(), index, viewers, bytes_sent))
+        return live
+
+    def latest_seq(self, index):
+        """Highest complete seq in the ring of rendition ``index`` (0 if empty)"""
+        ring_offset, slot_size, _ = self.rings[index]
+        return max(_SLOT.unpack_from(self.shm.buf, ring_offset + slot * slot_size)[0]
+                   for slot in range(RING_SLOTS))
+
+    def write(self, index, seq, data):
+        """Store frame ``seq`` of rendition ``index``; False if it does not fit"""
+        ring_offset, slot_size, capacity = self.rings[index]
+        if len(data) > capacity:
+            return False
+        offset = ring_offset + (seq % RING_SLOTS) * slot_size
+        buf = self.shm.buf
+        _SLOT.pack_into(buf, offset, 0, 0)
+        start = offset + _SLOT.size
+        buf[start:start + len(data)] = data
+        _SLOT.pack_into(buf, offset, seq, len(data))
+        return True
+
+    def read(self, index, seq):
+        """Copy frame ``seq`` out of the ring, or None if it was already overwritten"""
+        ring_offset, slot_size, _ = self.rings[index]
+        offset = ring_offset + (seq % RING_SLOTS) * slot_size
+        buf = self.shm.buf
+        current, length = _SLOT.unpack_from(buf, offset)
+        if current != seq:
+            return None
+        start = offset + _SLOT.size
+        data = bytes(buf[start:start + length])
+        # Seqlock check: the writer may have lapped us while copying
+        if _SLOT.unpack_from(buf, offset)[0] != seq:
+            return None
+        return data
+
+    def close(self):
+        self.shm.close()
+
+    def unlink(self):
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,201 @@
+"""Export running streamers' frames to the main app through shared memory.
+
+The main app attaches to ``channel_name(kind, camera_id)`` and reads the newest
+JPEG of a rendition straight out of the ring, so a viewer there costs no
+loopback HTTP connection and no second multipart parse. Readers keep the
+export alive by refreshing ``last_access`` and a reader slot naming their
+rendition, viewer count, bytes sent and a Unix datagram socket. A sync thread
+here turns the slots into bus subscriptions (so the streamer encodes those
+renditions and its viewer and byte counters include remote viewers), and every
+publish sends one datagram to each reader of that rendition, so readers block
+instead of polling the ring.
+"""
+import logging
+import socket
+import threading
+import time
+from collections import Counter
+from functools import partial
+
+from .circuit import STATE_CODES
+from .frame_channel import READER_TTL, RENDITION_NAMES, SharedFrameChannel, channel_name
+from .metrics import Counter
+
+logger = logging.getLogger('camera_api')
+
+SYNC_INTERVAL = 0.25
+
+
+def _notify_socket():
+    """Unbound datagram socket for waking readers, or None where AF_UNIX is missing"""
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    return sock
+
+
+class FrameExport:
+    """Mirrors every publish of one streamer into a named shared-memory channel"""
+
+    def __init__(self, name, streamer):
+        self.streamer = streamer
+        self.channel = self._create_channel(name)
+        self.channel.last_access = time.time()
+        self._lock = threading.Lock()
+        # rendition -> subscriptions held for remote viewers
+        self._held = Counter()
+        # (slot, address) -> bytes already added to the streamer's counter
+        self._bytes_seen = {}
+        # rendition index -> socket addresses of its readers
+        self._notify = {}
+        self._socket = _notify_socket()
+        # Frames too large for their ring slot; readers never see them
+        self.write_failures = Counter()
+        self._listeners = []
+        for index, rendition in enumerate(RENDITION_NAMES):
+            listener = partial(self._on_publish, index)
+            streamer.buses[rendition].add_listener(listener)
+            self._listeners.append((rendition, listener))
+
+    @property
+    def name(self):
+        return self.channel.name
+
+    @staticmethod
+    def _create_channel(name):
+        try:
+            return SharedFrameChannel(name, create=True)
+        except FileExistsError:
+            # Left behind by a previous run that did not shut down cleanly
+            stale = SharedFrameChannel.attach(name)
+            if stale is not None:
+                stale.close()
+                stale.unlink()
+            return SharedFrameChannel(name, create=True)
+
+    def _on_publish(self, index, seq, frame):
+        with self._lock:
+            if self.channel is None:
+                return
+            if not self.channel.write(index, seq, frame):
+                self._write_failed(index, frame)
+                return
+            addresses = self._notify.get(index, ())
+        for address in addresses:
+            try:
+                self._socket.sendto(b'\x01', address)
+            except OSError:
+                # Reader gone or its queue full; it still rechecks the ring on its own
+                pass
+
+    def _write_failed(self, index, frame):
+        self.write_failures.inc()
+        # First one and then every hundredth, so an oversized source cannot flood the log
+        if self.write_failures.value % 100 == 1:
+            logger.warning(f"{self.name}: dropped a {len(frame)} byte {RENDITION_NAMES[index]} frame "
+                           f"too large for shared memory ({self.write_failures.value} so far)")
+
+    def sync(self, now):
+        """Forward remote keep-alives and rendition demand to the streamer"""
+        with self._lock:
+            if self.channel is None:
+                return
+            remote_access = self.channel.last_access
+            # Lets readers show the offline placeholder without asking over HTTP
+            self.channel.write_circuit(*self._circuit_fields(now))
+            readers = self.channel.readers(now, READER_TTL)
+            notify = {}
+            if self._socket is not None:
+                for _, address, index, _, _ in readers:
+                    notify.setdefault(index, []).append(address)
+            self._notify = notify
+        if remote_access > self.streamer.last_access:
+            self.streamer.last_access = remote_access
+
+        wanted = Counter()
+        bytes_seen = {}
+        for slot, address, index, viewers, bytes_sent in readers:
+            wanted[RENDITION_NAMES[index]] += viewers
+            key = (slot, address)
+            if bytes_sent > self._bytes_seen.get(key, 0):
+                self.streamer.bytes_out.inc(bytes_sent - self._bytes_seen.get(key, 0))
+            bytes_seen[key] = bytes_sent
+        self._bytes_seen = bytes_seen
+        # One subscription per remote viewer, so the streamer's viewer count includes them
+        for rendition in set(wanted) | set(self._held):
+            bus = self.streamer.buses[rendition]
+            for _ in range(wanted[rendition] - self._held[rendition]):
+                bus.subscribe()
+            for _ in range(self._held[rendition] - wanted[rendition]):
+                bus.unsubscribe()
+        self._held = wanted
+
+    def _circuit_fields(self, now):
+        circuit = self.streamer.circuit_state()
+        return STATE_CODES[circuit['state']], circuit['failures'], now + circuit['retry_in']
+
+    def release(self):
+        for rendition, listener in self._listeners:
+            self.streamer.buses[rendition].remove_listener(listener)
+        for rendition, count in self._held.items():
+            for _ in range(count):
+                self.streamer.buses[rendition].unsubscribe()
+        self._held = Counter()
+        with self._lock:
+            self._notify = {}
+            if self._socket is not None:
+                self._socket.close()
+            if self.channel is not None:
+                # Readers see the flag and ask the camera service to reopen
+                self.channel.mark_closed()
+                self.channel.close()
+                self.channel.unlink()
+                self.channel = None
+
+
+class FrameExporter:
+    """Keeps one FrameExport per exported camera and syncs them in the background"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._exports = {}
+        self._thread = None
+
+    def export(self, kind, camera_id, streamer):
+        """Export ``streamer`` and return its channel name"""
+        key = (kind, camera_id)
+        with self._lock:
+            current = self._exports.get(key)
+            if current is not None and current.streamer is streamer:
+                return current.name
+            if current is not None:
+                current.release()
+            export = FrameExport(channel_name(kind, camera_id), streamer)
+            self._exports[key] = export
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            logger.info(f"Exporting {kind} camera {camera_id} as {export.name}")
+            return export.name
+
+    def _run(self):
+        while True:
+            time.sleep(SYNC_INTERVAL)
+            now = time.time()
+            with self._lock:
+                for key, export in list(self._exports.items()):
+                    if not export.streamer.running:
+                        export.release()
+                        del self._exports[key]
+                        continue
+                    export.sync(now)
+
+    def shutdown(self):
+        with self._lock:
+            for export in self._exports.values():
+                export.release()
+            self._exports.clear()
+
+
+frame_exporter = FrameExporter()
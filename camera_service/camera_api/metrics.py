@@ -0,0 +1,149 @@
+"""Lightweight in-process instrumentation for camera streamers"""
+import bisect
+import threading
+import time
+
+from .circuit import STATE_CODES
+
+
+class RateMeter:
+    """Events per second over fixed one-second windows.
+
+    ``tick`` is a counter bump plus a clock read; the rate is recomputed only
+    when a window closes, so it is cheap enough for per-frame use.
+    """
+
+    def __init__(self, window=1.0):
+        self.window = window
+        self.total = 0
+        self._count = 0
+        self._window_start = time.monotonic()
+        self._rate = 0.0
+        self._lock = threading.Lock()
+
+    def tick(self, n=1):
+        now = time.monotonic()
+        with self._lock:
+            self.total += n
+            self._count += n
+            elapsed = now - self._window_start
+            if elapsed >= self.window:
+                self._rate = self._count / elapsed
+                self._count = 0
+                self._window_start = now
+
+    @property
+    def rate(self):
+        with self._lock:
+            # A source that stopped ticking is reported as idle, not as its last rate
+            if time.monotonic() - self._window_start > 2 * self.window:
+                return 0.0
+            return self._rate
+
+
+class Counter:
+    """Monotonic counter safe to bump from any thread"""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self._lock:
+            self.value += n
+
+
+class Histogram:
+    """Fixed-bucket histogram in the Prometheus cumulative layout"""
+
+    DEFAULT_BUCKETS = (0.002, 0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.25, 0.5)
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            if index < len(self._counts):
+                self._counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        """Return ([(upper_bound, cumulative_count), ...], sum, count)"""
+        with self._lock:
+            cumulative, running = [], 0
+            for bound, count in zip(self.buckets, self._counts):
+                running += count
+                cumulative.append((bound, running))
+            return cumulative, self.sum, self.count
+
+
+# name -> (type, help, stats() key)
+_STATS_METRICS = [
+    ('camera_viewers', 'gauge', 'Open viewer streams', 'viewers'),
+    ('camera_capture_fps', 'gauge', 'Frames read from the source per second', 'capture_fps'),
+    ('camera_encode_fps', 'gauge', 'Frames encoded and published per second', 'encode_fps'),
+    ('camera_dropped_frames_total', 'counter', 'Source frames never encoded', 'dropped_frames'),
+]
+
+
+def render_prometheus(camera_streamers, mobile_streamers):
+    """Render streamer metrics in the Prometheus text exposition format"""
+    streamers = [('rtsp', s.camera_id, s) for s in camera_streamers]
+    streamers += [('mobile', s.mobile_camera_id, s) for s in mobile_streamers]
+    stats = [(kind, camera_id, streamer, streamer.stats()) for kind, camera_id, streamer in streamers]
+    lines = []
+
+    def header(name, kind, text):
+        lines.append(f'# HELP {name} {text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    for name, kind, text, key in _STATS_METRICS:
+        header(name, kind, text)
+        for source, camera_id, _, values in stats:
+            lines.append(f'{name}{{kind="{source}",camera_id="{camera_id}"}} {values[key]}')
+
+    header('camera_bytes_out_total', 'counter', 'Bytes sent to viewers')
+    for source, camera_id, streamer, _ in stats:
+        lines.append(f'camera_bytes_out_total{{kind="{source}",camera_id="{camera_id}"}} {streamer.bytes_out.value}')
+
+    header('camera_reconnects_total', 'counter', 'Times an established source connection was lost')
+    for source, camera_id, streamer, _ in stats:
+        lines.append(f'camera_reconnects_total{{kind="{source}",camera_id="{camera_id}"}} {streamer.reconnect_count()}')
+
+    header('camera_connect_failures_total', 'counter', 'Source connection attempts that failed')
+    for source, camera_id, streamer, _ in stats:
+        lines.append(f'camera_connect_failures_total{{kind="{source}",camera_id="{camera_id}"}} '
+                     f'{streamer.connect_failure_count()}')
+
+    header('camera_last_frame_age_seconds', 'gauge', 'Seconds since the newest published frame')
+    for source, camera_id, streamer, _ in stats:
+        age = streamer.last_frame_age()
+        if age is not None:
+            lines.append(f'camera_last_frame_age_seconds{{kind="{source}",camera_id="{camera_id}"}} {age:.3f}')
+
+    header('camera_circuit_state', 'gauge', 'Reconnect circuit breaker: 0 closed, 1 open, 2 half-open')
+    for source, camera_id, _, values in stats:
+        lines.append(f'camera_circuit_state{{kind="{source}",camera_id="{camera_id}"}} '
+                     f'{STATE_CODES[values["circuit"]["state"]]}')
+
+    header('camera_encode_seconds', 'histogram', 'Time to resize and encode one source frame')
+    for source, camera_id, streamer, _ in stats:
+        # Pooled streamers encode in a worker process and have no local histogram
+        histogram = getattr(streamer, 'encode_seconds', None)
+        if histogram is None:
+            continue
+        labels = f'kind="{source}",camera_id="{camera_id}"'
+        buckets, total, count = histogram.snapshot()
+        for bound, cumulative in buckets:
+            lines.append(f'camera_encode_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'camera_encode_seconds_bucket{{{labels},le="+Inf"}} {count}')
+        lines.append(f'camera_encode_seconds_sum{{{labels}}} {total:.6f}')
+        lines.append(f'camera_encode_seconds_count{{{labels}}} {count}')
+
+    return '\n'.join(lines) + '\n'
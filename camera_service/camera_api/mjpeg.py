@@ -0,0 +1,162 @@
+"""JPEG / MJPEG helpers that work on raw bytes without decoding images"""
+import re
+from typing import List, Optional, Tuple
+
+# Start-of-frame markers that carry the image dimensions (baseline, progressive, ...)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# Markers without a length field
+_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8}
+
+
+def jpeg_dimensions(data) -> Optional[Tuple[int, int]]:
+    """Return (width, height) from a JPEG's SOF header, or None if not found.
+
+    Only the marker segments before the image data are walked, so this costs a
+    few dozen byte reads instead of a full ``cv2.imdecode``.
+    """
+    size = len(data)
+    if size < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    i = 2
+    while i + 4 <= size:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            # Fill byte
+            i += 1
+            continue
+        if marker in _STANDALONE_MARKERS:
+            i += 2
+            continue
+        if marker == 0xDA or marker == 0xD9:
+            # Start of scan / end of image reached without a SOF
+            return None
+        length = (data[i + 2] << 8) | data[i + 3]
+        if marker in _SOF_MARKERS:
+            if i + 9 > size:
+                return None
+            height = (data[i + 5] << 8) | data[i + 6]
+            width = (data[i + 7] << 8) | data[i + 8]
+            return width, height
+        i += 2 + length
+    return None
+
+
+SOI = b'\xff\xd8'
+EOI = b'\xff\xd9'
+_CONTENT_LENGTH = re.compile(rb'content-length:\s*(\d+)', re.IGNORECASE)
+
+
+class MJPEGParser:
+    """Incremental splitter for multipart MJPEG (IP Webcam, DroidCam) byte streams.
+
+    Chunks are appended to one ``bytearray`` and every search resumes where the
+    previous one stopped, so total work is linear in the stream length. When a
+    part announces ``Content-Length`` the body is sliced by length; otherwise
+    (or if the length turns out wrong) the parser falls back to scanning for the
+    JPEG end-of-image marker. A source found to overstate its lengths (the next
+    part begins before the announced end) is split on end-of-image markers from
+    then on, so its frames are not held back waiting for bytes that never come.
+    """
+
+    def __init__(self, max_buffer: int = 4 * 1024 * 1024):
+        self.max_buffer = max_buffer
+        self._buf = bytearray()
+        self._scan = 0          # resume offset for the SOI / EOI search
+        self._start = -1        # offset of the current frame's SOI, -1 if none yet
+        self._length = None     # Content-Length of the current part, if announced
+        self._trust_length = True
+
+    def feed(self, chunk) -> List[bytes]:
+        """Add a chunk and return every complete JPEG it finishes"""
+        buf = self._buf
+        buf += chunk
+        frames = []
+        while True:
+            if self._start < 0:
+                soi = buf.find(SOI, self._scan)
+                if soi < 0:
+                    # Keep one byte in case the marker straddles chunks
+                    self._scan = max(0, len(buf) - 1)
+                    if len(buf) > self.max_buffer:
+                        self._reset()
+                    break
+                self._start = soi
+                self._length = self._content_length(buf, soi) if self._trust_length else None
+                if self._length is not None and self._length > self.max_buffer:
+                    self._length = None
+                self._scan = soi + 2
+
+            start = self._start
+            if self._length is not None:
+                end = start + self._length
+                if len(buf) < end:
+                    # Still short of the announced length, unless it was
+                    # overstated and the next part has already begun
+                    end = self._early_end(buf)
+                    if end < 0:
+                        break
+                    # This source overstates its lengths; split on EOI from now on
+                    self._trust_length = False
+                    self._emit(frames, end)
+                    continue
+                if buf[end - 2:end] == EOI:
+                    self._emit(frames, end)
+                    continue
+                # Bogus Content-Length; scan for the EOI marker instead
+                self._length = None
+
+            eoi = buf.find(EOI, self._scan)
+            if eoi < 0:
+                self._scan = max(start + 2, len(buf) - 1)
+                if len(buf) > self.max_buffer:
+                    self._reset()
+                break
+            self._emit(frames, eoi + 2)
+        return frames
+
+    def _early_end(self, buf):
+        """End of the current frame if the next part began short of its Content-Length, else -1.
+
+        Only an EOI followed by the next part's boundary counts; one inside the
+        body (e.g. of an embedded thumbnail) is followed by more JPEG data.
+        """
+        while True:
+            eoi = buf.find(EOI, self._scan)
+            if eoi < 0:
+                self._scan = max(self._start + 2, len(buf) - 1)
+                return -1
+            end = eoi + 2
+            after = end
+            while after < len(buf) and buf[after] in b'\r\n':
+                after += 1
+            if after + 2 > len(buf):
+                # Not enough data yet to tell; look at this EOI again next time
+                self._scan = eoi
+                return -1
+            if buf.startswith(b'--', after):
+                return end
+            self._scan = end
+
+    def _emit(self, frames, end):
+        with memoryview(self._buf) as view:
+            frames.append(bytes(view[self._start:end]))
+        del self._buf[:end]
+        self._start = -1
+        self._length = None
+        self._scan = 0
+
+    def _reset(self):
+        self._buf.clear()
+        self._start = -1
+        self._length = None
+        self._scan = 0
+
+    @staticmethod
+    def _content_length(buf, soi):
+        # Part headers sit between the previous frame and this SOI
+        match = None
+        for match in _CONTENT_LENGTH.finditer(buf, 0, soi):
+            pass
+        return int(match.group(1)) if match else None
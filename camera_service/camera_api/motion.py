@@ -0,0 +1,41 @@
+"""Cheap scene-change detection for skipping re-encodes of static frames"""
+import cv2
+import numpy as np
+
+# Frames are compared at this size in grayscale; area averaging also smooths
+# out most sensor noise
+SAMPLE_SIZE = (80, 45)
+# A sample pixel counts as changed when its gray level moves by more than this
+PIXEL_DELTA = 12
+
+
+class SceneChangeDetector:
+    """Decides whether a frame differs enough from the last encoded one.
+
+    ``threshold`` is the percentage of sample pixels that must change; 0 makes
+    every frame a change. Frames are compared with the reference taken at the
+    last change rather than with their predecessor, so slow movement adds up
+    until it crosses the threshold.
+    """
+
+    def __init__(self, threshold=0.5):
+        self.threshold = threshold
+        self._reference = None
+
+    def changed(self, frame):
+        """True if ``frame`` should be encoded; it then becomes the new reference"""
+        # Subsample with a strided view first: area-averaging the full frame
+        # would cost more than the check saves
+        step = max(1, frame.shape[1] // (SAMPLE_SIZE[0] * 4))
+        small = cv2.resize(frame[::step, ::step], SAMPLE_SIZE, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        reference = self._reference
+        if reference is not None and self.threshold > 0:
+            moved = np.count_nonzero(cv2.absdiff(gray, reference) > PIXEL_DELTA)
+            if moved * 100.0 < self.threshold * gray.size:
+                return False
+        self._reference = gray
+        return True
+
+    def reset(self):
+        self._reference = None
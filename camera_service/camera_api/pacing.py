@@ -0,0 +1,61 @@
+"""Deadline-based frame pacing for capture loops and viewers"""
+import math
+
+# Used when the capture does not report a usable FPS (common with RTSP)
+DEFAULT_SOURCE_FPS = 25.0
+
+
+class FramePacer:
+    """Hands out frame slots at a fixed rate against a monotonic clock.
+
+    Slots are scheduled from the previous deadline rather than from "now", so
+    the rate does not drift with processing time. When the caller falls more
+    than a slot behind, missed slots are dropped instead of being sent in a
+    burst.
+    """
+
+    def __init__(self, fps):
+        self.interval = 1.0 / fps if fps else 0.0
+        self.next_deadline = 0.0
+
+    def delay(self, now):
+        """Seconds until the next slot opens (0 when it is already due)"""
+        return max(0.0, self.next_deadline - now)
+
+    def due(self, now):
+        return now >= self.next_deadline
+
+    def mark(self, now):
+        """Consume the current slot"""
+        self.next_deadline += self.interval
+        if self.next_deadline <= now:
+            self.next_deadline = now + self.interval
+
+
+def source_fps(value):
+    """Sanitize ``CAP_PROP_FPS``: RTSP sources often report 0, NaN or 90000"""
+    if value is None or math.isnan(value) or not 1 <= value <= 120:
+        return DEFAULT_SOURCE_FPS
+    return float(value)
+
+
+def output_fps(source):
+    """Rate a streamer should encode at: the source rate capped by CAMERA_TARGET_FPS"""
+    from django.conf import settings
+    return min(source, float(settings.CAMERA_TARGET_FPS))
+
+
+def viewer_fps(value=None):
+    """Per-viewer send rate from ``?fps=``, falling back to CAMERA_VIEWER_FPS.
+
+    None means "every frame the streamer produces".
+    """
+    from django.conf import settings
+    default = getattr(settings, 'CAMERA_VIEWER_FPS', None)
+    try:
+        fps = float(value) if value else default
+    except ValueError:
+        fps = default
+    if not fps:
+        return None
+    return max(1.0, min(fps, float(settings.CAMERA_TARGET_FPS)))
@@ -0,0 +1,22 @@
+"""Placeholder frame sent to viewers of a camera whose circuit is open"""
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+from .frame_bus import mjpeg_part
+from .renditions import RENDITIONS
+
+
+@lru_cache(maxsize=None)
+def placeholder_part(rendition):
+    """Multipart part with a "camera offline" card at the rendition's size (built once)"""
+    spec = RENDITIONS[rendition]
+    image = np.full((spec.height, spec.width, 3), 40, dtype=np.uint8)
+    scale = spec.width / 640
+    for text, y, size in (('Camera offline', 0.45, 1.2), ('Reconnecting automatically...', 0.62, 0.7)):
+        (width, _), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, size * scale, 2)
+        cv2.putText(image, text, ((spec.width - width) // 2, int(spec.height * y)),
+                    cv2.FONT_HERSHEY_SIMPLEX, size * scale, (200, 200, 200), 2, cv2.LINE_AA)
+    ret, jpeg = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 70])
+    return mjpeg_part(jpeg.tobytes())
@@ -0,0 +1,342 @@
+"""Multi-process capture pool for RTSP cameras.
+
+With ``CAMERA_POOL_WORKERS > 0`` cameras are sharded across that many worker
+processes. Each worker runs the ordinary CameraStreamer loop for its cameras, so
+resize/encode work of different shards never contends on one GIL. Encoded
+frames come back through a per-camera shared-memory ring; over the queue the
+worker only sends small ``(camera_id, rendition, seq)`` notices, never frame
+bytes. In the serving process a dispatcher thread per worker copies each new
+frame out of the ring into the camera's local FrameBus for fan-out. A notice
+with seq 0 is a keep-alive: the serving side republishes the frame it has.
+"""
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+from .circuit import CLOSED, circuit_snapshot
+from .frame_channel import RENDITION_NAMES, SharedFrameChannel
+from .metrics import Counter
+from .renditions import make_buses
+from .streamers import CameraStreamer, FrameSource, camera_circuit
+
+logger = logging.getLogger('camera_api')
+
+# ---------------------------------------------------------------------------
+# Worker process side
+
+
+class _RingBus:
+    """Worker-side stand-in for FrameBus that publishes into the shared ring"""
+
+    def __init__(self, channel, index, camera_id, notices):
+        self.channel = channel
+        self.index = index
+        self.camera_id = camera_id
+        self.notices = notices
+        self.seq = 0
+        self._frame = None
+        self.write_failures = 0
+
+    @property
+    def subscribers(self):
+        if self.channel.released:
+            return 0
+        return self.channel.get_subscribers(self.index)
+
+    def publish(self, frame):
+        self.seq += 1
+        self._frame = frame
+        if self.channel.released:
+            return self.seq
+        if self.channel.write(self.index, self.seq, frame):
+            self.notices.put((self.camera_id, self.index, self.seq))
+        else:
+            self.write_failures += 1
+            if self.write_failures % 100 == 1:
+                logger.warning(f"Camera {self.camera_id}: dropped a {len(frame)} byte {RENDITION_NAMES[self.index]} "
+                               f"frame too large for shared memory ({self.write_failures} so far)")
+        return self.seq
+
+    def republish(self):
+        # The serving side still has this frame; it only needs the nudge
+        if self._frame is None:
+            return None
+        self.notices.put((self.camera_id, self.index, 0))
+        return self.seq
+
+    def close(self):
+        if not self.channel.released and not self.channel.closed:
+            self.channel.mark_closed()
+            self.notices.put((self.camera_id, -1, 0))
+
+
+class _WorkerCameraStreamer(CameraStreamer):
+    """CameraStreamer whose buses and last_access live in shared memory"""
+
+    def __init__(self, camera_id, rtsp_url, channel, notices):
+        self.channel = channel
+        super().__init__(camera_id, rtsp_url)
+        self.buses = {
+            name: _RingBus(channel, index, camera_id, notices)
+            for index, name in enumerate(RENDITION_NAMES)
+        }
+        # Carry on from the breaker state the serving process handed over
+        self.circuit.restore(*channel.read_circuit_fields())
+
+    @property
+    def last_access(self):
+        # Refreshed by viewers in the serving process
+        return self.channel.last_access
+
+    @last_access.setter
+    def last_access(self, value):
+        self.channel.last_access = value
+
+    def _process_frame(self, frame):
+        super()._process_frame(frame)
+        self._write_stats()
+
+    def _circuit_changed(self):
+        if self.channel.released:
+            return
+        self.channel.write_circuit(*self.circuit.fields())
+        # No frames flow while the source is down; keep the counters current anyway
+        self._write_stats()
+
+    def _write_stats(self):
+        if self.channel.released:
+            return
+        self.channel.write_stats(self.capture_meter.rate, self.encode_meter.rate, self.dropped_frames,
+                                 self.source_fps, self.reconnects.value, self.connect_failures.value)
+
+
+def _worker_main(commands, notices):
+    """Entry point of a pool worker process"""
+    streamers = {}
+    while True:
+        command = commands.get()
+        if command is None:
+            break
+        action, camera_id = command[0], command[1]
+        old = streamers.pop(camera_id, None)
+        if old is not None:
+            old.stop()
+            # Even if a capture thread outlived the join (stuck in a read): it
+            # skips its last writes once the mapping is released
+            try:
+                old.channel.close()
+            except BufferError:
+                logger.warning(f"Camera {camera_id}: shared memory still in use by its capture thread")
+        if action == 'start':
+            rtsp_url, shm_name = command[2], command[3]
+            streamer = _WorkerCameraStreamer(camera_id, rtsp_url, SharedFrameChannel(shm_name), notices)
+            streamer.start()
+            streamers[camera_id] = streamer
+    for streamer in streamers.values():
+        streamer.stop()
+
+
+# ---------------------------------------------------------------------------
+# Serving process side
+
+
+class PooledCameraStreamer(FrameSource):
+    """Serving-process handle for a camera captured in a pool worker"""
+
+    def __init__(self, camera_id, rtsp_url, worker):
+        self.camera_id = camera_id
+        self.rtsp_url = rtsp_url
+        self.worker = worker
+        self.instance_id = uuid.uuid4().hex[:12]
+        self.buses = make_buses()
+        self.channel = SharedFrameChannel(create=True)
+        # Outlives this handle and whichever worker runs the camera: handed to
+        # the worker through the channel and taken back on release
+        self.circuit = camera_circuit('rtsp', camera_id, rtsp_url)
+        self.channel.write_circuit(*self.circuit.fields())
+        self.running = False
+        self._lock = threading.Lock()
+        self.last_access = time.time()
+        # Counted here, where viewers are served; encode timing stays in the worker
+        self.bytes_out = Counter()
+
+    @property
+    def last_access(self):
+        return self._last_access
+
+    @last_access.setter
+    def last_access(self, value):
+        self._last_access = value
+        with self._lock:
+            # The channel is gone once the streamer has been released
+            if self.channel is not None:
+                self.channel.last_access = value
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.worker.attach(self)
+            logger.info(f"Started pooled streamer for camera {self.camera_id} on worker {self.worker.index}")
+
+    def stop(self):
+        if self.running:
+            self.worker.commands.put(('stop', self.camera_id))
+        self._release()
+        logger.info(f"Stopped pooled streamer for camera {self.camera_id}")
+
+    def stats(self):
+        """Pipeline counters as last reported by the worker process"""
+        with self._lock:
+            if self.channel is None:
+                capture_fps, encode_fps, dropped_frames, source_fps = 0.0, 0.0, 0, 0.0
+            else:
+                capture_fps, encode_fps, dropped_frames, source_fps = self.channel.read_stats()[:4]
+        return {
+            'camera_id': self.camera_id,
+            'running': self.running,
+            'worker': self.worker.index,
+            'source_fps': source_fps,
+            'capture_fps': round(capture_fps, 2),
+            'encode_fps': round(encode_fps, 2),
+            'dropped_frames': dropped_frames,
+            'viewers': sum(bus.subscribers for bus in self.buses.values()),
+            'circuit': self.circuit_state(),
+        }
+
+    def reconnect_count(self):
+        with self._lock:
+            return self.channel.read_stats()[4] if self.channel is not None else 0
+
+    def connect_failure_count(self):
+        with self._lock:
+            return self.channel.read_stats()[5] if self.channel is not None else 0
+
+    def circuit_state(self):
+        with self._lock:
+            if self.channel is None:
+                return circuit_snapshot(CLOSED, 0, 0.0)
+            return self.channel.read_circuit()
+
+    def sync_subscribers(self):
+        with self._lock:
+            if self.channel is None:
+                return
+            for index, name in enumerate(RENDITION_NAMES):
+                self.channel.set_subscribers(index, self.buses[name].subscribers)
+
+    def on_notice(self, index, seq):
+        """Handle a worker notice: a new frame in the ring, a keep-alive (seq 0) or shutdown (index -1)"""
+        if index < 0:
+            logger.info(f"Pool worker closed camera {self.camera_id}")
+            self._release()
+            return
+        if seq == 0:
+            # Same bytes again: frame_seq stays put so snapshot ETags still match
+            self.buses[RENDITION_NAMES[index]].republish()
+            return
+        with self._lock:
+            if self.channel is None:
+                return
+            frame = self.channel.read(index, seq)
+        if frame is not None:
+            self.buses[RENDITION_NAMES[index]].publish(frame)
+
+    def _release(self):
+        self.running = False
+        self._close_buses()
+        self.worker.detach(self)
+        with self._lock:
+            if self.channel is not None:
+                self.circuit.restore(*self.channel.read_circuit_fields())
+                self.channel.close()
+                self.channel.unlink()
+                self.channel = None
+
+
+class _PoolWorker:
+    """Serving-process handle for one worker process and its dispatcher thread"""
+
+    def __init__(self, index, context):
+        self.index = index
+        self.commands = context.Queue()
+        self.notices = context.Queue()
+        self.process = context.Process(
+            target=_worker_main, args=(self.commands, self.notices),
+            name=f'camera-pool-{index}', daemon=True,
+        )
+        self.streamers = {}
+        self.dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+
+    def start(self):
+        self.process.start()
+        self.dispatcher.start()
+
+    def attach(self, streamer):
+        self.streamers[streamer.camera_id] = streamer
+        streamer.sync_subscribers()
+        self.commands.put(('start', streamer.camera_id, streamer.rtsp_url, streamer.channel.name))
+
+    def detach(self, streamer):
+        if self.streamers.get(streamer.camera_id) is streamer:
+            del self.streamers[streamer.camera_id]
+
+    def _dispatch(self):
+        last_sync = 0.0
+        while True:
+            try:
+                camera_id, index, seq = self.notices.get(timeout=0.25)
+            except queue.Empty:
+                camera_id = None
+            if camera_id is not None:
+                streamer = self.streamers.get(camera_id)
+                if streamer is not None:
+                    streamer.on_notice(index, seq)
+            # Mirror local subscriber counts so workers encode only watched renditions
+            now = time.monotonic()
+            if now - last_sync >= 0.25:
+                last_sync = now
+                for streamer in list(self.streamers.values()):
+                    streamer.sync_subscribers()
+
+
+class CameraProcessPool:
+    """Shards RTSP cameras across worker processes (least-loaded placement)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._workers = []
+
+    @property
+    def size(self):
+        return getattr(settings, 'CAMERA_POOL_WORKERS', 0)
+
+    def _ensure_workers(self):
+        if not self._workers:
+            # spawn: safe with the serving process's threads, and the Windows default
+            context = multiprocessing.get_context('spawn')
+            for index in range(self.size):
+                worker = _PoolWorker(index, context)
+                worker.start()
+                self._workers.append(worker)
+            logger.info(f"Started camera process pool with {self.size} workers")
+
+    def create_streamer(self, camera_id, rtsp_url):
+        with self._lock:
+            self._ensure_workers()
+            worker = min(self._workers, key=lambda w: len(w.streamers))
+        return PooledCameraStreamer(camera_id, rtsp_url, worker)
+
+    def shutdown(self):
+        with self._lock:
+            for worker in self._workers:
+                worker.commands.put(None)
+                worker.process.join(timeout=5)
+            self._workers = []
+
+
+camera_pool = CameraProcessPool()
@@ -0,0 +1,46 @@
+"""Rendition ladder that camera streamers can serve"""
+from collections import namedtuple
+
+from .frame_bus import FrameBus
+
+Rendition = namedtuple('Rendition', ['name', 'width', 'height', 'quality', 'max_bytes'])
+
+# Ordered smallest to largest. ``max_bytes`` is the largest JPEG a rendition
+# carries (and what its shared-memory ring slots hold); frames encoded at these
+# sizes and qualities stay well under it
+RENDITIONS = {
+    'thumb': Rendition('thumb', 320, 180, 50, 64 * 1024),
+    'sd': Rendition('sd', 640, 360, 60, 160 * 1024),
+    'hd': Rendition('hd', 960, 540, 75, 320 * 1024),
+}
+DEFAULT_RENDITION = 'sd'
+
+
+def pick_rendition(quality=None, width=None):
+    """Map ``?quality=`` / ``?width=`` query values to a rendition name"""
+    if quality in RENDITIONS:
+        return quality
+    if width:
+        try:
+            width = int(width)
+        except (TypeError, ValueError):
+            return DEFAULT_RENDITION
+        for rendition in RENDITIONS.values():
+            if rendition.width >= width:
+                return rendition.name
+        return list(RENDITIONS)[-1]
+    return DEFAULT_RENDITION
+
+
+def make_buses():
+    return {name: FrameBus() for name in RENDITIONS}
+
+
+def active_renditions(buses):
+    """Renditions worth encoding right now.
+
+    Only renditions with at least one subscriber are produced. With no
+    subscribers at all (e.g. only ``get_frame`` callers) the default one is.
+    """
+    active = [RENDITIONS[name] for name, bus in buses.items() if bus.subscribers]
+    return active or [RENDITIONS[DEFAULT_RENDITION]]
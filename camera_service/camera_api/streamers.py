@@ -0,0 +1,609 @@
+"""Background camera streamers and their per-process managers"""
+import cv2
+import threading
+import time
+import logging
+import uuid
+from typing import Optional
+
+import numpy as np
+import requests
+from django.conf import settings
+
+from .circuit import CLOSED, OPEN, CircuitBreaker
+from .encoders import get_encoder
+from .metrics import Counter, Histogram, RateMeter
+from .mjpeg import MJPEGParser, jpeg_dimensions
+from .motion import SceneChangeDetector
+from .placeholder import placeholder_part
+from .pacing import DEFAULT_SOURCE_FPS, FramePacer, output_fps, source_fps
+from .renditions import DEFAULT_RENDITION, active_renditions, make_buses
+
+logger = logging.getLogger('camera_api')
+
+
+def idle_grace():
+    """Seconds a streamer keeps running without viewers"""
+    return getattr(settings, 'CAMERA_IDLE_GRACE', 90)
+
+
+# A new connection must deliver frames this long before it closes the circuit;
+# one that drops sooner backs off like a failed connect
+STABLE_CONNECTION_SECONDS = 10.0
+
+
+_circuits_lock = threading.Lock()
+# (kind, camera id) -> (source url, breaker)
+_circuits = {}
+
+
+def camera_circuit(kind, camera_id, url):
+    """Circuit breaker of one camera, shared by every streamer created for it.
+
+    Streamers are recreated after the idle grace or for a snapshot; the breaker
+    outlives them, so a camera known to be offline stays open and its next
+    viewer gets the placeholder at once. A changed source URL starts closed.
+    """
+    with _circuits_lock:
+        current = _circuits.get((kind, camera_id))
+        if current is not None and current[0] == url:
+            return current[1]
+        circuit = CircuitBreaker(**getattr(settings, 'CAMERA_CIRCUIT', {}))
+        _circuits[(kind, camera_id)] = (url, circuit)
+        return circuit
+
+
+def camera_encoder(group, camera_id):
+    """JPEG encoder configured for a camera; ``group`` is 'cameras' or 'mobile_cameras'"""
+    config = getattr(settings, 'CAMERA_JPEG_ENCODER', {})
+    overrides = config.get(group, {})
+    name = overrides.get(camera_id, overrides.get(str(camera_id), config.get('default', 'opencv')))
+    return get_encoder(name)
+
+
+def scene_change_settings():
+    return {
+        'enabled': True, 'threshold': 0.5, 'keepalive_fps': 1, 'max_static_seconds': 10, 'cameras': {},
+        **getattr(settings, 'CAMERA_SCENE_CHANGE', {}),
+    }
+
+
+def scene_threshold(camera_id):
+    """Scene-change threshold for one camera (per-camera override or the default)"""
+    config = scene_change_settings()
+    overrides = config['cameras']
+    return overrides.get(camera_id, overrides.get(str(camera_id), config['threshold']))
+
+
+class FrameSource:
+    """Frame access shared by all streamers: one FrameBus per rendition in ``self.buses``"""
+
+    # Monotonic time the current source connection was made, None once it proved stable
+    _connected_at = None
+    _source_name = None
+
+    def _close_buses(self):
+        for bus in self.buses.values():
+            bus.close()
+
+    def get_frame(self, rendition=DEFAULT_RENDITION):
+        self.last_access = time.time()
+        return self.buses[rendition].latest()[1]
+
+    def wait_for_frame(self, last_seq, timeout=1.0, rendition=DEFAULT_RENDITION):
+        """Block until a newer frame than ``last_seq`` is available"""
+        self.last_access = time.time()
+        return self.buses[rendition].wait(last_seq, timeout)
+
+    async def wait_for_frame_async(self, last_seq, timeout=1.0, rendition=DEFAULT_RENDITION):
+        """Await a newer frame than ``last_seq`` without holding a thread"""
+        self.last_access = time.time()
+        return await self.buses[rendition].wait_async(last_seq, timeout)
+
+    def last_frame_age(self):
+        """Seconds since any rendition last published, or None before the first frame"""
+        published = [bus.published_at for bus in self.buses.values() if bus.published_at is not None]
+        return time.time() - max(published) if published else None
+
+    def reconnect_count(self):
+        """Times an established source connection was lost"""
+        return self.reconnects.value
+
+    def connect_failure_count(self):
+        """Connection attempts that failed"""
+        return self.connect_failures.value
+
+    def circuit_state(self):
+        """Circuit snapshot: state name, consecutive failures, seconds to next retry"""
+        return self.circuit.snapshot()
+
+    def circuit_open(self):
+        return self.circuit_state()['state'] == OPEN
+
+    def placeholder_part(self, rendition=DEFAULT_RENDITION):
+        """"Camera offline" part while the circuit is open, else None"""
+        return placeholder_part(rendition) if self.circuit_open() else None
+
+    def _await_retry(self):
+        """True if a connect attempt is allowed now; otherwise sleeps a little.
+
+        Sleeps at most a second so idle-timeout and stop() stay responsive
+        during long backoffs.
+        """
+        if self.circuit.allow():
+            return True
+        time.sleep(min(1.0, self.circuit.wait_time()))
+        return False
+
+    def _connect_failed(self, name):
+        self.connect_failures.inc()
+        self._record_failure(name)
+
+    def _record_failure(self, name):
+        was_closed = self.circuit.state == CLOSED
+        delay = self.circuit.record_failure()
+        if self.circuit.is_open:
+            if was_closed:
+                logger.warning(f"Circuit opened for {name} after {self.circuit.failures} failures; "
+                               f"retrying in {delay:.1f}s")
+            else:
+                logger.info(f"{name} still failing; retrying in {delay:.1f}s")
+        else:
+            logger.info(f"Retrying {name} in {delay:.1f}s")
+        self._circuit_changed()
+
+    def _connect_succeeded(self, name):
+        # The circuit only closes once frames have flowed for a while (_frame_received)
+        self._connected_at = time.monotonic()
+        self._source_name = name
+
+    def _frame_received(self):
+        """Close the circuit once the current connection has delivered frames long enough"""
+        if self._connected_at is None or time.monotonic() - self._connected_at < STABLE_CONNECTION_SECONDS:
+            return
+        self._connected_at = None
+        if self.circuit.failures:
+            logger.info(f"Circuit closed for {self._source_name}")
+        self.circuit.record_success()
+        self._circuit_changed()
+
+    def _source_lost(self, name):
+        """An established connection ended; the caller reconnects when the circuit allows"""
+        self.reconnects.inc()
+        if self._connected_at is not None:
+            # Dropped before it proved stable (a source that accepts and then
+            # fails right away): back off instead of reconnecting in a loop
+            self._connected_at = None
+            self._record_failure(name)
+
+    def _circuit_changed(self):
+        """Hook for streamers that publish circuit state elsewhere"""
+
+
+class CameraStreamer(FrameSource):
+    """Non-blocking camera streamer with automatic reconnection.
+
+    Runs as a two-stage pipeline: the capture thread reads continuously and
+    keeps only the newest raw frame, and the encoder thread takes whatever is
+    newest when its pacing slot opens. A slow encode therefore never delays
+    ``cap.read()`` (so the RTSP buffer cannot back up), and stale frames are
+    overwritten instead of queued.
+    """
+    
+    def __init__(self, camera_id, rtsp_url):
+        self.camera_id = camera_id
+        self.rtsp_url = rtsp_url
+        # Distinguishes this run's frame seqs from a restarted streamer's
+        self.instance_id = uuid.uuid4().hex[:12]
+        self.cap: Optional[cv2.VideoCapture] = None
+        self.buses = make_buses()
+        self.running: bool = False
+        self.thread: Optional[threading.Thread] = None
+        self.encoder_thread: Optional[threading.Thread] = None
+        self.last_access = time.time()
+        self.circuit = camera_circuit('rtsp', camera_id, rtsp_url)
+        self.source_fps = DEFAULT_SOURCE_FPS
+        self.pacer = FramePacer(output_fps(self.source_fps))
+        # Newest raw frame handed from the capture stage to the encoder stage
+        self._raw_cond = threading.Condition()
+        self._raw_frame = None
+        self._raw_seq = 0
+        self.capture_meter = RateMeter()
+        self.encode_meter = RateMeter()
+        self.dropped_frames = 0
+        self.encode_seconds = Histogram()
+        self.bytes_out = Counter()
+        self.reconnects = Counter()
+        self.connect_failures = Counter()
+        self.encoder = camera_encoder('cameras', camera_id)
+        # Static scenes: skip the encode and resend the last JPEG now and then
+        self.scene = SceneChangeDetector(scene_threshold(camera_id))
+        self.skipped_frames = 0
+        self._fresh_renditions = set()
+        self._encoded_at = 0.0
+        self._keepalive_at = 0.0
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self._update, daemon=True)
+            self.encoder_thread = threading.Thread(target=self._encode_loop, daemon=True)
+            self.thread.start()
+            self.encoder_thread.start()
+            logger.info(f"Started streamer for camera {self.camera_id}")
+
+    def stop(self):
+        self.running = False
+        self._close_buses()
+        with self._raw_cond:
+            self._raw_cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+        if self.encoder_thread is not None:
+            self.encoder_thread.join(timeout=2.0)
+        logger.info(f"Stopped streamer for camera {self.camera_id}")
+
+    def stats(self):
+        """Pipeline counters for this camera"""
+        return {
+            'camera_id': self.camera_id,
+            'running': self.running,
+            'connected': self.cap is not None,
+            'source_fps': self.source_fps,
+            'capture_fps': round(self.capture_meter.rate, 2),
+            'encode_fps': round(self.encode_meter.rate, 2),
+            'dropped_frames': self.dropped_frames,
+            'skipped_frames': self.skipped_frames,
+            'viewers': sum(bus.subscribers for bus in self.buses.values()),
+            'circuit': self.circuit_state(),
+        }
+
+    def _connect_camera(self):
+        try:
+            cap = cv2.VideoCapture(self.rtsp_url, cv2.CAP_FFMPEG)
+            cap.set(cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, 5000)
+            cap.set(cv2.CAP_PROP_READ_TIMEOUT_MSEC, 5000)
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            
+            if cap.isOpened():
+                ret, frame = cap.read()
+                if ret and frame is not None:
+                    self.source_fps = source_fps(cap.get(cv2.CAP_PROP_FPS))
+                    self.pacer = FramePacer(output_fps(self.source_fps))
+                    logger.info(f"Connected to camera {self.camera_id} ({self.source_fps:g} FPS source)")
+                    return cap
+                cap.release()
+            return None
+        except Exception as e:
+            logger.error(f"Error connecting camera {self.camera_id}: {e}")
+            return None
+
+    def _update(self):
+        """Capture stage: read as fast as the source delivers, keep only the newest frame"""
+        while self.running:
+            if time.time() - self.last_access > idle_grace():
+                logger.info(f"Stopping camera {self.camera_id} due to inactivity")
+                break
+
+            if self.cap is None:
+                if not self._await_retry():
+                    continue
+                self.cap = self._connect_camera()
+                if self.cap is None:
+                    self._connect_failed(f"camera {self.camera_id}")
+                    continue
+                self._connect_succeeded(f"camera {self.camera_id}")
+
+            try:
+                ret, frame = self.cap.read()
+                if ret and frame is not None:
+                    self.capture_meter.tick()
+                    self._frame_received()
+                    with self._raw_cond:
+                        self._raw_frame = frame
+                        self._raw_seq += 1
+                        self._raw_cond.notify()
+                else:
+                    if self.cap is not None:
+                        self.cap.release()
+                    self.cap = None
+                    self._source_lost(f"camera {self.camera_id}")
+            except Exception as e:
+                logger.error(f"Error reading camera {self.camera_id}: {e}")
+                if self.cap is not None:
+                    self.cap.release()
+                self.cap = None
+                self._source_lost(f"camera {self.camera_id}")
+        
+        if self.cap is not None:
+            self.cap.release()
+        self.running = False
+        with self._raw_cond:
+            self._raw_cond.notify_all()
+        self._close_buses()
+
+    def _encode_loop(self):
+        """Encoder stage: on each pacing slot, encode the newest raw frame"""
+        last_seq = 0
+        while self.running:
+            delay = self.pacer.delay(time.monotonic())
+            if delay:
+                time.sleep(delay)
+            with self._raw_cond:
+                self._raw_cond.wait_for(lambda: self._raw_seq != last_seq or not self.running, 1.0)
+                if self._raw_seq == last_seq:
+                    continue
+                # Frames overwritten since the last encode were never encoded
+                self.dropped_frames += self._raw_seq - last_seq - 1
+                frame, last_seq = self._raw_frame, self._raw_seq
+            self.pacer.mark(time.monotonic())
+            try:
+                self._process_frame(frame)
+            except Exception as e:
+                logger.error(f"Error encoding camera {self.camera_id}: {e}")
+
+    def _process_frame(self, frame):
+        """Encode ``frame`` if the scene changed, else keep viewers alive with the last JPEG"""
+        now = time.monotonic()
+        # Only renditions someone is watching get encoded
+        renditions = active_renditions(self.buses)
+        if self._scene_changed(frame, now):
+            self._encode_frame(frame, renditions)
+            self._fresh_renditions = {rendition.name for rendition in renditions}
+            self._encoded_at = self._keepalive_at = now
+            return
+
+        self.skipped_frames += 1
+        # A rendition nobody watched at the last change has no current JPEG yet
+        stale = [rendition for rendition in renditions if rendition.name not in self._fresh_renditions]
+        if stale:
+            self._encode_frame(frame, stale)
+            self._fresh_renditions.update(rendition.name for rendition in stale)
+        keepalive_fps = scene_change_settings()['keepalive_fps']
+        if keepalive_fps and now - self._keepalive_at >= 1.0 / keepalive_fps:
+            self._keepalive_at = now
+            for rendition in renditions:
+                if rendition not in stale:
+                    self.buses[rendition.name].republish()
+
+    def _scene_changed(self, frame, now):
+        config = scene_change_settings()
+        if not config['enabled']:
+            return True
+        if now - self._encoded_at >= config['max_static_seconds']:
+            # Re-encode a real frame now and then so slow changes (clocks,
+            # daylight) never stay frozen
+            self.scene.reset()
+        return self.scene.changed(frame)
+
+    def _encode_frame(self, frame, renditions):
+        started = time.perf_counter()
+        for rendition in renditions:
+            # Aggressive resize for performance
+            resized = cv2.resize(frame, (rendition.width, rendition.height),
+                                 interpolation=cv2.INTER_NEAREST)
+            jpeg = self.encoder.encode(resized, rendition.quality)
+            if jpeg:
+                self.buses[rendition.name].publish(jpeg)
+        self.encode_seconds.observe(time.perf_counter() - started)
+        self.encode_meter.tick()
+
+class CameraManager:
+    _lock = threading.Lock()
+    _streamers = {}
+
+    @classmethod
+    def get_streamer(cls, camera_id, rtsp_url):
+        with cls._lock:
+            if camera_id not in cls._streamers or not cls._streamers[camera_id].running:
+                streamer = cls._create_streamer(camera_id, rtsp_url)
+                streamer.start()
+                cls._streamers[camera_id] = streamer
+            return cls._streamers[camera_id]
+
+    @classmethod
+    def is_running(cls, camera_id):
+        with cls._lock:
+            return camera_id in cls._streamers and cls._streamers[camera_id].running
+
+    @staticmethod
+    def _create_streamer(camera_id, rtsp_url):
+        if getattr(settings, 'CAMERA_POOL_WORKERS', 0) > 0:
+            # Capture/encode in a worker process; frames return via shared memory
+            from .process_pool import camera_pool
+            return camera_pool.create_streamer(camera_id, rtsp_url)
+        return CameraStreamer(camera_id, rtsp_url)
+    
+    @classmethod
+    def streamers(cls):
+        with cls._lock:
+            return list(cls._streamers.values())
+
+    @classmethod
+    def stop_streamer(cls, camera_id):
+        with cls._lock:
+            if camera_id in cls._streamers:
+                cls._streamers[camera_id].stop()
+                del cls._streamers[camera_id]
+
+camera_manager = CameraManager()
+
+
+class MobileCameraStreamer(FrameSource):
+    """HTTP/MJPEG streamer for mobile cameras"""
+    
+    def __init__(self, mobile_camera_id, stream_url):
+        self.mobile_camera_id = mobile_camera_id
+        self.stream_url = stream_url
+        self.buses = make_buses()
+        self.running: bool = False
+        self.thread: Optional[threading.Thread] = None
+        self.last_access = time.time()
+        self.passthrough_frames = 0
+        self.transcoded_frames = 0
+        self.pacer = FramePacer(output_fps(DEFAULT_SOURCE_FPS))
+        self.capture_meter = RateMeter()
+        self.encode_meter = RateMeter()
+        self.dropped_frames = 0
+        self.encode_seconds = Histogram()
+        self.bytes_out = Counter()
+        self.reconnects = Counter()
+        self.connect_failures = Counter()
+        self.circuit = camera_circuit('mobile', mobile_camera_id, stream_url)
+        self.encoder = camera_encoder('mobile_cameras', mobile_camera_id)
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self._update, daemon=True)
+            self.thread.start()
+            logger.info(f"Started mobile camera streamer {self.mobile_camera_id}")
+
+    def stop(self):
+        self.running = False
+        self._close_buses()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+        logger.info(f"Stopped mobile camera streamer {self.mobile_camera_id}")
+
+    def _update(self):
+        """Background thread to fetch frames from mobile camera"""
+        while self.running:
+            if time.time() - self.last_access > idle_grace():
+                logger.info(f"Stopping mobile camera {self.mobile_camera_id} due to inactivity")
+                break
+
+            if not self._await_retry():
+                continue
+
+            name = f"mobile camera {self.mobile_camera_id}"
+            connected = False
+            try:
+                response = requests.get(self.stream_url, stream=True, timeout=10)
+                
+                if response.status_code == 200:
+                    logger.info(f"Connected to mobile camera {self.mobile_camera_id}")
+                    self._connect_succeeded(name)
+                    connected = True
+                    parser = MJPEGParser()
+                    
+                    for chunk in response.iter_content(chunk_size=8192):
+                        if not self.running:
+                            break
+                        
+                        for jpg in parser.feed(chunk):
+                            self.capture_meter.tick()
+                            self._frame_received()
+                            # Phones push at their own rate; drop before any decode work
+                            now = time.monotonic()
+                            if not self.pacer.due(now):
+                                self.dropped_frames += 1
+                                continue
+                            self.pacer.mark(now)
+                            try:
+                                started = time.perf_counter()
+                                self._publish_renditions(jpg)
+                                self.encode_seconds.observe(time.perf_counter() - started)
+                                self.encode_meter.tick()
+                            except Exception as e:
+                                logger.error(f"Error processing frame: {e}")
+                                continue
+                else:
+                    logger.error(f"HTTP {response.status_code} from mobile camera {self.mobile_camera_id}")
+                    self._connect_failed(name)
+                    
+            except Exception as e:
+                logger.error(f"Error streaming mobile camera {self.mobile_camera_id}: {e}")
+                if not connected:
+                    self._connect_failed(name)
+            if connected and self.running:
+                # An established stream ended or failed; the next pass reconnects
+                self._source_lost(name)
+
+        self.running = False
+        self._close_buses()
+
+    def stats(self):
+        """Pipeline counters for this mobile camera"""
+        return {
+            'mobile_camera_id': self.mobile_camera_id,
+            'running': self.running,
+            'capture_fps': round(self.capture_meter.rate, 2),
+            'encode_fps': round(self.encode_meter.rate, 2),
+            'dropped_frames': self.dropped_frames,
+            'passthrough_frames': self.passthrough_frames,
+            'transcoded_frames': self.transcoded_frames,
+            'viewers': sum(bus.subscribers for bus in self.buses.values()),
+            'circuit': self.circuit_state(),
+        }
+
+    def _passthrough_dimensions(self, jpg):
+        """Source (width, height) if the JPEG may be forwarded untouched, else None"""
+        budget = settings.MOBILE_CAMERA_PASSTHROUGH
+        if not budget.get('enabled', True) or len(jpg) > budget['max_bytes']:
+            return None
+        dimensions = jpeg_dimensions(jpg)
+        if dimensions is None:
+            return None
+        width, height = dimensions
+        if width > budget['max_width'] or height > budget['max_height']:
+            return None
+        return dimensions
+
+    @staticmethod
+    def _fits(rendition, dimensions, size):
+        """Whether a source JPEG can stand in for ``rendition`` as it is"""
+        width, height = dimensions
+        return width <= rendition.width and height <= rendition.height and size <= rendition.max_bytes
+
+    def _publish_renditions(self, jpg):
+        """Publish one source JPEG to every active rendition"""
+        dimensions = self._passthrough_dimensions(jpg)
+        img = None
+        for rendition in active_renditions(self.buses):
+            # A frame within the passthrough budget that already fits the
+            # rendition goes out untouched: no decode, no resize, no re-encode.
+            # Smaller renditions still get a scaled copy
+            if dimensions and self._fits(rendition, dimensions, len(jpg)):
+                self.passthrough_frames += 1
+                self.buses[rendition.name].publish(jpg)
+                continue
+            if img is None:
+                img = cv2.imdecode(np.frombuffer(jpg, dtype=np.uint8), cv2.IMREAD_COLOR)
+                if img is None:
+                    return
+            self.transcoded_frames += 1
+            # Resize for efficient streaming
+            resized = cv2.resize(img, (rendition.width, rendition.height), interpolation=cv2.INTER_NEAREST)
+            jpeg = self.encoder.encode(resized, rendition.quality)
+            if jpeg:
+                self.buses[rendition.name].publish(jpeg)
+
+
+class MobileCameraManager:
+    _lock = threading.Lock()
+    _streamers = {}
+
+    @classmethod
+    def get_streamer(cls, mobile_camera_id, stream_url):
+        with cls._lock:
+            if mobile_camera_id not in cls._streamers or not cls._streamers[mobile_camera_id].running:
+                streamer = MobileCameraStreamer(mobile_camera_id, stream_url)
+                streamer.start()
+                cls._streamers[mobile_camera_id] = streamer
+            return cls._streamers[mobile_camera_id]
+    
+    @classmethod
+    def streamers(cls):
+        with cls._lock:
+            return list(cls._streamers.values())
+
+    @classmethod
+    def stop_streamer(cls, mobile_camera_id):
+        with cls._lock:
+            if mobile_camera_id in cls._streamers:
+                cls._streamers[mobile_camera_id].stop()
+                del cls._streamers[mobile_camera_id]
+
+
+mobile_camera_manager = MobileCameraManager()
@@ -0,0 +1,381 @@
+import queue
+import threading
+import time
+from unittest import mock
+
+import cv2
+import numpy as np
+from cameras.models import Camera
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from .circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from .frame_channel import RENDITION_NAMES, SharedFrameChannel
+from .mjpeg import MJPEGParser, jpeg_dimensions
+from .motion import SceneChangeDetector
+from .pacing import DEFAULT_SOURCE_FPS, FramePacer, output_fps, source_fps, viewer_fps
+from .process_pool import _WorkerCameraStreamer
+from .renditions import RENDITIONS
+from . import streamers, views
+from .streamers import CameraStreamer, MobileCameraStreamer, camera_circuit
+
+
+def make_jpeg(width, height, quality=80):
+    """A noisy JPEG, so its size grows with quality like a camera frame's"""
+    image = np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    return cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+def fake_jpeg(body):
+    return b'\xff\xd8' + body + b'\xff\xd9'
+
+
+def part(jpg, length=None, boundary=b'--edumi'):
+    """One multipart MJPEG part, announcing ``length`` (None: no Content-Length header)"""
+    headers = boundary + b'\r\nContent-Type: image/jpeg\r\n'
+    if length is not None:
+        headers += b'Content-Length: %d\r\n' % length
+    return headers + b'\r\n' + jpg + b'\r\n'
+
+
+class MJPEGParserTests(SimpleTestCase):
+    frames = [fake_jpeg(b'first frame'), fake_jpeg(b'second \xff\xd9 with a stray EOI'), fake_jpeg(b'third')]
+
+    def feed_all(self, stream, chunk_size):
+        parser = MJPEGParser()
+        frames = []
+        for offset in range(0, len(stream), chunk_size):
+            frames += parser.feed(stream[offset:offset + chunk_size])
+        return frames
+
+    def test_content_length_parts_survive_any_chunk_boundary(self):
+        stream = b''.join(part(jpg, len(jpg)) for jpg in self.frames)
+        for chunk_size in (1, 2, 3, 7, len(stream)):
+            self.assertEqual(self.feed_all(stream, chunk_size), self.frames, chunk_size)
+
+    def test_parts_without_content_length_split_on_eoi(self):
+        frames = [fake_jpeg(b'one'), fake_jpeg(b'two')]
+        stream = b''.join(part(jpg) for jpg in frames)
+        for chunk_size in (1, 5, len(stream)):
+            self.assertEqual(self.feed_all(stream, chunk_size), frames, chunk_size)
+
+    def test_understated_content_length_falls_back_to_eoi(self):
+        jpg = self.frames[0]
+        self.assertEqual(MJPEGParser().feed(part(jpg, len(jpg) - 4)), [jpg])
+
+    def test_overstated_content_length_ends_at_the_next_boundary(self):
+        stream = b''.join(part(jpg, len(jpg) + 100) for jpg in self.frames[::2])
+        self.assertEqual(self.feed_all(stream, 4), self.frames[::2])
+
+    def test_overstated_content_length_stops_holding_back_later_frames(self):
+        parser = MJPEGParser()
+        first, second = self.frames[0], self.frames[2]
+        self.assertEqual(parser.feed(part(first, len(first) + 100)), [])
+        self.assertEqual(parser.feed(part(second, len(second) + 100)), [first, second])
+        # Once the lengths proved wrong a frame comes out as soon as it ends
+        self.assertEqual(parser.feed(part(first, len(first) + 100)), [first])
+
+    def test_garbage_without_frames_is_bounded(self):
+        parser = MJPEGParser(max_buffer=1024)
+        self.assertEqual(parser.feed(b'\x00' * 4096), [])
+        self.assertLessEqual(len(parser._buf), 1024)
+        self.assertEqual(parser.feed(part(self.frames[0])), [self.frames[0]])
+
+    def test_jpeg_dimensions(self):
+        self.assertEqual(jpeg_dimensions(make_jpeg(64, 48)), (64, 48))
+        self.assertIsNone(jpeg_dimensions(b'not a jpeg'))
+
+
+class MobilePassthroughTests(SimpleTestCase):
+    def setUp(self):
+        self.streamer = MobileCameraStreamer(1, 'http://phone.invalid/video')
+        for bus in self.streamer.buses.values():
+            bus.subscribe()
+
+    def published_dimensions(self):
+        return {name: jpeg_dimensions(bus.latest()[1]) for name, bus in self.streamer.buses.items()}
+
+    def test_frame_passes_through_only_to_renditions_it_fits(self):
+        jpg = make_jpeg(480, 270, quality=30)
+        self.streamer._publish_renditions(jpg)
+        self.assertIs(self.streamer.buses['sd'].latest()[1], jpg)
+        self.assertIs(self.streamer.buses['hd'].latest()[1], jpg)
+        self.assertEqual(self.published_dimensions()['thumb'], (320, 180))
+        self.assertEqual((self.streamer.passthrough_frames, self.streamer.transcoded_frames), (2, 1))
+
+    def test_frame_over_the_budget_is_transcoded_everywhere(self):
+        self.streamer._publish_renditions(make_jpeg(1280, 720))
+        self.assertEqual(self.published_dimensions(), {
+            name: (rendition.width, rendition.height) for name, rendition in RENDITIONS.items()})
+        self.assertEqual(self.streamer.passthrough_frames, 0)
+
+
+class SharedFrameChannelTests(SimpleTestCase):
+    def setUp(self):
+        self.channel = SharedFrameChannel(create=True)
+        self.addCleanup(self.channel.unlink)
+        self.addCleanup(self.channel.close)
+
+    def test_rings_hold_each_renditions_byte_budget(self):
+        for index, name in enumerate(RENDITION_NAMES):
+            frame = bytes(RENDITIONS[name].max_bytes)
+            self.assertTrue(self.channel.write(index, 1, frame))
+            self.assertEqual(self.channel.read(index, 1), frame)
+            self.assertFalse(self.channel.write(index, 2, frame + b'x'))
+
+    def test_worker_streamer_outliving_its_mapping_skips_writes(self):
+        notices = queue.Queue()
+        streamer = _WorkerCameraStreamer(904, 'rtsp://cam.invalid/pool', SharedFrameChannel(self.channel.name), notices)
+        streamer.buses['sd'].publish(b'frame')
+        streamer.channel.close()
+        self.assertEqual(streamer.buses['sd'].publish(b'late frame'), 2)
+        streamer._circuit_changed()
+        streamer._close_buses()
+        self.assertEqual(notices.get_nowait(), (904, RENDITION_NAMES.index('sd'), 1))
+        self.assertTrue(notices.empty())
+
+    def test_read_of_an_overwritten_slot_is_none(self):
+        for seq in range(1, 6):
+            self.channel.write(0, seq, b'frame %d' % seq)
+        self.assertIsNone(self.channel.read(0, 1))
+        self.assertEqual(self.channel.read(0, 5), b'frame 5')
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    # Attempt times ahead of the wall clock, which ``state`` compares retry_at against
+    T = time.time() + 3600
+
+    def test_opens_after_threshold_and_half_opens_once_the_delay_passes(self):
+        circuit = CircuitBreaker(failure_threshold=3, base_delay=1.0, jitter=0.0)
+        self.assertEqual(circuit.record_failure(now=self.T + 100.0), 1.0)
+        self.assertEqual(circuit.record_failure(now=self.T + 101.0), 2.0)
+        self.assertEqual(circuit.state, CLOSED)
+        self.assertEqual(circuit.record_failure(now=self.T + 103.0), 4.0)
+        self.assertEqual(circuit.state, OPEN)
+        self.assertFalse(circuit.allow(now=self.T + 106.9))
+        self.assertTrue(circuit.allow(now=self.T + 107.0))
+        self.assertEqual(circuit.state, HALF_OPEN)
+
+    def test_half_open_trial_closes_on_success(self):
+        circuit = CircuitBreaker(failure_threshold=1, jitter=0.0)
+        circuit.record_failure(now=self.T)
+        circuit.allow(now=self.T + 10.0)
+        circuit.record_success()
+        self.assertEqual((circuit.state, circuit.failures, circuit.wait_time(now=self.T + 10.0)), (CLOSED, 0, 0.0))
+
+    def test_failed_half_open_trial_reopens_with_a_longer_delay(self):
+        circuit = CircuitBreaker(failure_threshold=1, base_delay=1.0, jitter=0.0)
+        circuit.record_failure(now=self.T)
+        circuit.allow(now=self.T + 1.0)
+        self.assertEqual(circuit.record_failure(now=self.T + 1.0), 2.0)
+        self.assertEqual(circuit.state, OPEN)
+
+    def test_backoff_is_jittered_below_the_cap(self):
+        circuit = CircuitBreaker(failure_threshold=1, base_delay=1.0, max_delay=30.0, jitter=0.5)
+        delays = [circuit.record_failure(now=self.T) for _ in range(20)]
+        self.assertTrue(0.5 <= delays[0] <= 1.0)
+        self.assertTrue(all(15.0 <= delay <= 30.0 for delay in delays[5:]))
+        with mock.patch('random.uniform', side_effect=lambda low, high: low):
+            self.assertEqual(circuit.record_failure(now=self.T), 15.0)
+
+    def test_restore_adopts_fields_from_another_process(self):
+        source = CircuitBreaker(failure_threshold=1, jitter=0.0)
+        source.record_failure(now=self.T + 50.0)
+        copy = CircuitBreaker()
+        copy.restore(*source.fields())
+        self.assertEqual((copy.state, copy.failures, copy.retry_at), (OPEN, 1, self.T + 51.0))
+
+
+@mock.patch.dict(streamers._circuits, clear=True)
+class CameraCircuitTests(SimpleTestCase):
+    def test_breaker_outlives_streamers_of_the_same_camera(self):
+        first = CameraStreamer(901, 'rtsp://cam.invalid/a')
+        first.circuit.record_failure()
+        self.assertIs(CameraStreamer(901, 'rtsp://cam.invalid/a').circuit, first.circuit)
+        self.assertIsNot(MobileCameraStreamer(901, 'rtsp://cam.invalid/a').circuit, first.circuit)
+
+    def test_changed_url_starts_closed(self):
+        camera_circuit('rtsp', 902, 'rtsp://cam.invalid/old').record_failure()
+        self.assertEqual(camera_circuit('rtsp', 902, 'rtsp://cam.invalid/new').failures, 0)
+
+
+class FramePacerTests(SimpleTestCase):
+    def test_slots_follow_the_previous_deadline_not_processing_time(self):
+        pacer = FramePacer(10)
+        pacer.mark(100.0)
+        self.assertAlmostEqual(pacer.next_deadline, 100.1)
+        # A late-but-within-a-slot caller keeps the original cadence
+        self.assertTrue(pacer.due(100.13))
+        pacer.mark(100.13)
+        self.assertAlmostEqual(pacer.next_deadline, 100.2)
+        self.assertAlmostEqual(pacer.delay(100.15), 0.05)
+        self.assertFalse(pacer.due(100.15))
+
+    def test_missed_slots_are_dropped_not_burst(self):
+        pacer = FramePacer(10)
+        pacer.mark(100.0)
+        pacer.mark(101.0)
+        self.assertAlmostEqual(pacer.next_deadline, 101.1)
+        self.assertFalse(pacer.due(101.05))
+
+    def test_zero_fps_never_waits(self):
+        pacer = FramePacer(0)
+        pacer.mark(5.0)
+        self.assertTrue(pacer.due(5.0))
+        self.assertEqual(pacer.delay(5.0), 0.0)
+
+    def test_source_fps_replaces_unusable_capture_rates(self):
+        for value in (None, 0, float('nan'), 90000):
+            self.assertEqual(source_fps(value), DEFAULT_SOURCE_FPS)
+        self.assertEqual(source_fps(15), 15.0)
+
+    @override_settings(CAMERA_TARGET_FPS=20, CAMERA_VIEWER_FPS=None)
+    def test_output_and_viewer_rates_are_capped_by_the_target(self):
+        self.assertEqual(output_fps(30.0), 20.0)
+        self.assertEqual(output_fps(12.0), 12.0)
+        self.assertIsNone(viewer_fps())
+        self.assertEqual(viewer_fps('60'), 20.0)
+        self.assertEqual(viewer_fps('0.2'), 1.0)
+        self.assertIsNone(viewer_fps('fast'))
+
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        circuits = mock.patch.dict(streamers._circuits, clear=True)
+        circuits.start()
+        self.addCleanup(circuits.stop)
+        self.camera = Camera.objects.create(name='Room 1', rtsp_url='rtsp://cam.invalid/1', ip_address='10.0.0.1')
+        self.streamer = CameraStreamer(self.camera.id, self.camera.rtsp_url)
+        self.streamer.running = True
+        manager = mock.patch.object(views, 'camera_manager', is_running=mock.Mock(return_value=True),
+                                    get_streamer=mock.Mock(return_value=self.streamer))
+        manager.start()
+        self.addCleanup(manager.stop)
+        self.url = reverse('camera_snapshot', args=[self.camera.id])
+
+    def test_snapshot_revalidates_with_its_etag(self):
+        self.streamer.buses['sd'].publish(b'jpeg one')
+        response = self.client.get(self.url)
+        self.assertEqual((response.status_code, response.content), (200, b'jpeg one'))
+        etag = response['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # A keep-alive republish is the same image
+        self.streamer.buses['sd'].republish()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.streamer.buses['sd'].publish(b'jpeg two')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.content), (200, b'jpeg two'))
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_restarted_streamer_gets_new_etags(self):
+        self.streamer.buses['sd'].publish(b'jpeg one')
+        etag = self.client.get(self.url)['ETag']
+        self.streamer.instance_id = 'restarted'
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_unknown_quality_is_rejected(self):
+        response = self.client.get(self.url, {'quality': 'ultra'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['renditions'], list(RENDITIONS))
+
+    def test_open_circuit_answers_503_at_once(self):
+        for _ in range(3):
+            self.streamer.circuit.record_failure()
+        self.assertEqual(self.client.get(self.url).status_code, 503)
+
+    def test_waits_on_the_bus_for_the_requested_rendition(self):
+        self.streamer.buses['sd'].publish(b'sd frame')
+        publisher = threading.Timer(0.1, self.streamer.buses['thumb'].publish, [b'thumb frame'])
+        publisher.start()
+        self.addCleanup(publisher.cancel)
+        started = time.monotonic()
+        self.assertEqual(views.latest_snapshot(self.streamer, 'thumb', timeout=5), ('thumb', 1, b'thumb frame'))
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertEqual(self.streamer.buses['thumb'].subscribers, 0)
+
+    def test_falls_back_to_another_rendition_after_the_timeout(self):
+        self.streamer.buses['sd'].publish(b'sd frame')
+        self.assertEqual(views.latest_snapshot(self.streamer, 'hd', timeout=0.1), ('sd', 1, b'sd frame'))
+
+
+def scene(level=0, block=None):
+    """A flat gray 640x360 BGR frame, optionally with a white square at ``block`` (x, y)"""
+    frame = np.full((360, 640, 3), 100 + level, dtype=np.uint8)
+    if block is not None:
+        x, y = block
+        frame[y:y + 120, x:x + 120] = 255
+    return frame
+
+
+class SceneChangeDetectorTests(SimpleTestCase):
+    def test_first_frame_and_real_changes_count(self):
+        detector = SceneChangeDetector(threshold=0.5)
+        self.assertTrue(detector.changed(scene()))
+        self.assertFalse(detector.changed(scene()))
+        self.assertTrue(detector.changed(scene(block=(0, 0))))
+
+    def test_sensor_noise_is_not_a_change(self):
+        detector = SceneChangeDetector(threshold=0.5)
+        detector.changed(scene())
+        noise = np.random.default_rng(1).integers(-8, 9, (360, 640, 3))
+        self.assertFalse(detector.changed(np.clip(scene() + noise, 0, 255).astype(np.uint8)))
+
+    def test_slow_drift_adds_up_against_the_reference(self):
+        detector = SceneChangeDetector(threshold=0.5)
+        detector.changed(scene())
+        results = [detector.changed(scene(level)) for level in range(5, 30, 5)]
+        self.assertEqual(results, [False, False, True, False, False])
+
+    def test_zero_threshold_and_reset_always_change(self):
+        detector = SceneChangeDetector(threshold=0)
+        detector.changed(scene())
+        self.assertTrue(detector.changed(scene()))
+        detector = SceneChangeDetector(threshold=0.5)
+        detector.changed(scene())
+        detector.reset()
+        self.assertTrue(detector.changed(scene()))
+
+
+@override_settings(CAMERA_SCENE_CHANGE={'keepalive_fps': 1, 'max_static_seconds': 10})
+class StaticSceneTests(SimpleTestCase):
+    def setUp(self):
+        self.streamer = CameraStreamer(903, 'rtsp://cam.invalid/static')
+        self.sd = self.streamer.buses['sd']
+        self.sd.subscribe()
+        self.now = 1000.0
+        clock = mock.patch.object(streamers.time, 'monotonic', lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def process(self, frame, at):
+        self.now = at
+        self.streamer._process_frame(frame)
+
+    def test_static_frames_are_skipped_and_kept_alive(self):
+        self.process(scene(), 1000.0)
+        frame_seq, jpeg = self.sd.latest_frame()
+        self.process(scene(), 1000.5)
+        self.assertEqual(self.sd.seq, frame_seq)
+        self.process(scene(), 1001.0)
+        # Keep-alive: a new seq for viewers, the same frame and frame_seq for ETags
+        self.assertEqual(self.sd.seq, frame_seq + 1)
+        self.assertEqual(self.sd.latest_frame(), (frame_seq, jpeg))
+        self.assertEqual(self.streamer.skipped_frames, 2)
+        self.assertEqual(self.streamer.encode_meter.total, 1)
+
+    def test_changed_scene_is_encoded(self):
+        self.process(scene(), 1000.0)
+        frame_seq = self.sd.latest_frame()[0]
+        self.process(scene(block=(200, 100)), 1000.1)
+        self.assertGreater(self.sd.latest_frame()[0], frame_seq)
+
+    def test_static_scene_is_re_encoded_after_max_static_seconds(self):
+        self.process(scene(), 1000.0)
+        self.process(scene(), 1010.0)
+        self.assertEqual(self.streamer.encode_meter.total, 2)
+
+    def test_newly_watched_rendition_gets_a_frame_while_static(self):
+        self.process(scene(), 1000.0)
+        self.streamer.buses['thumb'].subscribe()
+        self.process(scene(), 1000.1)
+        self.assertEqual(jpeg_dimensions(self.streamer.buses['thumb'].latest()[1]), (320, 180))
@@ -3,12 +3,18 @@ from django.urls import path
 from . import views
 
 urlpatterns = [
+    path('metrics/', views.metrics, name='metrics'),
+
     # RTSP Cameras
     path('cameras/', views.list_cameras, name='list_cameras'),
+    path('cameras/stats/', views.camera_stats, name='camera_stats'),
     path('cameras/<int:camera_id>/feed/', views.camera_feed, name='camera_feed'),
+    path('cameras/<int:camera_id>/open/', views.open_camera, name='open_camera'),
+    path('cameras/<int:camera_id>/snapshot.jpg', views.camera_snapshot, name='camera_snapshot'),
     path('cameras/<int:camera_id>/test/', views.test_camera, name='test_camera'),
     
     # Mobile Cameras
     path('mobile-cameras/<int:mobile_camera_id>/feed/', views.mobile_camera_feed, name='mobile_camera_feed'),
+    path('mobile-cameras/<int:mobile_camera_id>/open/', views.open_mobile_camera, name='open_mobile_camera'),
     path('mobile-cameras/<int:mobile_camera_id>/test/', views.test_mobile_camera, name='test_mobile_camera'),
 ]
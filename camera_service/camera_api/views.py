@@ -1,145 +1,27 @@
 """Camera streaming views - isolated service"""
 import cv2
-import threading
-import time
 import logging
-from typing import Optional
-from django.http import StreamingHttpResponse, JsonResponse
+import requests
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse, JsonResponse
 import sys
+import time
 from pathlib import Path
 
+from .frame_bus import iter_parts
+from .frame_export import frame_exporter
+from .metrics import render_prometheus
+from .pacing import viewer_fps
+from .renditions import RENDITIONS, pick_rendition
+from .streamers import camera_manager, idle_grace, mobile_camera_manager
+from .warm_pool import warm_pool
+
 # Import Camera model from main project
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 from cameras.models import Camera
 
 logger = logging.getLogger('camera_api')
 
-class CameraStreamer:
-    """Non-blocking camera streamer with automatic reconnection"""
-    
-    def __init__(self, camera_id, rtsp_url):
-        self.camera_id = camera_id
-        self.rtsp_url = rtsp_url
-        self.cap: Optional[cv2.VideoCapture] = None
-        self.frame: Optional[bytes] = None
-        self.running: bool = False
-        self.thread: Optional[threading.Thread] = None
-        self.lock = threading.Lock()
-        self.last_access = time.time()
-        self.connection_attempts = 0
-        self.max_reconnect_attempts = 5
-        self.reconnect_delay = 2
-
-    def start(self):
-        if not self.running:
-            self.running = True
-            self.thread = threading.Thread(target=self._update, daemon=True)
-            self.thread.start()
-            logger.info(f"Started streamer for camera {self.camera_id}")
-
-    def stop(self):
-        self.running = False
-        if self.thread is not None:
-            self.thread.join(timeout=2.0)
-        logger.info(f"Stopped streamer for camera {self.camera_id}")
-
-    def _connect_camera(self):
-        try:
-            cap = cv2.VideoCapture(self.rtsp_url, cv2.CAP_FFMPEG)
-            cap.set(cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, 5000)
-            cap.set(cv2.CAP_PROP_READ_TIMEOUT_MSEC, 5000)
-            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-            
-            if cap.isOpened():
-                ret, frame = cap.read()
-                if ret and frame is not None:
-                    self.connection_attempts = 0
-                    logger.info(f"Connected to camera {self.camera_id}")
-                    return cap
-                cap.release()
-            return None
-        except Exception as e:
-            logger.error(f"Error connecting camera {self.camera_id}: {e}")
-            return None
-
-    def _update(self):
-        while self.running:
-            if time.time() - self.last_access > 90:
-                logger.info(f"Stopping camera {self.camera_id} due to inactivity")
-                break
-
-            if self.cap is None:
-                if self.connection_attempts >= self.max_reconnect_attempts:
-                    time.sleep(10)
-                    self.connection_attempts = 0
-                    continue
-                
-                self.connection_attempts += 1
-                self.cap = self._connect_camera()
-                if self.cap is None:
-                    time.sleep(self.reconnect_delay)
-                    continue
-
-            try:
-                ret, frame = self.cap.read()
-                if ret and frame is not None:
-                    # Aggressive resize for performance
-                    frame = cv2.resize(frame, (640, 360), interpolation=cv2.INTER_NEAREST)
-                    
-                    # Lower quality encoding
-                    ret, jpeg = cv2.imencode('.jpg', frame, [
-                        cv2.IMWRITE_JPEG_QUALITY, 60,
-                        cv2.IMWRITE_JPEG_OPTIMIZE, 1
-                    ])
-                    
-                    if ret:
-                        with self.lock:
-                            self.frame = jpeg.tobytes()
-                    
-                    # Lower frame rate
-                    time.sleep(0.05)  # ~20 FPS
-                else:
-                    if self.cap is not None:
-                        self.cap.release()
-                    self.cap = None
-                    time.sleep(self.reconnect_delay)
-            except Exception as e:
-                logger.error(f"Error reading camera {self.camera_id}: {e}")
-                if self.cap is not None:
-                    self.cap.release()
-                self.cap = None
-                time.sleep(self.reconnect_delay)
-        
-        if self.cap is not None:
-            self.cap.release()
-
-    def get_frame(self):
-        self.last_access = time.time()
-        with self.lock:
-            return self.frame
-
-class CameraManager:
-    _lock = threading.Lock()
-    _streamers = {}
-
-    @classmethod
-    def get_streamer(cls, camera_id, rtsp_url):
-        with cls._lock:
-            if camera_id not in cls._streamers or not cls._streamers[camera_id].running:
-                streamer = CameraStreamer(camera_id, rtsp_url)
-                streamer.start()
-                cls._streamers[camera_id] = streamer
-            return cls._streamers[camera_id]
-    
-    @classmethod
-    def stop_streamer(cls, camera_id):
-        with cls._lock:
-            if camera_id in cls._streamers:
-                cls._streamers[camera_id].stop()
-                del cls._streamers[camera_id]
-
-camera_manager = CameraManager()
-
 def list_cameras(request):
     """List all active cameras"""
     try:
@@ -148,31 +30,55 @@ def list_cameras(request):
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+def camera_stats(request):
+    """Capture FPS, encode FPS and dropped frames for every running streamer"""
+    return JsonResponse({
+        'cameras': [streamer.stats() for streamer in camera_manager.streamers()],
+        'mobile_cameras': [streamer.stats() for streamer in mobile_camera_manager.streamers()],
+        'warm_cameras': sorted(warm_pool.warm),
+    })
+
+def metrics(request):
+    """Per-camera metrics in the Prometheus text exposition format"""
+    body = render_prometheus(camera_manager.streamers(), mobile_camera_manager.streamers())
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def open_camera_stream(camera_id):
+    """Return the shared streamer for an RTSP camera, starting it if needed"""
+    camera = Camera.objects.get(id=camera_id)
+    return camera_manager.get_streamer(camera.id, camera.rtsp_url)
+
+def export_stream(kind, camera_id, streamer):
+    """Publish a streamer's frames to shared memory; channel name or None if disabled"""
+    if not getattr(settings, 'CAMERA_SHARED_FRAMES', False):
+        return None
+    try:
+        return frame_exporter.export(kind, camera_id, streamer)
+    except OSError as e:
+        logger.warning(f"Cannot export {kind} camera {camera_id} to shared memory: {e}")
+        return None
+
+def open_camera(request, camera_id):
+    """Start a camera and tell a local reader where to find its frames"""
+    try:
+        streamer = open_camera_stream(camera_id)
+        return JsonResponse({'channel': export_stream('camera', camera_id, streamer)})
+    except Camera.DoesNotExist:
+        return JsonResponse({'error': 'Camera not found'}, status=404)
+    except Exception as e:
+        logger.error(f"Error opening camera {camera_id}: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+
 def camera_feed(request, camera_id):
     """Stream camera feed with aggressive optimization"""
     try:
-        camera = Camera.objects.get(id=camera_id)
-        streamer = camera_manager.get_streamer(camera.id, camera.rtsp_url)
+        streamer = open_camera_stream(camera_id)
+        rendition = pick_rendition(request.GET.get('quality'), request.GET.get('width'))
+        fps = viewer_fps(request.GET.get('fps'))
         
         def generate_frames():
-            frame_count = 0
             try:
-                while True:
-                    frame = streamer.get_frame()
-                    if frame:
-                        yield (b'--frame\r\n'
-                               b'Content-Type: image/jpeg\r\n'
-                               b'Content-Length: ' + str(len(frame)).encode() + b'\r\n'
-                               b'\r\n' + frame + b'\r\n')
-                        
-                        # Skip frames for better performance
-                        frame_count += 1
-                        if frame_count % 3 == 0:  # Send every 3rd frame
-                            time.sleep(0.05)
-                        else:
-                            time.sleep(0.001)
-                    else:
-                        time.sleep(0.1)
+                yield from iter_parts(streamer, rendition, fps)
             except GeneratorExit:
                 logger.info(f"Client disconnected from camera {camera_id}")
 
@@ -188,6 +94,82 @@ def camera_feed(request, camera_id):
     except Camera.DoesNotExist:
         return JsonResponse({'error': 'Camera not found'}, status=404)
 
+# How long a snapshot request waits for a just-started streamer's first frame
+SNAPSHOT_WAIT = 5.0
+# How long a camera keeps running after a snapshot when nobody streams it
+SNAPSHOT_GRACE = 15
+
+
+def latest_snapshot(streamer, rendition, timeout=SNAPSHOT_WAIT):
+    """Return (rendition name, frame_seq, frame) for the newest frame, preferring ``rendition``.
+
+    Reads the buses directly, so unlike ``get_frame`` this does not refresh the
+    streamer's ``last_access``. Only watched renditions are encoded, so the
+    requested one is subscribed while waiting and gets encoded from the next
+    captured frame; until then another rendition may be the fresh one.
+    """
+    deadline = time.monotonic() + timeout
+    wanted = streamer.buses[rendition]
+    wanted.subscribe()
+    try:
+        while True:
+            # Read before checking, so a publish in between still ends the wait
+            seq = wanted.seq
+            frames = {name: (bus.published_at, *bus.latest_frame()) for name, bus in streamer.buses.items()}
+            frames = {name: entry for name, entry in frames.items() if entry[2] is not None}
+            newest = max(frames, key=lambda name: frames[name][0], default=None)
+            if rendition in frames and frames[newest][0] - frames[rendition][0] < 1.0:
+                return (rendition, *frames[rendition][1:])
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or wanted.closed or not streamer.running:
+                return (newest, *frames[newest][1:]) if newest else None
+            wanted.wait(seq, remaining)
+    finally:
+        wanted.unsubscribe()
+
+def keep_for_snapshot(streamer, started):
+    """Keep a camera up ``SNAPSHOT_GRACE`` past a snapshot, not a full idle grace.
+
+    A streamer this snapshot had to start is aged so that it stops soon unless
+    a viewer turns up; a running one is only ever extended to the short grace.
+    """
+    snapshot_access = time.time() - idle_grace() + SNAPSHOT_GRACE
+    if started or streamer.last_access < snapshot_access:
+        streamer.last_access = snapshot_access
+
+def camera_snapshot(request, camera_id):
+    """Latest frame as a single JPEG with an ETag derived from its sequence number"""
+    try:
+        camera = Camera.objects.get(id=camera_id)
+    except Camera.DoesNotExist:
+        return JsonResponse({'error': 'Camera not found'}, status=404)
+
+    quality = request.GET.get('quality')
+    if quality and quality not in RENDITIONS:
+        return JsonResponse({'error': f'Unknown quality {quality!r}', 'renditions': list(RENDITIONS)}, status=400)
+    rendition = pick_rendition(quality, request.GET.get('width'))
+    started = not camera_manager.is_running(camera.id)
+    streamer = camera_manager.get_streamer(camera.id, camera.rtsp_url)
+    keep_for_snapshot(streamer, started)
+    if streamer.circuit_open():
+        # Waiting out the reconnect backoff would only hang the request
+        return JsonResponse({'error': 'Camera offline', 'circuit': streamer.circuit_state()}, status=503)
+    snapshot = latest_snapshot(streamer, rendition)
+    if snapshot is None:
+        return JsonResponse({'error': 'No frame available yet'}, status=503)
+
+    name, seq, frame = snapshot
+    # The instance id tells frames of a restarted streamer apart
+    etag = f'"{streamer.instance_id}-{name}-{seq}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(frame, content_type='image/jpeg')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    response['Access-Control-Allow-Origin'] = '*'
+    return response
+
 def test_camera(request, camera_id):
     """Test camera connection"""
     try:
@@ -207,149 +189,50 @@ def test_camera(request, camera_id):
         return JsonResponse({'status': 'error', 'message': str(e)})
 
 
-
-# Mobile Camera Support
-import requests
-import numpy as np
+class CameraPaused(Exception):
+    """Raised when a paused mobile camera is requested"""
 
 
-class MobileCameraStreamer:
-    """HTTP/MJPEG streamer for mobile cameras"""
+def open_mobile_camera_stream(mobile_camera_id):
+    """Return the shared streamer for a mobile camera, starting it if needed"""
+    from mobile_cameras.models import MobileCamera
     
-    def __init__(self, mobile_camera_id, stream_url):
-        self.mobile_camera_id = mobile_camera_id
-        self.stream_url = stream_url
-        self.frame: Optional[bytes] = None
-        self.running: bool = False
-        self.thread: Optional[threading.Thread] = None
-        self.lock = threading.Lock()
-        self.last_access = time.time()
-
-    def start(self):
-        if not self.running:
-            self.running = True
-            self.thread = threading.Thread(target=self._update, daemon=True)
-            self.thread.start()
-            logger.info(f"Started mobile camera streamer {self.mobile_camera_id}")
-
-    def stop(self):
-        self.running = False
-        if self.thread is not None:
-            self.thread.join(timeout=2.0)
-        logger.info(f"Stopped mobile camera streamer {self.mobile_camera_id}")
-
-    def _update(self):
-        """Background thread to fetch frames from mobile camera"""
-        while self.running:
-            if time.time() - self.last_access > 90:
-                logger.info(f"Stopping mobile camera {self.mobile_camera_id} due to inactivity")
-                break
-
-            try:
-                response = requests.get(self.stream_url, stream=True, timeout=10)
-                
-                if response.status_code == 200:
-                    logger.info(f"Connected to mobile camera {self.mobile_camera_id}")
-                    bytes_data = bytes()
-                    
-                    for chunk in response.iter_content(chunk_size=1024):
-                        if not self.running:
-                            break
-                            
-                        bytes_data += chunk
-                        a = bytes_data.find(b'\xff\xd8')  # JPEG start
-                        b = bytes_data.find(b'\xff\xd9')  # JPEG end
-                        
-                        if a != -1 and b != -1:
-                            jpg = bytes_data[a:b+2]
-                            bytes_data = bytes_data[b+2:]
-                            
-                            try:
-                                # Decode and resize
-                                img = cv2.imdecode(np.frombuffer(jpg, dtype=np.uint8), cv2.IMREAD_COLOR)
-                                if img is not None:
-                                    # Resize for efficient streaming
-                                    img = cv2.resize(img, (640, 360), interpolation=cv2.INTER_NEAREST)
-                                    ret, jpeg = cv2.imencode('.jpg', img, [
-                                        cv2.IMWRITE_JPEG_QUALITY, 60,
-                                        cv2.IMWRITE_JPEG_OPTIMIZE, 1
-                                    ])
-                                    if ret:
-                                        with self.lock:
-                                            self.frame = jpeg.tobytes()
-                            except Exception as e:
-                                logger.error(f"Error processing frame: {e}")
-                                continue
-                else:
-                    logger.error(f"HTTP {response.status_code} from mobile camera {self.mobile_camera_id}")
-                    time.sleep(5)
-                    
-            except Exception as e:
-                logger.error(f"Error streaming mobile camera {self.mobile_camera_id}: {e}")
-                time.sleep(5)
-
-    def get_frame(self):
-        self.last_access = time.time()
-        with self.lock:
-            return self.frame
-
-
-class MobileCameraManager:
-    _lock = threading.Lock()
-    _streamers = {}
-
-    @classmethod
-    def get_streamer(cls, mobile_camera_id, stream_url):
-        with cls._lock:
-            if mobile_camera_id not in cls._streamers or not cls._streamers[mobile_camera_id].running:
-                streamer = MobileCameraStreamer(mobile_camera_id, stream_url)
-                streamer.start()
-                cls._streamers[mobile_camera_id] = streamer
-            return cls._streamers[mobile_camera_id]
+    mobile_camera = MobileCamera.objects.get(id=mobile_camera_id)
     
-    @classmethod
-    def stop_streamer(cls, mobile_camera_id):
-        with cls._lock:
-            if mobile_camera_id in cls._streamers:
-                cls._streamers[mobile_camera_id].stop()
-                del cls._streamers[mobile_camera_id]
+    # Check if camera is active (not paused)
+    if not mobile_camera.is_active:
+        raise CameraPaused()
+    
+    stream_url = mobile_camera.get_stream_url()
+    return mobile_camera_manager.get_streamer(mobile_camera.id, stream_url)
 
 
-mobile_camera_manager = MobileCameraManager()
+def open_mobile_camera(request, mobile_camera_id):
+    """Start a mobile camera and tell a local reader where to find its frames"""
+    from mobile_cameras.models import MobileCamera
+
+    try:
+        streamer = open_mobile_camera_stream(mobile_camera_id)
+        return JsonResponse({'channel': export_stream('mobile', mobile_camera_id, streamer)})
+    except MobileCamera.DoesNotExist:
+        return JsonResponse({'error': 'Camera not found'}, status=404)
+    except CameraPaused:
+        return JsonResponse({'error': 'Camera is paused'}, status=503)
+    except Exception as e:
+        logger.error(f"Error opening mobile camera {mobile_camera_id}: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
 
 
 def mobile_camera_feed(request, mobile_camera_id):
     """Stream mobile camera feed"""
-    from mobile_cameras.models import MobileCamera
-    
     try:
-        mobile_camera = MobileCamera.objects.get(id=mobile_camera_id)
-        
-        # Check if camera is active (not paused)
-        if not mobile_camera.is_active:
-            return JsonResponse({'error': 'Camera is paused'}, status=503)
-        
-        stream_url = mobile_camera.get_stream_url()
-        streamer = mobile_camera_manager.get_streamer(mobile_camera.id, stream_url)
+        streamer = open_mobile_camera_stream(mobile_camera_id)
+        rendition = pick_rendition(request.GET.get('quality'), request.GET.get('width'))
+        fps = viewer_fps(request.GET.get('fps'))
         
         def generate_frames():
-            frame_count = 0
             try:
-                while True:
-                    frame = streamer.get_frame()
-                    if frame:
-                        yield (b'--frame\r\n'
-                               b'Content-Type: image/jpeg\r\n'
-                               b'Content-Length: ' + str(len(frame)).encode() + b'\r\n'
-                               b'\r\n' + frame + b'\r\n')
-                        
-                        frame_count += 1
-                        if frame_count % 2 == 0:  # Send every 2nd frame
-                            time.sleep(0.05)
-                        else:
-                            time.sleep(0.001)
-                    else:
-                        time.sleep(0.1)
+                yield from iter_parts(streamer, rendition, fps)
             except GeneratorExit:
                 logger.info(f"Client disconnected from mobile camera {mobile_camera_id}")
 
@@ -362,6 +245,8 @@ def mobile_camera_feed(request, mobile_camera_id):
         response['Expires'] = '0'
         response['X-Accel-Buffering'] = 'no'
         return response
+    except CameraPaused:
+        return JsonResponse({'error': 'Camera is paused'}, status=503)
     except Exception as e:
         logger.error(f"Error in mobile_camera_feed: {e}")
         return JsonResponse({'error': str(e)}, status=500)
@@ -0,0 +1,96 @@
+"""Pre-connect classroom cameras around scheduled and live meetings.
+
+Streamers normally start when the first viewer arrives and pay the RTSP open
+and first read then. The warm pool starts the cameras of every classroom whose
+meeting begins within ``CAMERA_WARM_LEAD_MINUTES`` or is live, and refreshes
+their ``last_access`` until the meeting's scheduled end, so viewers at class
+start attach to a streamer that already has frames. Afterwards the streamer
+winds down through the normal ``CAMERA_IDLE_GRACE``.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .streamers import camera_manager
+
+logger = logging.getLogger('camera_api')
+
+
+def warm_cameras(now=None):
+    """Ids and RTSP URLs of cameras whose classroom has a meeting in its warm window"""
+    from cameras.models import Camera
+    from meetings.models import Meeting
+
+    now = now or timezone.now()
+    lead = timedelta(minutes=getattr(settings, 'CAMERA_WARM_LEAD_MINUTES', 5))
+    meetings = Meeting.objects.filter(
+        # Live meetings stay warm however long they run; scheduled ones nobody
+        # started are not kept warm forever
+        Q(status='live') | Q(status='scheduled', scheduled_time__gte=now - timedelta(days=1)),
+        classroom__isnull=False,
+        scheduled_time__lte=now + lead,
+    ).values_list('classroom_id', 'status', 'scheduled_time', 'duration_minutes')
+
+    classroom_ids = {
+        classroom_id
+        for classroom_id, status, scheduled_time, duration in meetings
+        if status == 'live' or scheduled_time + timedelta(minutes=duration) >= now
+    }
+    if not classroom_ids:
+        return []
+    return list(Camera.objects.filter(classroom_id__in=classroom_ids, is_active=True)
+                .values_list('id', 'rtsp_url'))
+
+
+class WarmPool:
+    """Background thread that keeps meeting cameras connected"""
+
+    def __init__(self):
+        self._thread = None
+        self._lock = threading.Lock()
+        self.warm = set()
+
+    @property
+    def interval(self):
+        return getattr(settings, 'CAMERA_WARM_POOL_INTERVAL', 30)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='camera-warm-pool', daemon=True)
+                self._thread.start()
+                logger.info("Started camera warm pool")
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Warm pool refresh failed: {e}")
+            finally:
+                close_old_connections()
+            time.sleep(self.interval)
+
+    def refresh(self):
+        """Start or keep alive every camera in a warm window"""
+        cameras = warm_cameras()
+        warm = set()
+        for camera_id, rtsp_url in cameras:
+            streamer = camera_manager.get_streamer(camera_id, rtsp_url)
+            streamer.last_access = time.time()
+            warm.add(camera_id)
+        for camera_id in warm - self.warm:
+            logger.info(f"Pre-connected camera {camera_id} for a meeting")
+        for camera_id in self.warm - warm:
+            logger.info(f"Camera {camera_id} left its warm window")
+        self.warm = warm
+        return warm
+
+
+warm_pool = WarmPool()
@@ -0,0 +1,23 @@
+"""ASGI config for the camera service.
+
+Serve with an ASGI server so MJPEG viewers are coroutines, not threads:
+
+    daphne -b 0.0.0.0 -p 8001 camera_service.asgi:application
+"""
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'camera_service.settings')
+
+from django.core.asgi import get_asgi_application
+
+django_application = get_asgi_application()
+
+from django.conf import settings
+
+from camera_api.asgi_streaming import MJPEGStreamingApp
+from camera_api.warm_pool import warm_pool
+
+application = MJPEGStreamingApp(django_application)
+
+if settings.CAMERA_WARM_POOL:
+    warm_pool.start()
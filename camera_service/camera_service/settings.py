@@ -38,12 +38,14 @@ SECURE_REFERRER_POLICY = 'strict-origin-when-cross-origin'
 SECURE_CONTENT_TYPE_NOSNIFF = True
 
 INSTALLED_APPS = [
+    'daphne',  # ASGI runserver: feeds are served by camera_api.asgi_streaming
     'django.contrib.contenttypes',
     'django.contrib.auth',
     'corsheaders',
     'cameras',  # Need Camera model
     'mobile_cameras',  # Need MobileCamera model
     'accounts',  # Need UserProfile model for mobile camera permissions
+    'meetings',  # Need Classroom/Meeting to pre-connect cameras for classes
     'camera_api',
 ]
 
@@ -68,6 +70,7 @@ CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_ALL_ORIGINS = True  # Allow all origins for development
 
 ROOT_URLCONF = 'camera_service.urls'
+ASGI_APPLICATION = 'camera_service.asgi.application'
 
 # Use the same database as main project
 DATABASES = {
@@ -77,6 +80,78 @@ DATABASES = {
     }
 }
 
+# Match the main project so meeting times read from the shared DB are aware UTC
+TIME_ZONE = 'UTC'
+USE_TZ = True
+
+# Mobile camera JPEGs within this budget are forwarded as-is to every rendition
+# they fit (see RENDITIONS) instead of being decoded, resized and re-encoded;
+# smaller renditions still get a scaled copy
+MOBILE_CAMERA_PASSTHROUGH = {
+    'enabled': True,
+    'max_width': 640,
+    'max_height': 480,
+    'max_bytes': 96 * 1024,
+}
+
+# Streamers encode at the source FPS capped to this rate; surplus frames are
+# dropped before decode. Viewers get every encoded frame unless they (or this
+# default) ask for less with ?fps=
+CAMERA_TARGET_FPS = 20
+CAMERA_VIEWER_FPS = None
+
+# Number of worker processes RTSP cameras are sharded across. 0 keeps every
+# camera on a thread in the serving process; set it to roughly the core count
+# once 20+ cameras make resize/encode contend on one GIL.
+CAMERA_POOL_WORKERS = 0
+
+# Mirror streamed frames into named shared memory so the main app on the same
+# host reads them directly instead of re-proxying the MJPEG feed over HTTP
+CAMERA_SHARED_FRAMES = True
+
+# Streamers stop after this many seconds without viewers
+CAMERA_IDLE_GRACE = 90
+
+# Warm pool: cameras of a classroom are connected CAMERA_WARM_LEAD_MINUTES
+# before its meeting starts and kept running until the meeting's scheduled
+# end (or while it is live), then left to the idle grace above
+CAMERA_WARM_POOL = True
+CAMERA_WARM_LEAD_MINUTES = 5
+CAMERA_WARM_POOL_INTERVAL = 30
+
+# Reconnect backoff: each failed connect doubles the wait from base_delay up to
+# max_delay (seconds, randomly shortened by up to `jitter`); after
+# failure_threshold failures in a row the circuit opens and viewers get an
+# offline placeholder until a retry succeeds
+CAMERA_CIRCUIT = {
+    'failure_threshold': 3,
+    'base_delay': 1.0,
+    'max_delay': 300.0,
+    'jitter': 0.5,
+}
+
+# JPEG encoder backend ('opencv', 'opencv-fast' or 'turbojpeg', see
+# camera_api/encoders.py), with per-camera overrides keyed by camera id.
+# Compare them with benchmarks/bench_jpeg_encoders.py.
+CAMERA_JPEG_ENCODER = {
+    'default': 'opencv',
+    'cameras': {},
+    'mobile_cameras': {},
+}
+
+# Static scenes: a frame is only re-encoded when more than `threshold` percent
+# of a small grayscale sample changed since the last encode (0 encodes every
+# frame). Meanwhile viewers get the last JPEG again `keepalive_fps` times a
+# second, and a real frame at least every `max_static_seconds`. `cameras` maps
+# a camera id to its own threshold, e.g. {3: 2.0} for a noisy sensor.
+CAMERA_SCENE_CHANGE = {
+    'enabled': True,
+    'threshold': 0.5,
+    'keepalive_fps': 1,
+    'max_static_seconds': 10,
+    'cameras': {},
+}
+
 # Logging
 LOGGING = {
     'version': 1,
@@ -3,8 +3,8 @@ from .models import Camera, CameraPermission
 
 @admin.register(Camera)
 class CameraAdmin(admin.ModelAdmin):
-    list_display = ('name', 'ip_address', 'port', 'is_active', 'created_at')
-    list_filter = ('is_active', 'created_at')
+    list_display = ('name', 'ip_address', 'port', 'classroom', 'is_active', 'created_at')
+    list_filter = ('is_active', 'classroom', 'created_at')
     search_fields = ('name', 'ip_address')
 
 @admin.register(CameraPermission)
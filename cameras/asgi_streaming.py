@@ -0,0 +1,57 @@
+"""Stop streaming responses when the viewer goes away.
+
+Django 4.2 iterates an async ``StreamingHttpResponse`` until the iterator ends
+and never looks at ``http.disconnect``; daphne silently drops what is sent
+after a disconnect. A camera feed never ends on its own, so without this every
+closed tab would keep its generator, upstream and camera running. The wrapper
+watches for the disconnect once Django has read the request body and cancels
+the Django task, which runs the feed generators' ``finally`` blocks.
+"""
+import asyncio
+
+
+class DisconnectCancellingApp:
+    """ASGI wrapper for the Django HTTP app that cancels a request on client disconnect"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        body_read = asyncio.Event()
+
+        async def app_receive():
+            message = await receive()
+            if message['type'] == 'http.disconnect' or not message.get('more_body', False):
+                body_read.set()
+            return message
+
+        app_task = asyncio.ensure_future(self.app(scope, app_receive, send))
+        body_task = asyncio.ensure_future(body_read.wait())
+        await asyncio.wait({app_task, body_task}, return_when=asyncio.FIRST_COMPLETED)
+        body_task.cancel()
+        if app_task.done():
+            app_task.result()
+            return
+
+        # Django is done with receive(); from here on only a disconnect can arrive
+        disconnect_task = asyncio.ensure_future(self._wait_for_disconnect(receive))
+        try:
+            await asyncio.wait({app_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            disconnect_task.cancel()
+            if not app_task.done():
+                app_task.cancel()
+            await asyncio.gather(app_task, disconnect_task, return_exceptions=True)
+        if not app_task.cancelled():
+            app_task.result()
+
+    @staticmethod
+    async def _wait_for_disconnect(receive):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
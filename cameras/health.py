@@ -0,0 +1,138 @@
+"""Background health monitor for the camera service and every camera.
+
+Pages and JS pollers read the cached result instead of checking live: a
+render costs a cache lookup, not a request to port 8001 or an RTSP open.
+Cameras that are already streaming are judged from the camera service's
+pipeline stats; the others get a TCP connect to their port, so a round never
+opens a video stream.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from requests.exceptions import RequestException
+
+from .probing import tcp_reachable
+from .upstream import service_get
+
+logger = logging.getLogger('cameras')
+
+CACHE_KEY = 'camera_health'
+CHECK_WORKERS = 8
+TCP_TIMEOUT = 1.0
+
+
+def _empty_state():
+    return {
+        'checked_at': None,
+        'service': {'running': False, 'latency_ms': None, 'last_seen': None},
+        'cameras': {},
+        'mobile_cameras': {},
+    }
+
+
+def _timed_tcp_check(ip, port):
+    started = time.perf_counter()
+    reachable = tcp_reachable(ip, port, timeout=TCP_TIMEOUT)
+    return reachable, round((time.perf_counter() - started) * 1000, 1)
+
+
+class CameraHealthMonitor:
+    """Probes on a schedule and publishes the state to the Django cache"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._state = _empty_state()
+
+    @property
+    def interval(self):
+        return getattr(settings, 'CAMERA_HEALTH_INTERVAL', 10)
+
+    def ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='camera-health', daemon=True)
+                self._thread.start()
+
+    def state(self):
+        """Latest published state; starts the monitor on first use"""
+        self.ensure_started()
+        return cache.get(CACHE_KEY) or self._state
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Camera health check failed: {e}")
+            finally:
+                close_old_connections()
+            time.sleep(self.interval)
+
+    def check(self):
+        """Run one probing round and publish it"""
+        from mobile_cameras.models import MobileCamera
+        from .models import Camera
+
+        now = time.time()
+        previous = self._state
+        state = _empty_state()
+        state['checked_at'] = now
+
+        stats = {'cameras': [], 'mobile_cameras': []}
+        started = time.perf_counter()
+        try:
+            response = service_get('/api/cameras/stats/', timeout=2)
+            if response.status_code == 200:
+                state['service'] = {
+                    'running': True,
+                    'latency_ms': round((time.perf_counter() - started) * 1000, 1),
+                    'last_seen': now,
+                }
+                stats = response.json()
+        except (RequestException, ValueError):
+            pass
+        if not state['service']['running']:
+            state['service']['last_seen'] = previous['service']['last_seen']
+
+        streaming = {s['camera_id']: s for s in stats.get('cameras', [])}
+        mobile_streaming = {s['mobile_camera_id']: s for s in stats.get('mobile_cameras', [])}
+
+        targets = [('cameras', camera.id, camera.ip_address, camera.port, streaming.get(camera.id))
+                   for camera in Camera.objects.filter(is_active=True)]
+        targets += [('mobile_cameras', camera.id, camera.ip_address, camera.port, mobile_streaming.get(camera.id))
+                    for camera in MobileCamera.objects.filter(is_active=True)]
+
+        def probe(target):
+            group, camera_id, ip, port, pipeline = target
+            if pipeline and pipeline.get('capture_fps', 0) > 0:
+                # Frames are flowing right now; no need to touch the camera
+                return group, camera_id, 'streaming', None
+            reachable, latency = _timed_tcp_check(ip, port)
+            return group, camera_id, 'online' if reachable else 'offline', latency
+
+        with ThreadPoolExecutor(max_workers=CHECK_WORKERS) as executor:
+            for group, camera_id, status, latency in executor.map(probe, targets):
+                key = str(camera_id)
+                seen = previous[group].get(key, {}).get('last_seen')
+                state[group][key] = {
+                    'status': status,
+                    'latency_ms': latency,
+                    'last_seen': now if status != 'offline' else seen,
+                }
+
+        self._state = state
+        cache.set(CACHE_KEY, state, self.interval * 3)
+        return state
+
+
+health_monitor = CameraHealthMonitor()
+
+
+def camera_health():
+    return health_monitor.state()
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.9 on 2026-10-18 08:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meetings', '0002_classroom_meeting_ended_at_meeting_classroom_and_more'),
+        ('cameras', '0004_alter_mobilecamerapermission_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='camera',
+            name='classroom',
+            field=models.ForeignKey(blank=True, help_text='Pre-connected while this classroom has a scheduled or live meeting', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cameras', to='meetings.classroom'),
+        ),
+    ]
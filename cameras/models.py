@@ -10,6 +10,10 @@ class Camera(models.Model):
     port = models.IntegerField(default=554)
     stream_path = models.CharField(max_length=200, default='/stream')
     is_active = models.BooleanField(default=True)
+    classroom = models.ForeignKey(
+        'meetings.Classroom', on_delete=models.SET_NULL, null=True, blank=True, related_name='cameras',
+        help_text="Pre-connected while this classroom has a scheduled or live meeting"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
@@ -0,0 +1,174 @@
+"""RTSP reachability checks and stream path auto-detection"""
+import logging
+import socket
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import cv2
+
+logger = logging.getLogger('cameras')
+
+COMMON_RTSP_PATHS = [
+    '/live',
+    '/stream',
+    '/h264',
+    '/video',
+    '/cam/realmonitor',
+    '/Streaming/Channels/101',
+    '/1',
+    '/11',
+    '/av0_0',
+    '/mpeg4',
+    '/media/video1',
+    '/onvif1',
+    '/ch0',
+    '/ch01.264',
+    '/',
+]
+
+# Paths tried at once; cameras often refuse many parallel RTSP sessions
+PROBE_WORKERS = 5
+PROBE_TIMEOUT_MS = 3000
+# A LAN host that does not accept the TCP connection within this is dead
+TCP_TIMEOUT = 0.5
+CACHE_TTL = 300
+# test_camera reports live status, so it only trusts recent results
+CHECK_MAX_AGE = 30
+
+ProbeResult = namedtuple('ProbeResult', ['path', 'rtsp_url', 'frame_shape'])
+
+
+def build_rtsp_url(ip, port, username, password, path):
+    if username and password:
+        return f"rtsp://{username}:{password}@{ip}:{port}{path}"
+    return f"rtsp://{ip}:{port}{path}"
+
+
+def tcp_reachable(ip, port, timeout=TCP_TIMEOUT):
+    """True if something accepts TCP connections on the RTSP port"""
+    try:
+        with socket.create_connection((ip, int(port)), timeout=timeout):
+            return True
+    except (OSError, TypeError, ValueError):
+        return False
+
+
+def probe_rtsp_url(rtsp_url, timeout_ms=PROBE_TIMEOUT_MS):
+    """Open ``rtsp_url`` and read one frame; return its shape, or None on failure"""
+    cap = cv2.VideoCapture(rtsp_url, cv2.CAP_FFMPEG)
+    try:
+        cap.set(cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, timeout_ms)
+        cap.set(cv2.CAP_PROP_READ_TIMEOUT_MSEC, timeout_ms)
+        if not cap.isOpened():
+            return None
+        ret, frame = cap.read()
+        if ret and frame is not None:
+            return frame.shape
+        return None
+    except Exception:
+        return None
+    finally:
+        cap.release()
+
+
+class ProbeCache:
+    """Successful probe results per (ip, port, username, password), kept for CACHE_TTL"""
+
+    def __init__(self, ttl=CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._results = {}
+
+    @staticmethod
+    def key(ip, port, username, password):
+        return ip, int(port), username or '', password or ''
+
+    def get(self, key, max_age=None):
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None:
+                return None
+            result, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age > self.ttl:
+                del self._results[key]
+                return None
+            if max_age is not None and age > max_age:
+                return None
+            return result
+
+    def set(self, key, result):
+        with self._lock:
+            self._results[key] = (result, time.monotonic())
+
+    def discard(self, key):
+        with self._lock:
+            self._results.pop(key, None)
+
+
+probe_cache = ProbeCache()
+
+
+def detect_rtsp_path(ip, port, username, password, paths=COMMON_RTSP_PATHS):
+    """Find a working RTSP path, probing candidates concurrently.
+
+    Dead hosts are rejected by a TCP pre-check before any RTSP open. The first
+    path that yields a frame wins; queued probes are cancelled and probes still
+    running finish in the background within their own timeout.
+    """
+    key = probe_cache.key(ip, port, username, password)
+    cached = probe_cache.get(key)
+    if cached is not None:
+        return cached
+
+    if not tcp_reachable(ip, port):
+        logger.warning(f"RTSP port {ip}:{port} is not reachable")
+        return None
+
+    found = threading.Event()
+
+    def probe(path):
+        if found.is_set():
+            return None
+        rtsp_url = build_rtsp_url(ip, port, username, password, path)
+        shape = probe_rtsp_url(rtsp_url)
+        return ProbeResult(path, rtsp_url, shape) if shape is not None else None
+
+    executor = ThreadPoolExecutor(max_workers=PROBE_WORKERS, thread_name_prefix='rtsp-probe')
+    try:
+        futures = [executor.submit(probe, path) for path in paths]
+        for future in as_completed(futures):
+            result = future.result()
+            if result is not None:
+                found.set()
+                probe_cache.set(key, result)
+                return result
+        return None
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def check_camera(camera):
+    """Probe a saved camera's RTSP URL, reusing a fresh cached result for it.
+
+    Returns ``(result, error)``; ``result`` is a ProbeResult on success.
+    """
+    key = probe_cache.key(camera.ip_address, camera.port, camera.username, camera.password)
+    cached = probe_cache.get(key, max_age=CHECK_MAX_AGE)
+    if cached is not None and cached.rtsp_url == camera.rtsp_url:
+        return cached, None
+
+    if not tcp_reachable(camera.ip_address, camera.port):
+        probe_cache.discard(key)
+        return None, f'Camera is not reachable on {camera.ip_address}:{camera.port}'
+
+    shape = probe_rtsp_url(camera.rtsp_url, timeout_ms=5000)
+    if shape is None:
+        probe_cache.discard(key)
+        return None, 'Could not open camera connection or read frames'
+
+    result = ProbeResult(camera.stream_path, camera.rtsp_url, shape)
+    probe_cache.set(key, result)
+    return result, None
@@ -0,0 +1,263 @@
+"""Serve camera feeds from the camera service's shared-memory frame exports.
+
+Instead of re-proxying the MJPEG stream from port 8001, this process attaches
+to the camera's exported ring. One SharedReader per camera and rendition copies
+each new JPEG out of the ring into a local FrameBus, and every viewer here is
+fed from that bus. The reader blocks on a Unix datagram socket that the camera
+service pings on every publish, so nothing polls the ring. Its reader slot in
+the channel reports the viewer count and bytes sent, which the camera service
+adds to its own /api/metrics/ counters. The camera service is only contacted
+over HTTP to start a camera that is not exported yet.
+"""
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import requests
+from django.conf import settings
+
+from camera_service.camera_api.circuit import OPEN
+from camera_service.camera_api.frame_bus import FrameBus, aiter_parts
+from camera_service.camera_api.frame_channel import READER_TTL, RENDITION_NAMES, SharedFrameChannel, channel_name
+from camera_service.camera_api.metrics import Counter
+from camera_service.camera_api.placeholder import placeholder_part
+from camera_service.camera_api.renditions import pick_rendition
+
+from .upstream import requested_fps, service_get, upstream_pool
+
+logger = logging.getLogger('cameras')
+
+# A reader rechecks the ring and refreshes its slot at least this often, even
+# without a notification; must stay well under the camera service's READER_TTL
+REFRESH_INTERVAL = 0.25
+# Ring check interval for a reader that could not get notifications (no AF_UNIX
+# or all reader slots taken); one thread per camera, not per viewer
+POLL_INTERVAL = 0.02
+
+_OPEN_PATHS = {
+    'camera': 'cameras',
+    'mobile': 'mobile-cameras',
+}
+
+
+def open_channel(kind, camera_id):
+    """Attach to a camera's export, asking the camera service to start it if needed"""
+    channel = SharedFrameChannel.attach(channel_name(kind, camera_id))
+    if channel is not None:
+        if not channel.closed:
+            return channel
+        channel.close()
+
+    response = service_get(f'/api/{_OPEN_PATHS[kind]}/{camera_id}/open/')
+    response.raise_for_status()
+    name = response.json().get('channel')
+    return SharedFrameChannel.attach(name) if name else None
+
+
+class SharedReader:
+    """Reads one rendition of an exported camera for all viewers in this process.
+
+    Looks enough like a camera streamer (``buses``, ``wait_for_frame``,
+    ``placeholder_part``, ``bytes_out``) for ``frame_bus.aiter_parts`` to serve
+    viewers from it.
+    """
+
+    def __init__(self, kind, camera_id, rendition, channel):
+        self.kind = kind
+        self.camera_id = camera_id
+        self.rendition = rendition
+        self.index = RENDITION_NAMES.index(rendition)
+        self.channel = channel
+        self.bus = FrameBus()
+        self.buses = {rendition: self.bus}
+        self.bytes_out = Counter()
+        self.viewers = 0
+        self.running = False
+        # Set when the export went away and could not be reopened
+        self.failed = False
+        self.circuit_open = False
+        self.address = f'{os.getpid()}-{id(self):x}'
+        self._socket = None
+        self._slot = None
+        self._thread = None
+
+    def start(self):
+        if hasattr(socket, 'AF_UNIX'):
+            self.address = os.path.join(tempfile.gettempdir(), f'edumi-reader-{self.address}.sock')
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._socket.bind(self.address)
+        self.running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        # The thread notices within REFRESH_INTERVAL and cleans up
+        self.running = False
+        self.bus.close()
+
+    def wait_for_frame(self, last_seq, timeout=1.0, rendition=None):
+        return self.bus.wait(last_seq, timeout)
+
+    async def wait_for_frame_async(self, last_seq, timeout=1.0, rendition=None):
+        return await self.bus.wait_async(last_seq, timeout)
+
+    def placeholder_part(self, rendition):
+        """"Camera offline" part while the camera's circuit is open, else None"""
+        return placeholder_part(rendition) if self.circuit_open else None
+
+    def _run(self):
+        last_seq = 0
+        try:
+            while self.running:
+                if self.channel.closed:
+                    # The streamer stopped or restarted; follow it to the new export
+                    if not self._reopen():
+                        self.failed = True
+                        break
+                    last_seq = 0
+
+                now = time.time()
+                self._refresh(now)
+                seq = self.channel.latest_seq(self.index)
+                if seq > last_seq:
+                    frame = self.channel.read(self.index, seq)
+                    if frame is not None:
+                        last_seq = seq
+                        self.bus.publish(frame)
+                self.circuit_open = self.channel.read_circuit(now)['state'] == OPEN
+                self._wait()
+        except Exception as e:
+            logger.error(f"Shared frame reader for {self.kind} camera {self.camera_id} failed: {e}")
+            self.failed = True
+        finally:
+            self.running = False
+            self.bus.close()
+            if self.channel is not None:
+                self.channel.close()
+                self.channel = None
+            if self._socket is not None:
+                self._socket.close()
+                try:
+                    os.unlink(self.address)
+                except OSError:
+                    pass
+
+    def _reopen(self):
+        self.channel.close()
+        self.channel = None
+        self._slot = None
+        try:
+            self.channel = open_channel(self.kind, self.camera_id)
+        except (requests.exceptions.RequestException, OSError, ValueError) as e:
+            logger.warning(f"Could not reopen shared frames for {self.kind} camera {self.camera_id}: {e}")
+            return False
+        return self.channel is not None
+
+    def _refresh(self, now):
+        # Keeps the streamer alive, its rendition encoded and our viewers counted
+        self.channel.last_access = now
+        if self._slot is None:
+            self._slot = self.channel.claim_reader(self.address, now, READER_TTL)
+        if self._slot is not None:
+            self.channel.update_reader(self._slot, self.address, now, self.index,
+                                       self.viewers, self.bytes_out.value)
+
+    def _wait(self):
+        if self._socket is None or self._slot is None:
+            time.sleep(POLL_INTERVAL)
+            return
+        self._socket.settimeout(REFRESH_INTERVAL)
+        try:
+            self._socket.recv(16)
+        except socket.timeout:
+            return
+        # Several publishes may have queued up; the ring only holds the newest anyway
+        self._socket.setblocking(False)
+        try:
+            while self._socket.recv(16):
+                pass
+        except BlockingIOError:
+            pass
+
+
+class SharedReaderPool:
+    """One SharedReader per camera and rendition, shared by all local viewers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._readers = {}
+
+    def acquire(self, kind, camera_id, rendition):
+        """Attach a viewer, opening the export only if nobody here is reading it yet.
+
+        Returns None if the camera service has no export for the camera; raises
+        what ``open_channel`` raises.
+        """
+        key = (kind, camera_id, rendition)
+        with self._lock:
+            reader = self._readers.get(key)
+            if reader is not None and reader.running:
+                reader.viewers += 1
+                return reader
+        channel = open_channel(kind, camera_id)
+        if channel is None:
+            return None
+        with self._lock:
+            reader = self._readers.get(key)
+            if reader is not None and reader.running:
+                # Another viewer opened it meanwhile
+                channel.close()
+                reader.viewers += 1
+                return reader
+            reader = SharedReader(kind, camera_id, rendition, channel)
+            reader.viewers = 1
+            self._readers[key] = reader
+        reader.start()
+        return reader
+
+    def release(self, reader):
+        """Detach a viewer; the last one out stops the reader"""
+        key = (reader.kind, reader.camera_id, reader.rendition)
+        with self._lock:
+            reader.viewers -= 1
+            if reader.viewers > 0:
+                return
+            if self._readers.get(key) is reader:
+                del self._readers[key]
+        reader.stop()
+
+
+shared_readers = SharedReaderPool()
+
+
+async def aiter_shared_parts(reader, params):
+    """Yield multipart parts for one viewer of a shared reader"""
+    try:
+        async for part in aiter_parts(reader, reader.rendition, requested_fps(params)):
+            yield part
+    finally:
+        shared_readers.release(reader)
+    if reader.failed:
+        # The export is gone for good: carry on over the HTTP proxy, which
+        # reports an unreachable camera service itself
+        async for part in upstream_pool.aiter_feed(reader.kind, reader.camera_id, params):
+            yield part
+
+
+def shared_feed(kind, camera_id, params):
+    """Frame generator for a viewer, or None to fall back to the HTTP proxy"""
+    if not settings.CAMERA_SHARED_FRAMES:
+        return None
+    rendition = pick_rendition(params.get('quality'), params.get('width'))
+    try:
+        reader = shared_readers.acquire(kind, camera_id, rendition)
+    except (requests.exceptions.RequestException, OSError, ValueError) as e:
+        logger.warning(f"Shared frames unavailable for {kind} camera {camera_id}: {e}")
+        return None
+    if reader is None:
+        return None
+    params = {key: params[key] for key in ('quality', 'width', 'fps') if key in params}
+    return aiter_shared_parts(reader, params)
@@ -1,3 +1,46 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from requests.exceptions import ReadTimeout
+
+from .models import Camera
+
+
+class CameraSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        camera = Camera.objects.create(name='Room 1', rtsp_url='rtsp://cam.invalid/1', ip_address='10.0.0.1')
+        self.url = reverse('camera_snapshot', args=[camera.id])
+        upstream = mock.Mock(status_code=200, headers={'ETag': '"a1b2-sd-7"'}, content=b'jpeg bytes')
+        patcher = mock.patch('cameras.views.service_get', return_value=upstream)
+        self.service_get = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_snapshot_is_proxied_with_the_upstream_etag(self):
+        response = self.client.get(self.url, {'quality': 'thumb'})
+        self.assertEqual((response.status_code, response.content), (200, b'jpeg bytes'))
+        self.assertEqual(response['ETag'], '"a1b2-sd-7"')
+        self.assertEqual(self.service_get.call_args.kwargs['params'], {'quality': 'thumb'})
+
+    def test_matching_etag_is_not_modified(self):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"a1b2-sd-7"')
+        self.assertEqual((response.status_code, response.content), (304, b''))
+
+    def test_polls_within_the_ttl_share_one_upstream_fetch(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.assertEqual(self.service_get.call_count, 1)
+
+    def test_unknown_quality_is_rejected_without_asking_upstream(self):
+        response = self.client.get(self.url, {'quality': 'ultra'})
+        self.assertEqual(response.status_code, 400)
+        self.service_get.assert_not_called()
 
-# Create your tests here.
+    def test_upstream_timeout_is_a_gateway_timeout(self):
+        self.service_get.side_effect = ReadTimeout()
+        self.assertEqual(self.client.get(self.url).status_code, 504)
@@ -0,0 +1,204 @@
+"""Pooled, bounded HTTP client for the camera service on port 8001.
+
+All main-app requests to the camera service go through one keep-alive
+``requests.Session`` with connect/read deadlines, so a hung service can no
+longer pin a worker forever. Feed proxies keep a single upstream stream per
+camera and rendition; its parsed frames are fanned out to every local viewer
+through a FrameBus, and it is torn down when the last viewer leaves. Loopback
+traffic therefore grows with cameras, not viewers. Viewers are async
+generators awaiting that bus, so under daphne they hold no thread.
+"""
+import asyncio
+import logging
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from camera_service.camera_api.frame_bus import FrameBus
+from camera_service.camera_api.mjpeg import MJPEGParser
+from camera_service.camera_api.pacing import FramePacer
+from camera_service.camera_api.renditions import pick_rendition
+
+logger = logging.getLogger('cameras')
+
+CONNECT_TIMEOUT = 3
+# A healthy feed sends a frame many times per second; silence this long means
+# the upstream is stuck and gets reconnected
+READ_TIMEOUT = 15
+RETRY_DELAY = 2
+
+_FEED_PATHS = {
+    'camera': 'cameras',
+    'mobile': 'mobile-cameras',
+}
+
+
+def _make_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+session = _make_session()
+
+
+def service_get(path, timeout=5, **kwargs):
+    """GET ``path`` on the camera service through the shared keep-alive session"""
+    return session.get(f'{settings.CAMERA_SERVICE_URL}{path}', timeout=timeout, **kwargs)
+
+
+def requested_fps(params):
+    """Per-viewer ``?fps=`` as a positive float, or None for every frame"""
+    try:
+        fps = float(params['fps']) if params.get('fps') else None
+    except ValueError:
+        return None
+    return fps if fps and fps > 0 else None
+
+
+def error_part(message):
+    """A text multipart part telling the viewer why there is no video"""
+    return (b'--frame\r\n'
+            b'Content-Type: text/plain\r\n\r\n'
+            b'ERROR: ' + message.encode() + b'\r\n')
+
+
+class Upstream:
+    """One HTTP feed from the camera service, shared by any number of viewers"""
+
+    def __init__(self, kind, camera_id, params):
+        self.kind = kind
+        self.camera_id = camera_id
+        self.params = params
+        self.bus = FrameBus()
+        self.viewers = 0
+        self.running = False
+        self.error = None
+        self._response = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return f'{settings.CAMERA_SERVICE_URL}/api/{_FEED_PATHS[self.kind]}/{self.camera_id}/feed/'
+
+    def start(self):
+        self.running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.running = False
+        response = self._response
+        if response is not None:
+            # Unblocks the reader thread's pending socket read
+            response.close()
+        self.bus.close()
+
+    def _run(self):
+        connected = False
+        while self.running:
+            try:
+                response = session.get(self.url, params=self.params, stream=True,
+                                       timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+                self._response = response
+                response.raise_for_status()
+                connected = True
+                parser = MJPEGParser()
+                for chunk in response.iter_content(chunk_size=8192):
+                    if not self.running:
+                        break
+                    for jpg in parser.feed(chunk):
+                        self.bus.publish(jpg)
+            except requests.exceptions.ConnectionError as e:
+                if not self.running:
+                    break
+                if not connected:
+                    logger.error(f"Camera service not running on port 8001: {e}")
+                    self.error = 'Camera service not running on port 8001.'
+                    break
+                logger.warning(f"Upstream for {self.kind} camera {self.camera_id} dropped: {e}")
+            except requests.exceptions.RequestException as e:
+                if not self.running:
+                    break
+                if not connected:
+                    logger.error(f"Error proxying {self.kind} camera {self.camera_id}: {e}")
+                    self.error = str(e)
+                    break
+                logger.warning(f"Upstream for {self.kind} camera {self.camera_id} failed: {e}")
+            finally:
+                if self._response is not None:
+                    self._response.close()
+                    self._response = None
+            if self.running:
+                time.sleep(RETRY_DELAY)
+        self.bus.close()
+
+
+class UpstreamPool:
+    """One upstream feed per camera and rendition, shared by all local viewers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._upstreams = {}
+
+    def acquire(self, kind, camera_id, rendition):
+        """Attach a viewer, opening the upstream only if nobody is watching yet"""
+        key = (kind, camera_id, rendition)
+        with self._lock:
+            upstream = self._upstreams.get(key)
+            created = upstream is None or upstream.bus.closed
+            if created:
+                upstream = Upstream(kind, camera_id, {'quality': rendition})
+                self._upstreams[key] = upstream
+            upstream.viewers += 1
+        if created:
+            upstream.start()
+        return upstream
+
+    def release(self, upstream):
+        """Detach a viewer; the last one out closes the upstream"""
+        key = (upstream.kind, upstream.camera_id, upstream.params['quality'])
+        with self._lock:
+            upstream.viewers -= 1
+            if upstream.viewers > 0:
+                return
+            if self._upstreams.get(key) is upstream:
+                del self._upstreams[key]
+        upstream.stop()
+
+    async def aiter_feed(self, kind, camera_id, params):
+        """Yield multipart parts for one viewer of a camera.
+
+        The upstream always runs at the full rate; ``?fps=`` is applied here
+        per viewer so viewers asking for different rates still share it.
+        """
+        rendition = pick_rendition(params.get('quality'), params.get('width'))
+        fps = requested_fps(params)
+        pacer = FramePacer(fps) if fps else None
+        upstream = self.acquire(kind, camera_id, rendition)
+        bus = upstream.bus
+        try:
+            seq = 0
+            while not bus.closed:
+                seq, part = await bus.wait_async(seq, 1.0)
+                if part is None:
+                    continue
+                if pacer is not None:
+                    delay = pacer.delay(time.monotonic())
+                    if delay:
+                        await asyncio.sleep(delay)
+                        seq, part = bus.latest_part()
+                    pacer.mark(time.monotonic())
+                yield part
+            if upstream.error:
+                yield error_part(upstream.error)
+        finally:
+            self.release(upstream)
+
+
+upstream_pool = UpstreamPool()
@@ -1,15 +1,24 @@
+import asyncio
 import cv2
 import threading
 import time
 import logging
 from typing import Optional
 from urllib.parse import urlparse
+from requests.exceptions import ReadTimeout, RequestException
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import StreamingHttpResponse, JsonResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse, JsonResponse
 from django.contrib.auth.models import User
 from .models import Camera, CameraPermission
+from .probing import check_camera, detect_rtsp_path
+from .shared_frames import shared_feed
+from .health import camera_health
+from .upstream import service_get, upstream_pool
 from mobile_cameras.models import MobileCamera, MobileCameraPermission
+from camera_service.camera_api.renditions import RENDITIONS, pick_rendition
 
 logger = logging.getLogger('cameras')
 
@@ -41,47 +50,10 @@ def can_view_camera(user, camera):
 
 def test_rtsp_paths(ip, port, username, password):
     """Test common RTSP paths to find the working one"""
-    common_paths = [
-        '/live',
-        '/stream',
-        '/h264',
-        '/video',
-        '/cam/realmonitor',
-        '/Streaming/Channels/101',
-        '/1',
-        '/11',
-        '/av0_0',
-        '/mpeg4',
-        '/media/video1',
-        '/onvif1',
-        '/ch0',
-        '/ch01.264',
-        '/',
-    ]
-    
-    for path in common_paths:
-        if username and password:
-            rtsp_url = f"rtsp://{username}:{password}@{ip}:{port}{path}"
-        else:
-            rtsp_url = f"rtsp://{ip}:{port}{path}"
-        
-        try:
-            cap = cv2.VideoCapture(rtsp_url, cv2.CAP_FFMPEG)
-            cap.set(cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, 3000)
-            cap.set(cv2.CAP_PROP_READ_TIMEOUT_MSEC, 3000)
-            
-            if cap.isOpened():
-                ret, frame = cap.read()
-                cap.release()
-                
-                if ret and frame is not None:
-                    return path, rtsp_url
-            else:
-                cap.release()
-        except Exception as e:
-            continue
-    
-    return None, None
+    result = detect_rtsp_path(ip, port, username, password)
+    if result is None:
+        return None, None
+    return result.path, result.rtsp_url
 
 
 def parse_rtsp_url(url):
@@ -372,47 +344,22 @@ def camera_feed(request, camera_id):
     if not can_view_camera(request.user, camera):
         return JsonResponse({'error': 'You do not have permission to view this camera'}, status=403)
     
-    import requests
-    
-    def generate_frames():
+    async def generate_frames():
         """Proxy frames from camera service"""
         try:
-            camera_service_url = f'http://localhost:8001/api/cameras/{camera_id}/feed/'
-            logger.info(f"Proxying camera {camera_id} from {camera_service_url}")
-            
-            response = requests.get(camera_service_url, stream=True, timeout=None)
-            response.raise_for_status()
-            
-            # Stream the response directly
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    yield chunk
-                    
-        except requests.exceptions.ConnectionError as e:
-            # Camera service is not running
-            logger.error(f"Camera service not running on port 8001: {e}")
-            error_msg = (
-                b'--frame\r\n'
-                b'Content-Type: text/plain\r\n\r\n'
-                b'ERROR: Camera service not running on port 8001.\r\n'
-            )
-            yield error_msg
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error proxying camera {camera_id}: {e}")
-            error_msg = (
-                b'--frame\r\n'
-                b'Content-Type: text/plain\r\n\r\n'
-                b'ERROR: ' + str(e).encode() + b'\r\n'
-            )
-            yield error_msg
-        except GeneratorExit:
+            logger.info(f"Proxying camera {camera_id} from the camera service")
+            # Requested rendition (?quality= / ?width=) and per-viewer ?fps=
+            params = {key: request.GET[key] for key in ('quality', 'width', 'fps') if key in request.GET}
+            async for part in upstream_pool.aiter_feed('camera', camera_id, params):
+                yield part
+        except (GeneratorExit, asyncio.CancelledError):
             logger.info(f"Client disconnected from camera {camera_id}")
-        except Exception as e:
-            logger.error(f"Unexpected error proxying camera {camera_id}: {e}")
-
+            raise
 
+    # Read frames straight from the camera service's shared memory when possible
+    frames = shared_feed('camera', camera_id, request.GET) or generate_frames()
     response = StreamingHttpResponse(
-        generate_frames(),
+        frames,
         content_type='multipart/x-mixed-replace; boundary=frame'
     )
     response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
@@ -422,6 +369,50 @@ def camera_feed(request, camera_id):
     response['Connection'] = 'keep-alive'
     return response
 
+# The camera service waits up to SNAPSHOT_WAIT (5 s) for a cold camera's first
+# frame; give it that plus the connection's own overhead
+SNAPSHOT_TIMEOUT = 8
+
+def camera_snapshot(request, camera_id):
+    """Latest frame of a camera as a single JPEG, proxied from camera service"""
+    camera = get_object_or_404(Camera, id=camera_id)
+    
+    # Check permission
+    if not can_view_camera(request.user, camera):
+        return JsonResponse({'error': 'You do not have permission to view this camera'}, status=403)
+    
+    quality = request.GET.get('quality')
+    if quality and quality not in RENDITIONS:
+        return JsonResponse({'error': f'Unknown quality {quality!r}', 'renditions': list(RENDITIONS)}, status=400)
+    rendition = pick_rendition(quality, request.GET.get('width'))
+    # Dashboards poll this; a short cache turns N tabs into one upstream fetch
+    cache_key = f'camera_snapshot:{camera_id}:{rendition}'
+    snapshot = cache.get(cache_key)
+    if snapshot is None:
+        try:
+            upstream = service_get(f'/api/cameras/{camera_id}/snapshot.jpg', timeout=SNAPSHOT_TIMEOUT,
+                                   params={'quality': rendition})
+        except ReadTimeout:
+            logger.warning(f"Camera service timed out on a snapshot of camera {camera_id}")
+            return JsonResponse({'error': 'Camera service timed out waiting for a frame'}, status=504)
+        except RequestException as e:
+            logger.error(f"Error fetching snapshot for camera {camera_id}: {e}")
+            return JsonResponse({'error': 'Camera service not running on port 8001'}, status=503)
+        if upstream.status_code != 200:
+            return JsonResponse({'error': 'Snapshot not available'}, status=upstream.status_code)
+        snapshot = (upstream.headers.get('ETag', ''), upstream.content)
+        cache.set(cache_key, snapshot, settings.CAMERA_SNAPSHOT_TTL)
+    
+    etag, frame = snapshot
+    if etag and etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(frame, content_type='image/jpeg')
+    if etag:
+        response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
 @login_required
 def live_monitor(request):
     """View to see all live camera feeds in a grid"""
@@ -451,22 +442,22 @@ def live_monitor(request):
         cameras = Camera.objects.none()
         mobile_cameras = MobileCamera.objects.none()
     
-    # Check if camera service is running
-    import requests
-    camera_service_running = False
-    try:
-        response = requests.get('http://localhost:8001/api/cameras/', timeout=2)
-        camera_service_running = response.status_code == 200
-    except:
-        pass
+    # Camera service status comes from the background health monitor
+    health = camera_health()
     
     context = {
         'cameras': cameras,
         'mobile_cameras': mobile_cameras,
-        'camera_service_running': camera_service_running,
+        'camera_service_running': health['service']['running'],
+        'camera_health': health,
     }
     return render(request, 'cameras/live_monitor.html', context)
 
+@login_required
+def camera_health_status(request):
+    """Cached health of the camera service and cameras, for JS pollers"""
+    return JsonResponse(camera_health())
+
 @login_required
 def view_camera(request, camera_id):
     """View a single camera feed"""
@@ -483,28 +474,15 @@ def test_camera(request, camera_id):
     camera = get_object_or_404(Camera, id=camera_id)
     
     try:
-        cap = cv2.VideoCapture(camera.rtsp_url, cv2.CAP_FFMPEG)
-        cap.set(cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, 5000)
-        cap.set(cv2.CAP_PROP_READ_TIMEOUT_MSEC, 5000)
-        
-        if cap.isOpened():
-            ret, frame = cap.read()
-            cap.release()
-            
-            if ret and frame is not None:
-                return JsonResponse({
-                    'status': 'success',
-                    'message': f'Camera is accessible. Frame size: {frame.shape}'
-                })
+        result, error = check_camera(camera)
+        if result is not None:
             return JsonResponse({
-                'status': 'error',
-                'message': 'Camera opened but could not read frames'
+                'status': 'success',
+                'message': f'Camera is accessible. Frame size: {result.frame_shape}'
             })
-        
-        cap.release()
         return JsonResponse({
             'status': 'error',
-            'message': 'Could not open camera connection'
+            'message': error
         })
     except Exception as e:
         return JsonResponse({
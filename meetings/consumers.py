@@ -1,14 +1,51 @@
+import asyncio
 import json
+import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.contrib.auth.models import User
-from .models import Meeting, MeetingParticipant
+from .models import Meeting
+from .presence import participant_entry, presence
+from .sfu import sfu, sfu_threshold
+
+logger = logging.getLogger('meetings')
+
+# Trickle-ICE candidates for one peer are held this long and forwarded as one
+# ice_candidates message
+ICE_BATCH_WINDOW = 0.02
 
 class MeetingConsumer(AsyncWebsocketConsumer):
+    """Meeting room signaling.
+
+    Every consumer keeps a registry of the room's peers (user id -> channel
+    name), learned from ``user_joined`` broadcasts and the direct
+    ``peer_channel`` introductions sent back to each newcomer. Offers, answers
+    and ICE candidates for a known peer go to that one channel with
+    ``channel_layer.send``; only unknown or untargeted ones use the room group.
+    The registry needs no shared store, so it works with any channel layer.
+
+    ICE candidates (single ``ice_candidate`` or batched ``ice_candidates``
+    messages) are coalesced per target peer for ``ICE_BATCH_WINDOW`` and
+    delivered as one ``ice_candidates`` frame.
+
+    With ``MEETING_SFU_ENABLED``, once the room grows past
+    ``MEETING_SFU_THRESHOLD`` participants it is switched to SFU mode (see
+    ``meetings.sfu``) with a ``media_mode`` message, and media then flows
+    through this process instead of the mesh.
+
+    Connections are tracked in ``meetings.presence``. A newcomer gets the
+    full participant list in a ``presence`` message, and the room gets a
+    ``presence_diff`` whenever a user appears or their last tab closes.
+    """
+
     async def connect(self):
         self.meeting_code = self.scope['url_route']['kwargs']['meeting_code']
         self.room_group_name = f'meeting_{self.meeting_code}'
         self.user = self.scope['user']
+        self.peer_channels = {}
+        self.pending_candidates = {}
+        self.flush_tasks = set()
+        self.sfu_joined = False
+        self.meeting_id = None
         
         # Join room group
         await self.channel_layer.group_add(
@@ -17,6 +54,20 @@ class MeetingConsumer(AsyncWebsocketConsumer):
         )
         
         await self.accept()
+        if sfu.is_active(self.meeting_code):
+            await self.send(text_data=json.dumps({'type': 'media_mode', 'mode': 'sfu'}))
+        
+        meeting = await self.get_meeting()
+        if meeting is not None:
+            self.meeting_id, teacher_id = meeting
+            entry = participant_entry(self.user, teacher_id)
+            newly_present, participants = await presence.add(self.meeting_id, self.channel_name, entry)
+            await self.send_json({'type': 'presence', 'participants': participants})
+            if newly_present:
+                await self.channel_layer.group_send(
+                    self.room_group_name,
+                    {'type': 'presence_diff', 'joined': [entry], 'left': []}
+                )
         
         # Notify others that user joined
         await self.channel_layer.group_send(
@@ -24,18 +75,31 @@ class MeetingConsumer(AsyncWebsocketConsumer):
             {
                 'type': 'user_joined',
                 'user_id': self.user.id,
-                'username': self.user.username
+                'username': self.user.username,
+                'channel_name': self.channel_name
             }
         )
     
     async def disconnect(self, close_code):
+        # Candidates still waiting for their batch are useless now
+        self.pending_candidates.clear()
+        if self.sfu_joined:
+            await sfu.leave(self.meeting_code, self.user.id)
+        if self.meeting_id is not None:
+            entry = await presence.remove(self.meeting_id, self.channel_name)
+            if entry is not None:
+                await self.channel_layer.group_send(
+                    self.room_group_name,
+                    {'type': 'presence_diff', 'joined': [], 'left': [entry['id']]}
+                )
         # Notify others that user left
         await self.channel_layer.group_send(
             self.room_group_name,
             {
                 'type': 'user_left',
                 'user_id': self.user.id,
-                'username': self.user.username
+                'username': self.user.username,
+                'channel_name': self.channel_name
             }
         )
         
@@ -51,8 +115,7 @@ class MeetingConsumer(AsyncWebsocketConsumer):
         
         if message_type == 'offer':
             # Forward WebRTC offer to specific peer
-            await self.channel_layer.group_send(
-                self.room_group_name,
+            await self.send_to_peer(
                 {
                     'type': 'webrtc_offer',
                     'offer': data['offer'],
@@ -64,8 +127,7 @@ class MeetingConsumer(AsyncWebsocketConsumer):
         
         elif message_type == 'answer':
             # Forward WebRTC answer to specific peer
-            await self.channel_layer.group_send(
-                self.room_group_name,
+            await self.send_to_peer(
                 {
                     'type': 'webrtc_answer',
                     'answer': data['answer'],
@@ -75,17 +137,22 @@ class MeetingConsumer(AsyncWebsocketConsumer):
                 }
             )
         
-        elif message_type == 'ice_candidate':
-            # Forward ICE candidate to specific peer
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'ice_candidate',
-                    'candidate': data['candidate'],
-                    'from_user_id': self.user.id,
-                    'to_user_id': data.get('to_user_id')
-                }
-            )
+        elif message_type in ('ice_candidate', 'ice_candidates'):
+            # Forward ICE candidates to specific peer, batched
+            candidates = data['candidates'] if message_type == 'ice_candidates' else [data['candidate']]
+            self.queue_candidates(data.get('to_user_id'), candidates)
+        
+        elif message_type == 'sfu_offer':
+            # Publish to the SFU; subscriptions arrive as server offers
+            room = sfu.room(self.meeting_code)
+            if room is not None:
+                self.sfu_joined = True
+                await room.join(self.user.id, self.send_json, data['offer'])
+        
+        elif message_type == 'sfu_answer':
+            room = sfu.room(self.meeting_code)
+            if room is not None:
+                await room.answer(self.user.id, data['answer'])
         
         elif message_type == 'chat':
             # Broadcast chat message
@@ -100,14 +167,85 @@ class MeetingConsumer(AsyncWebsocketConsumer):
                 }
             )
     
+    async def send_to_peer(self, event):
+        """Deliver a signaling event to its ``to_user_id`` only, if that peer's channel is known"""
+        channel_name = self.peer_channels.get(event.get('to_user_id'))
+        if channel_name is not None:
+            await self.channel_layer.send(channel_name, event)
+        else:
+            # Broadcast, or a peer not introduced yet: receivers filter on to_user_id
+            await self.channel_layer.group_send(self.room_group_name, event)
+    
+    @database_sync_to_async
+    def get_meeting(self):
+        """(id, teacher id) of the meeting, looked up once per connection"""
+        return Meeting.objects.filter(meeting_code=self.meeting_code).values_list('id', 'teacher_id').first()
+    
+    async def send_json(self, payload):
+        await self.send(text_data=json.dumps(payload))
+    
+    async def switch_to_sfu_if_large(self):
+        # Every member counts the room; the first to see it cross the threshold switches it
+        if len(self.peer_channels) + 1 > sfu_threshold() and sfu.activate(self.meeting_code):
+            await self.channel_layer.group_send(self.room_group_name, {'type': 'media_mode', 'mode': 'sfu'})
+    
+    def queue_candidates(self, to_user_id, candidates):
+        pending = self.pending_candidates.get(to_user_id)
+        if pending is not None:
+            pending.extend(candidates)
+            return
+        self.pending_candidates[to_user_id] = list(candidates)
+        task = asyncio.create_task(self.flush_candidates(to_user_id))
+        # The loop only keeps weak references to tasks
+        self.flush_tasks.add(task)
+        task.add_done_callback(self.flush_tasks.discard)
+
+    async def flush_candidates(self, to_user_id):
+        await asyncio.sleep(ICE_BATCH_WINDOW)
+        candidates = self.pending_candidates.pop(to_user_id, None)
+        if not candidates:
+            return
+        try:
+            await self.send_to_peer({
+                'type': 'ice_candidates',
+                'candidates': candidates,
+                'from_user_id': self.user.id,
+                'to_user_id': to_user_id
+            })
+        except Exception as e:
+            # Nobody awaits this task; a layer error would otherwise vanish
+            logger.warning(f"Dropped {len(candidates)} ICE candidates for user {to_user_id}: {e}")
+    
     async def user_joined(self, event):
+        channel_name = event.get('channel_name')
+        if channel_name and channel_name != self.channel_name:
+            self.peer_channels[event['user_id']] = channel_name
+            # Introduce ourselves so the newcomer can reach us directly too
+            await self.channel_layer.send(channel_name, {
+                'type': 'peer_channel',
+                'user_id': self.user.id,
+                'channel_name': self.channel_name
+            })
         await self.send(text_data=json.dumps({
             'type': 'user_joined',
             'user_id': event['user_id'],
             'username': event['username']
         }))
+        await self.switch_to_sfu_if_large()
+    
+    async def presence_diff(self, event):
+        await self.send_json({'type': 'presence_diff', 'joined': event['joined'], 'left': event['left']})
+    
+    async def media_mode(self, event):
+        await self.send_json({'type': 'media_mode', 'mode': event['mode']})
+    
+    async def peer_channel(self, event):
+        self.peer_channels[event['user_id']] = event['channel_name']
     
     async def user_left(self, event):
+        # A second tab of the same user may have replaced this channel already
+        if self.peer_channels.get(event['user_id']) == event.get('channel_name'):
+            del self.peer_channels[event['user_id']]
         await self.send(text_data=json.dumps({
             'type': 'user_left',
             'user_id': event['user_id'],
@@ -143,6 +281,15 @@ class MeetingConsumer(AsyncWebsocketConsumer):
                 'from_user_id': event['from_user_id']
             }))
     
+    async def ice_candidates(self, event):
+        # Only send to intended recipient
+        if event.get('to_user_id') == self.user.id or event.get('to_user_id') is None:
+            await self.send(text_data=json.dumps({
+                'type': 'ice_candidates',
+                'candidates': event['candidates'],
+                'from_user_id': event['from_user_id']
+            }))
+    
     async def chat_message(self, event):
         await self.send(text_data=json.dumps({
             'type': 'chat',
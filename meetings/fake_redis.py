@@ -0,0 +1,39 @@
+"""In-process Redis stand-in for tests of the Redis channel layer.
+
+Serves fakeredis over TCP (with Lua scripting, which channels-redis needs), so
+several channel layers can share one "server" without installing Redis. Data
+lives in this process's memory only. Requires ``fakeredis[lua]`` (see
+requirements-dev.txt).
+"""
+import socket
+import threading
+
+from fakeredis import TcpFakeServer
+
+
+class FakeRedisServer(TcpFakeServer):
+    """TcpFakeServer tuned for channel-layer traffic.
+
+    Replies go out with TCP_NODELAY: channels-redis pipelines several commands
+    per send, and with Nagle's algorithm each reply after the first waited for
+    the client's delayed ACK, about 40 ms per group_send. Handler threads are
+    daemons, so ``shutdown()`` does not wait for clients parked in a blocking
+    pop.
+    """
+
+    def __init__(self, server_address, **kwargs):
+        super().__init__(server_address, **kwargs)
+        # Set after TcpFakeServer.__init__, which assigns it too
+        self.daemon_threads = True
+
+    def get_request(self):
+        connection, address = super().get_request()
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return connection, address
+
+
+def start(host='127.0.0.1', port=6379):
+    """Serve in a background thread; returns the server (call ``shutdown()`` to stop)"""
+    server = FakeRedisServer((host, port), server_type='redis')
+    threading.Thread(target=server.serve_forever, name='fake-redis', daemon=True).start()
+    return server
@@ -0,0 +1,127 @@
+"""Who is connected to each meeting, maintained by ``MeetingConsumer``.
+
+Every meeting WebSocket registers itself on connect and removes itself on
+disconnect, so the set is exact for as long as sockets are open and never
+depends on a tab remembering to call ``leave_meeting``. Entries are kept per
+channel: a user with two tabs stays present until the last one closes.
+
+With the in-memory channel layer the set lives in this process. When
+``REDIS_URL`` is set (meetings spanning several workers) it is a Redis hash
+per meeting, readable from any worker. A worker that dies without running
+``disconnect`` leaves its entries behind until the hash expires
+(``PRESENCE_TTL`` after the meeting's last connect).
+"""
+import json
+import threading
+
+from django.conf import settings
+
+# Seconds a meeting's Redis hash outlives its most recent connection
+PRESENCE_TTL = 12 * 60 * 60
+
+
+def participant_entry(user, teacher_id):
+    return {'id': user.id, 'username': user.username, 'is_host': user.id == teacher_id}
+
+
+def _unique(entries):
+    """One entry per user, in connection order"""
+    users = {}
+    for entry in entries:
+        users.setdefault(entry['id'], entry)
+    return list(users.values())
+
+
+class MemoryPresence:
+    """Presence for meetings served by this process"""
+
+    def __init__(self):
+        # meeting id -> {channel name: participant entry}
+        self._meetings = {}
+        # get_participants reads from a worker thread
+        self._lock = threading.Lock()
+
+    async def add(self, meeting_id, channel_name, entry):
+        """Register a connection; returns (user newly present, everyone present)"""
+        with self._lock:
+            channels = self._meetings.setdefault(meeting_id, {})
+            was_present = any(other['id'] == entry['id'] for other in channels.values())
+            channels[channel_name] = entry
+            return not was_present, _unique(channels.values())
+
+    async def remove(self, meeting_id, channel_name):
+        """Drop a connection; returns its entry if that was the user's last one"""
+        with self._lock:
+            channels = self._meetings.get(meeting_id, {})
+            entry = channels.pop(channel_name, None)
+            if not channels:
+                self._meetings.pop(meeting_id, None)
+            if entry is None or any(other['id'] == entry['id'] for other in channels.values()):
+                return None
+        return entry
+
+    def participants(self, meeting_id):
+        with self._lock:
+            return _unique(self._meetings.get(meeting_id, {}).values())
+
+
+class RedisPresence:
+    """Presence shared by all workers through one Redis hash per meeting"""
+
+    def __init__(self, url):
+        self.url = url
+        self._client = None
+        self._async_client = None
+
+    def _key(self, meeting_id):
+        return f'meeting_presence:{meeting_id}'
+
+    @property
+    def client(self):
+        if self._client is None:
+            import redis
+            self._client = redis.Redis.from_url(self.url)
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            import redis.asyncio
+            self._async_client = redis.asyncio.Redis.from_url(self.url)
+        return self._async_client
+
+    async def add(self, meeting_id, channel_name, entry):
+        key = self._key(meeting_id)
+        async with self.async_client.pipeline() as pipe:
+            pipe.hset(key, channel_name, json.dumps(entry))
+            pipe.expire(key, PRESENCE_TTL)
+            pipe.hvals(key)
+            _, _, values = await pipe.execute()
+        entries = [json.loads(value) for value in values]
+        # Newly present unless another channel carries the same user
+        return sum(other['id'] == entry['id'] for other in entries) == 1, _unique(entries)
+
+    async def remove(self, meeting_id, channel_name):
+        key = self._key(meeting_id)
+        async with self.async_client.pipeline() as pipe:
+            pipe.hget(key, channel_name)
+            pipe.hdel(key, channel_name)
+            pipe.hvals(key)
+            value, _, values = await pipe.execute()
+        if value is None:
+            return None
+        entry = json.loads(value)
+        if any(json.loads(other)['id'] == entry['id'] for other in values):
+            return None
+        return entry
+
+    def participants(self, meeting_id):
+        return _unique(json.loads(value) for value in self.client.hvals(self._key(meeting_id)))
+
+
+def _make_presence():
+    url = getattr(settings, 'REDIS_URL', None)
+    return RedisPresence(url) if url else MemoryPresence()
+
+
+presence = _make_presence()
@@ -0,0 +1,256 @@
+"""Selective forwarding (SFU) mode for large meetings.
+
+Above ``MEETING_SFU_THRESHOLD`` participants a meeting leaves the peer-to-peer
+mesh: every browser keeps a single RTCPeerConnection to this process,
+publishes its tracks once and receives everybody else's tracks from here, so
+client uplink and CPU stay constant instead of growing with the room.
+
+Signaling rides on the meeting WebSocket. The client sends one
+``sfu_offer`` with its own tracks and gets an ``sfu_answer``; after that only
+the server offers (``sfu_offer`` to the client, whose ``sfu_answer`` comes
+back), each time tracks are added, together with a ``tracks`` map from
+transceiver mid to publishing user id.
+
+Opt-in with ``MEETING_SFU_ENABLED`` and built on aiortc, which is optional:
+without either, meetings stay in mesh mode. aiortc forwards decoded frames
+(one decode per published track, shared via MediaRelay) and encodes per
+subscriber, so it trades server CPU for client bandwidth. A room lives in the
+process that serves its WebSockets, so SFU mode is refused unless the channel
+layer is the in-memory one: with several workers, a meeting's sockets land on
+workers that have no room for it.
+"""
+import asyncio
+import logging
+
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.conf import settings
+
+try:
+    from aiortc import RTCPeerConnection, RTCSessionDescription
+    from aiortc.contrib.media import MediaRelay
+except ImportError:
+    RTCPeerConnection = None
+
+logger = logging.getLogger('meetings')
+
+# Seconds a client gets to answer a server offer before the next one is sent anyway
+ANSWER_TIMEOUT = 10.0
+# Seconds an activated room waits for its first participant before it is dropped
+JOIN_TIMEOUT = 30.0
+
+
+def sfu_available():
+    return RTCPeerConnection is not None
+
+
+def sfu_enabled():
+    """True if meetings may switch to SFU mode in this process"""
+    if not getattr(settings, 'MEETING_SFU_ENABLED', False) or not sfu_available():
+        return False
+    return isinstance(get_channel_layer(), InMemoryChannelLayer)
+
+
+def sfu_threshold():
+    """Participant count above which a meeting switches to SFU mode"""
+    return getattr(settings, 'MEETING_SFU_THRESHOLD', 8)
+
+
+def description(desc):
+    return {'sdp': desc.sdp, 'type': desc.type}
+
+
+async def _drain(track):
+    """Consume a published track so its frames never pile up unread"""
+    try:
+        while True:
+            await track.recv()
+    except Exception:
+        pass
+
+
+class SfuPeer:
+    """One participant's connection to the SFU"""
+
+    def __init__(self, room, user_id, send):
+        self.room = room
+        self.user_id = user_id
+        # Coroutine function delivering a JSON-able dict to the participant
+        self.send = send
+        self.pc = RTCPeerConnection()
+        self.published = []
+        self.closed = False
+        self._drains = []
+        self._senders = []
+        self._pending = []
+        self._ready = False
+        self._answered = asyncio.Event()
+        self._task = None
+        self.pc.on('track', self._on_track)
+
+    def _on_track(self, track):
+        self.published.append(track)
+        self._drains.append(asyncio.ensure_future(_drain(self.room.relay.subscribe(track, buffered=False))))
+        self.room.publish(self.user_id, track)
+
+    async def answer(self, offer):
+        """Answer the participant's publishing offer"""
+        await self.pc.setRemoteDescription(RTCSessionDescription(**offer))
+        await self.pc.setLocalDescription(await self.pc.createAnswer())
+        return description(self.pc.localDescription)
+
+    def start(self):
+        """Begin server-side offers for the tracks queued so far"""
+        self._ready = True
+        self._schedule()
+
+    def subscribe(self, publisher_id, track):
+        self._pending.append((publisher_id, track))
+        self._schedule()
+
+    def unsubscribe(self, publisher_id):
+        for sender, owner in self._senders:
+            if owner == publisher_id and sender.track is not None:
+                sender.replaceTrack(None)
+
+    def _schedule(self):
+        if self._ready and not self.closed and (self._task is None or self._task.done()):
+            self._task = asyncio.ensure_future(self._renegotiate())
+
+    async def _renegotiate(self):
+        # One offer in flight at a time; tracks queued meanwhile go in the next one
+        while self._pending and not self.closed:
+            pending, self._pending = self._pending, []
+            for publisher_id, track in pending:
+                sender = self.pc.addTrack(self.room.relay.subscribe(track))
+                self._senders.append((sender, publisher_id))
+            self._answered.clear()
+            await self.pc.setLocalDescription(await self.pc.createOffer())
+            await self.send({
+                'type': 'sfu_offer',
+                'offer': description(self.pc.localDescription),
+                'tracks': self.track_map(),
+            })
+            try:
+                await asyncio.wait_for(self._answered.wait(), ANSWER_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning(f"SFU peer {self.user_id} did not answer in {ANSWER_TIMEOUT:.0f}s")
+
+    def track_map(self):
+        """Transceiver mid -> id of the user whose track it carries"""
+        owners = {id(sender): owner for sender, owner in self._senders}
+        return {
+            transceiver.mid: owners[id(transceiver.sender)]
+            for transceiver in self.pc.getTransceivers()
+            if id(transceiver.sender) in owners and transceiver.mid is not None
+        }
+
+    async def apply_answer(self, answer):
+        await self.pc.setRemoteDescription(RTCSessionDescription(**answer))
+        self._answered.set()
+
+    async def close(self):
+        self.closed = True
+        self._answered.set()
+        for task in self._drains:
+            task.cancel()
+        await self.pc.close()
+
+
+class SfuRoom:
+    """Participants of one meeting in SFU mode"""
+
+    def __init__(self, meeting_code):
+        self.meeting_code = meeting_code
+        self.peers = {}
+        self.relay = MediaRelay()
+
+    async def join(self, user_id, send, offer):
+        """Connect a participant (replacing an earlier connection) and send it the ``sfu_answer``.
+
+        Server offers for its subscriptions only start once the answer is
+        out, so the client never sees an offer while its own is pending.
+        """
+        previous = self.peers.pop(user_id, None)
+        if previous is not None:
+            await self._remove(previous)
+        peer = SfuPeer(self, user_id, send)
+        self.peers[user_id] = peer
+        answer = await peer.answer(offer)
+        await send({'type': 'sfu_answer', 'answer': answer})
+        for other in list(self.peers.values()):
+            if other is not peer:
+                for track in other.published:
+                    peer.subscribe(other.user_id, track)
+        peer.start()
+
+    def publish(self, user_id, track):
+        for peer in list(self.peers.values()):
+            if peer.user_id != user_id:
+                peer.subscribe(user_id, track)
+
+    async def answer(self, user_id, answer):
+        peer = self.peers.get(user_id)
+        if peer is not None:
+            await peer.apply_answer(answer)
+
+    async def leave(self, user_id):
+        peer = self.peers.pop(user_id, None)
+        if peer is not None:
+            await self._remove(peer)
+
+    async def _remove(self, peer):
+        await peer.close()
+        for other in self.peers.values():
+            other.unsubscribe(peer.user_id)
+
+
+class SfuManager:
+    """SFU rooms of this process; a meeting is in SFU mode while its room exists"""
+
+    def __init__(self):
+        self.rooms = {}
+        self._refusal_logged = False
+
+    def is_active(self, meeting_code):
+        return meeting_code in self.rooms
+
+    def activate(self, meeting_code):
+        """Switch a meeting to SFU mode; True only for the call that switched it"""
+        if meeting_code in self.rooms or not self._enabled():
+            return False
+        room = SfuRoom(meeting_code)
+        self.rooms[meeting_code] = room
+        asyncio.get_running_loop().call_later(JOIN_TIMEOUT, self._drop_if_unused, room)
+        logger.info(f"Meeting {meeting_code} switched to SFU mode")
+        return True
+
+    def _enabled(self):
+        if sfu_enabled():
+            return True
+        if getattr(settings, 'MEETING_SFU_ENABLED', False) and not self._refusal_logged:
+            self._refusal_logged = True
+            logger.warning("MEETING_SFU_ENABLED is set but SFU mode needs aiortc and the in-memory "
+                           "channel layer; meetings stay in mesh mode")
+        return False
+
+    def _drop_if_unused(self, room):
+        # Nobody sent an sfu_offer (e.g. everyone left during the switch); the
+        # next session starts as a mesh again
+        if self.rooms.get(room.meeting_code) is room and not room.peers:
+            del self.rooms[room.meeting_code]
+            logger.info(f"Meeting {room.meeting_code} left SFU mode: nobody joined")
+
+    def room(self, meeting_code):
+        return self.rooms.get(meeting_code)
+
+    async def leave(self, meeting_code, user_id):
+        room = self.rooms.get(meeting_code)
+        if room is None:
+            return
+        await room.leave(user_id)
+        if not room.peers:
+            # Nobody left on the SFU: the next session starts as a mesh again
+            del self.rooms[meeting_code]
+
+
+sfu = SfuManager()
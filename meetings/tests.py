@@ -1,3 +1,277 @@
-from django.test import TestCase
+import asyncio
+import json
+import socket
+import unittest
+import unittest.mock
+from types import SimpleNamespace
 
-# Create your tests here.
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.urls import re_path
+
+from . import consumers
+from .consumers import MeetingConsumer
+from .models import Meeting
+from .presence import MemoryPresence, RedisPresence
+
+try:
+    import channels_redis  # noqa: F401
+    import lupa  # noqa: F401  (fakeredis needs it for the layer's Lua scripts)
+    from .fake_redis import start as start_fake_redis
+except ImportError:
+    start_fake_redis = None
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class WorkerAConsumer(MeetingConsumer):
+    channel_layer_alias = 'worker_a'
+
+
+class WorkerBConsumer(MeetingConsumer):
+    channel_layer_alias = 'worker_b'
+
+
+def worker_app(consumer):
+    return URLRouter([re_path(r'ws/meeting/(?P<meeting_code>\w+)/$', consumer.as_asgi())])
+
+
+@unittest.skipIf(start_fake_redis is None, 'needs channels-redis and fakeredis[lua] (requirements-dev.txt)')
+class MultiWorkerSignalingTests(TransactionTestCase):
+    """Two consumers on separate Redis channel layers, as on two daphne workers"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        port = free_port()
+        cls.redis = start_fake_redis(port=port)
+        layer = {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [{'address': f'redis://127.0.0.1:{port}/0', 'socket_timeout': 30}]},
+        }
+        cls.layers = override_settings(CHANNEL_LAYERS={'worker_a': layer, 'worker_b': layer})
+        cls.layers.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.layers.disable()
+        cls.redis.shutdown()
+        super().tearDownClass()
+
+    async def connect(self, consumer, user_id):
+        communicator = WebsocketCommunicator(worker_app(consumer), '/ws/meeting/multiworker/')
+        communicator.scope['user'] = SimpleNamespace(id=user_id, username=f'user{user_id}')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def receive_type(self, communicator, message_type):
+        """Next message of ``message_type``, skipping presence and join notices"""
+        while True:
+            message = json.loads(await communicator.receive_from(timeout=5))
+            if message['type'] == message_type:
+                return message
+
+    async def test_offer_answer_and_ice_cross_workers(self):
+        alice = await self.connect(WorkerAConsumer, 1)
+        bob = await self.connect(WorkerBConsumer, 2)
+        try:
+            # Alice learns Bob's channel from his join broadcast
+            joined = await self.receive_type(alice, 'user_joined')
+            while joined['user_id'] != 2:
+                joined = await self.receive_type(alice, 'user_joined')
+
+            await alice.send_to(text_data=json.dumps({'type': 'offer', 'offer': {'sdp': 'o'}, 'to_user_id': 2}))
+            offer = await self.receive_type(bob, 'offer')
+            self.assertEqual((offer['from_user_id'], offer['offer']), (1, {'sdp': 'o'}))
+
+            await bob.send_to(text_data=json.dumps({'type': 'answer', 'answer': {'sdp': 'a'}, 'to_user_id': 1}))
+            answer = await self.receive_type(alice, 'answer')
+            self.assertEqual((answer['from_user_id'], answer['answer']), (2, {'sdp': 'a'}))
+
+            for candidate in ('c1', 'c2'):
+                await bob.send_to(text_data=json.dumps({'type': 'ice_candidate', 'candidate': candidate,
+                                                        'to_user_id': 1}))
+            candidates = []
+            while len(candidates) < 2:
+                candidates += (await self.receive_type(alice, 'ice_candidates'))['candidates']
+            self.assertEqual(candidates, ['c1', 'c2'])
+        finally:
+            await asyncio.gather(alice.disconnect(), bob.disconnect())
+
+
+class SignalingTestMixin:
+    """Consumers on the default (in-memory) layer, as within one worker"""
+
+    app = worker_app(MeetingConsumer)
+
+    async def connect(self, user_id, meeting_code='room'):
+        communicator = WebsocketCommunicator(self.app, f'/ws/meeting/{meeting_code}/')
+        communicator.scope['user'] = SimpleNamespace(id=user_id, username=f'user{user_id}')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def messages(self, communicator, message_type, timeout=0.3):
+        """Every ``message_type`` message received until ``timeout`` passes quietly"""
+        found = []
+        while not await communicator.receive_nothing(timeout):
+            message = json.loads(await communicator.receive_from())
+            if message['type'] == message_type:
+                found.append(message)
+        return found
+
+
+class IceBatchingTests(SignalingTestMixin, TransactionTestCase):
+    async def test_candidates_for_one_peer_arrive_as_one_message(self):
+        alice, bob = await self.connect(1), await self.connect(2)
+        try:
+            await self.messages(alice, 'user_joined')
+            for candidate in ('c1', 'c2'):
+                await bob.send_to(text_data=json.dumps({'type': 'ice_candidate', 'candidate': candidate,
+                                                        'to_user_id': 1}))
+            await bob.send_to(text_data=json.dumps({'type': 'ice_candidates', 'candidates': ['c3', 'c4'],
+                                                    'to_user_id': 1}))
+            batches = await self.messages(alice, 'ice_candidates')
+            self.assertEqual([(b['from_user_id'], b['candidates']) for b in batches],
+                             [(2, ['c1', 'c2', 'c3', 'c4'])])
+        finally:
+            await asyncio.gather(alice.disconnect(), bob.disconnect())
+
+    async def test_batches_are_kept_per_target_peer(self):
+        alice, bob, carol = await self.connect(1), await self.connect(2), await self.connect(3)
+        try:
+            await asyncio.gather(self.messages(alice, 'user_joined'), self.messages(bob, 'user_joined'))
+            for to_user_id, candidate in ((1, 'for alice'), (2, 'for bob'), (1, 'alice again')):
+                await carol.send_to(text_data=json.dumps({'type': 'ice_candidate', 'candidate': candidate,
+                                                          'to_user_id': to_user_id}))
+            alice_batches, bob_batches = await asyncio.gather(
+                self.messages(alice, 'ice_candidates'), self.messages(bob, 'ice_candidates'))
+            self.assertEqual([b['candidates'] for b in alice_batches], [['for alice', 'alice again']])
+            self.assertEqual([b['candidates'] for b in bob_batches], [['for bob']])
+        finally:
+            await asyncio.gather(alice.disconnect(), bob.disconnect(), carol.disconnect())
+
+    async def test_pending_candidates_are_dropped_on_disconnect(self):
+        alice, bob = await self.connect(1), await self.connect(2)
+        try:
+            await self.messages(alice, 'user_joined')
+            with unittest.mock.patch.object(consumers, 'ICE_BATCH_WINDOW', 0.2):
+                await bob.send_to(text_data=json.dumps({'type': 'ice_candidate', 'candidate': 'late',
+                                                        'to_user_id': 1}))
+                await asyncio.sleep(0.05)
+                await bob.disconnect()
+            self.assertEqual(await self.messages(alice, 'ice_candidates', timeout=0.5), [])
+        finally:
+            await alice.disconnect()
+
+
+class PresenceContract:
+    """Behaviour both presence backends share; subclasses set ``self.presence``"""
+
+    alice = {'id': 1, 'username': 'alice', 'is_host': True}
+    bob = {'id': 2, 'username': 'bob', 'is_host': False}
+
+    def run_async(self, coroutine):
+        return asyncio.run(coroutine)
+
+    def test_first_connection_of_a_user_is_new(self):
+        self.assertEqual(self.run_async(self.presence.add(7, 'ch-a', self.alice)), (True, [self.alice]))
+        self.assertEqual(self.run_async(self.presence.add(7, 'ch-b', self.bob)), (True, [self.alice, self.bob]))
+        self.assertEqual(self.presence.participants(7), [self.alice, self.bob])
+
+    def test_second_tab_is_not_new_and_keeps_the_user_present(self):
+        self.run_async(self.presence.add(7, 'ch-a1', self.alice))
+        self.assertEqual(self.run_async(self.presence.add(7, 'ch-a2', self.alice)), (False, [self.alice]))
+        self.assertIsNone(self.run_async(self.presence.remove(7, 'ch-a1')))
+        self.assertEqual(self.presence.participants(7), [self.alice])
+        self.assertEqual(self.run_async(self.presence.remove(7, 'ch-a2')), self.alice)
+        self.assertEqual(self.presence.participants(7), [])
+
+    def test_unknown_channel_and_other_meetings_are_left_alone(self):
+        self.run_async(self.presence.add(7, 'ch-a', self.alice))
+        self.run_async(self.presence.add(8, 'ch-b', self.bob))
+        self.assertIsNone(self.run_async(self.presence.remove(7, 'ch-unknown')))
+        self.assertEqual(self.presence.participants(7), [self.alice])
+        self.assertEqual(self.presence.participants(8), [self.bob])
+
+
+class MemoryPresenceTests(PresenceContract, SimpleTestCase):
+    def setUp(self):
+        self.presence = MemoryPresence()
+
+
+@unittest.skipIf(fakeredis is None, 'needs fakeredis (requirements-dev.txt)')
+class RedisPresenceTests(PresenceContract, SimpleTestCase):
+    def setUp(self):
+        self.presence = RedisPresence('redis://unused')
+        server = fakeredis.FakeServer()
+        self.presence._client = fakeredis.FakeRedis(server=server)
+        self.presence._async_client = fakeredis.FakeAsyncRedis(server=server)
+
+    def run_async(self, coroutine):
+        async def run():
+            try:
+                return await coroutine
+            finally:
+                # The async client's connections belong to this run's loop
+                await self.presence._async_client.connection_pool.disconnect()
+        return asyncio.run(run())
+
+    def test_hash_expires_after_the_last_connect(self):
+        self.run_async(self.presence.add(7, 'ch-a', self.alice))
+        self.assertGreater(self.presence.client.ttl('meeting_presence:7'), 0)
+
+
+class PresenceConsumerTests(SignalingTestMixin, TransactionTestCase):
+    def setUp(self):
+        teacher = User.objects.create_user('user1')
+        Meeting.objects.create(title='Maths', teacher=teacher, meeting_code='presence', status='live',
+                               scheduled_time=timezone.now())
+        patcher = unittest.mock.patch.object(consumers, 'presence', MemoryPresence())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_newcomer_gets_the_list_and_the_room_gets_diffs(self):
+        host = await self.connect(1, 'presence')
+        try:
+            listed = (await self.messages(host, 'presence'))[0]['participants']
+            self.assertEqual(listed, [{'id': 1, 'username': 'user1', 'is_host': True}])
+            student = await self.connect(2, 'presence')
+            listed = (await self.messages(student, 'presence'))[0]['participants']
+            self.assertEqual([entry['id'] for entry in listed], [1, 2])
+            diffs = await self.messages(host, 'presence_diff')
+            self.assertEqual([(d['joined'], d['left']) for d in diffs],
+                             [([{'id': 2, 'username': 'user2', 'is_host': False}], [])])
+            await student.disconnect()
+            diffs = await self.messages(host, 'presence_diff')
+            self.assertEqual([(d['joined'], d['left']) for d in diffs], [([], [2])])
+        finally:
+            await host.disconnect()
+
+    async def test_user_stays_present_until_their_last_tab_closes(self):
+        host = await self.connect(1, 'presence')
+        first_tab = await self.connect(2, 'presence')
+        await self.messages(host, 'presence_diff')
+        second_tab = await self.connect(2, 'presence')
+        try:
+            self.assertEqual(await self.messages(host, 'presence_diff'), [])
+            await first_tab.disconnect()
+            self.assertEqual(await self.messages(host, 'presence_diff'), [])
+            await second_tab.disconnect()
+            diffs = await self.messages(host, 'presence_diff')
+            self.assertEqual([d['left'] for d in diffs], [[2]])
+        finally:
+            await host.disconnect()
@@ -6,6 +6,7 @@ from django.views.decorators.http import require_http_methods
 from django.contrib import messages
 from django.contrib.auth.hashers import make_password, check_password
 from .models import Meeting, MeetingParticipant, Classroom, ClassroomMembership
+from .presence import presence
 import random
 import string
 
@@ -454,14 +455,11 @@ def leave_meeting(request, meeting_id):
 
 @login_required
 def get_participants(request, meeting_id):
-    meeting = get_object_or_404(Meeting, id=meeting_id)
-    participants = MeetingParticipant.objects.filter(meeting=meeting, is_active=True)
-    
-    data = [{
-        'id': p.user.id,
-        'username': p.user.username,
-        'is_host': p.user == meeting.teacher
-    } for p in participants]
+    # Served from the meeting sockets' presence set, no participant rows
+    data = presence.participants(meeting_id)
+    if not data:
+        # Nobody connected: only an unknown meeting is worth a query
+        get_object_or_404(Meeting, id=meeting_id)
     
     return JsonResponse({'participants': data})
 
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.9 on 2026-10-18 08:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mobile_cameras', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mobilecamera',
+            name='path_detected',
+            field=models.BooleanField(default=False, help_text='Stream path was confirmed by auto-detection rather than defaulted'),
+        ),
+    ]
@@ -18,6 +18,7 @@ class MobileCamera(models.Model):
     username = models.CharField(max_length=100, blank=True, help_text="Optional authentication username")
     password = models.CharField(max_length=100, blank=True, help_text="Optional authentication password")
     stream_path = models.CharField(max_length=200, default='/video', help_text="e.g., /video for IP Webcam, /mjpegfeed for DroidCam")
+    path_detected = models.BooleanField(default=False, help_text="Stream path was confirmed by auto-detection rather than defaulted")
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -0,0 +1,113 @@
+"""Stream path auto-detection for mobile camera apps"""
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.auth import HTTPBasicAuth
+
+logger = logging.getLogger('mobile_cameras')
+
+COMMON_PATHS = [
+    '/video',           # DroidCam and IP Webcam both support this
+    '/mjpegfeed',       # DroidCam alternative (but /video works better)
+    '/videofeed',       # Alternative
+    '/cam_1.mjpg',      # Some apps
+    '/stream',          # Generic
+    '/video.mjpg',      # MJPEG format
+    '/video.cgi',       # CGI format
+    '/',                # Root path
+]
+
+# Tried before the common order for a camera type until real successes exist
+TYPE_DEFAULT_PATHS = {
+    'ip_webcam': ['/video'],
+    'droidcam': ['/video', '/mjpegfeed'],
+}
+
+PROBE_TIMEOUT = (2, 3)
+SNIFF_BYTES = 2048
+
+
+def stream_url(ip, port, username, password, path):
+    if username and password:
+        return f"http://{username}:{password}@{ip}:{port}{path}"
+    return f"http://{ip}:{port}{path}"
+
+
+def looks_like_stream(response):
+    """True for a multipart/image response, or a body that starts like one.
+
+    Some apps send a generic or missing Content-Type, so the first bytes are
+    checked for a JPEG start marker or a multipart boundary as a fallback.
+    """
+    if response.status_code != 200:
+        return False
+    content_type = response.headers.get('Content-Type', '').lower()
+    if 'image' in content_type or 'video' in content_type or 'multipart' in content_type:
+        return True
+    head = next(response.iter_content(chunk_size=SNIFF_BYTES), b'')
+    return b'\xff\xd8' in head or head.lstrip().startswith(b'--')
+
+
+def probe_path(ip, port, username, password, path):
+    """Return the stream URL if ``path`` serves video, else None. Always closes the response."""
+    url = stream_url(ip, port, username, password, path)
+    auth = HTTPBasicAuth(username, password) if username and password else None
+    try:
+        with requests.get(url, timeout=PROBE_TIMEOUT, stream=True, auth=auth) as response:
+            return url if looks_like_stream(response) else None
+    except requests.exceptions.RequestException:
+        return None
+
+
+def ordered_paths(camera_type):
+    """Candidate paths for ``camera_type``, most successful for that type first.
+
+    Past successes are the detected stream paths of cameras already saved
+    with this type, so the ordering survives restarts without extra storage.
+    Cameras saved with a fallback path after detection failed do not count.
+    """
+    from .models import MobileCamera
+
+    learned = Counter(
+        MobileCamera.objects.filter(camera_type=camera_type, path_detected=True)
+        .values_list('stream_path', flat=True)
+    )
+    seeded = TYPE_DEFAULT_PATHS.get(camera_type, [])
+    candidates = list(dict.fromkeys(seeded + COMMON_PATHS + list(learned)))
+    # Stable sort keeps the seeded/common order among equally successful paths
+    return sorted(candidates, key=lambda path: -learned[path])
+
+
+def detect_stream_path(ip, port, username, password, camera_type=None):
+    """Find the working stream path; returns (path, url) or (None, None).
+
+    The best-known path for the camera type is tried alone first, since many
+    phone apps serve a single client and usually match it. The remaining
+    paths are then probed concurrently and the first valid one wins.
+    """
+    paths = ordered_paths(camera_type)
+    first, rest = paths[0], paths[1:]
+    url = probe_path(ip, port, username, password, first)
+    if url:
+        return first, url
+
+    found = threading.Event()
+
+    def probe(path):
+        if found.is_set():
+            return path, None
+        return path, probe_path(ip, port, username, password, path)
+
+    executor = ThreadPoolExecutor(max_workers=len(rest), thread_name_prefix='mobile-probe')
+    try:
+        for future in as_completed([executor.submit(probe, path) for path in rest]):
+            path, url = future.result()
+            if url:
+                found.set()
+                return path, url
+        return None, None
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -1,9 +1,13 @@
+import asyncio
 import logging
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.http import StreamingHttpResponse, JsonResponse
 from django.contrib.auth.models import User
 from .models import MobileCamera, MobileCameraPermission
+from .probing import detect_stream_path
+from cameras.shared_frames import shared_feed
+from cameras.upstream import upstream_pool
 
 logger = logging.getLogger('mobile_cameras')
 
@@ -51,40 +55,9 @@ def mobile_camera_dashboard(request):
     return render(request, 'mobile_cameras/dashboard.html', context)
 
 
-def test_mobile_camera_paths(ip, port, username, password):
+def test_mobile_camera_paths(ip, port, username, password, camera_type=None):
     """Test common mobile camera paths to find the working one"""
-    import requests
-    from requests.auth import HTTPBasicAuth
-    
-    common_paths = [
-        '/video',           # DroidCam and IP Webcam both support this
-        '/mjpegfeed',       # DroidCam alternative (but /video works better)
-        '/videofeed',       # Alternative
-        '/cam_1.mjpg',      # Some apps
-        '/stream',          # Generic
-        '/video.mjpg',      # MJPEG format
-        '/video.cgi',       # CGI format
-        '/',                # Root path
-    ]
-    
-    for path in common_paths:
-        if username and password:
-            url = f"http://{username}:{password}@{ip}:{port}{path}"
-            auth = HTTPBasicAuth(username, password)
-        else:
-            url = f"http://{ip}:{port}{path}"
-            auth = None
-        
-        try:
-            response = requests.get(url, timeout=3, stream=True, auth=auth)
-            if response.status_code == 200:
-                content_type = response.headers.get('Content-Type', '')
-                if 'image' in content_type or 'video' in content_type or 'multipart' in content_type:
-                    return path, url
-        except Exception:
-            continue
-    
-    return None, None
+    return detect_stream_path(ip, port, username, password, camera_type)
 
 
 def parse_camera_url(url):
@@ -163,7 +136,7 @@ def add_mobile_camera(request):
             password = request.POST.get('password', '')
         
         # ALWAYS auto-detect the path
-        detected_path, detected_url = test_mobile_camera_paths(ip_address, port, username, password)
+        detected_path, detected_url = test_mobile_camera_paths(ip_address, port, username, password, camera_type)
         
         if detected_path:
             stream_path = detected_path
@@ -183,6 +156,7 @@ def add_mobile_camera(request):
             username=username,
             password=password,
             stream_path=stream_path,
+            path_detected=bool(detected_path),
             is_active=True
         )
         return redirect('mobile_cameras:dashboard')
@@ -209,33 +183,21 @@ def mobile_camera_feed(request, mobile_camera_id):
     if not can_view_mobile_camera(request.user, mobile_camera):
         return JsonResponse({'error': 'You do not have permission to view this camera'}, status=403)
     
-    import requests
-    
-    def generate_frames():
+    async def generate_frames():
         """Proxy frames from camera service"""
         try:
-            camera_service_url = f'http://localhost:8001/api/mobile-cameras/{mobile_camera_id}/feed/'
-            response = requests.get(camera_service_url, stream=True, timeout=30)
-            
-            for chunk in response.iter_content(chunk_size=1024):
-                if chunk:
-                    yield chunk
-                    
-        except requests.exceptions.ConnectionError:
-            logger.error(f"Camera service not running on port 8001")
-            error_msg = (
-                b'--frame\r\n'
-                b'Content-Type: text/plain\r\n\r\n'
-                b'ERROR: Camera service not running on port 8001.\r\n'
-            )
-            yield error_msg
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error proxying mobile camera {mobile_camera_id}: {e}")
-        except GeneratorExit:
+            # Requested rendition (?quality= / ?width=) and per-viewer ?fps=
+            params = {key: request.GET[key] for key in ('quality', 'width', 'fps') if key in request.GET}
+            async for part in upstream_pool.aiter_feed('mobile', mobile_camera_id, params):
+                yield part
+        except (GeneratorExit, asyncio.CancelledError):
             logger.info(f"Client disconnected from mobile camera {mobile_camera_id}")
+            raise
 
+    # Read frames straight from the camera service's shared memory when possible
+    frames = shared_feed('mobile', mobile_camera_id, request.GET) or generate_frames()
     response = StreamingHttpResponse(
-        generate_frames(),
+        frames,
         content_type='multipart/x-mixed-replace; boundary=frame'
     )
     response['Cache-Control'] = 'no-cache'
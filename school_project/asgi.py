@@ -11,12 +11,18 @@ import os
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'school_project.settings')
 
 from django.core.asgi import get_asgi_application
+
+# Set up Django before the consumers import models
+django_asgi_app = get_asgi_application()
+
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
+from cameras.asgi_streaming import DisconnectCancellingApp
 from meetings.routing import websocket_urlpatterns
 
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    # Camera feeds stream until the viewer disconnects
+    "http": DisconnectCancellingApp(django_asgi_app),
     "websocket": AuthMiddlewareStack(
         URLRouter(
             websocket_urlpatterns
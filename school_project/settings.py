@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -101,11 +102,40 @@ TEMPLATES = [
 WSGI_APPLICATION = 'school_project.wsgi.application'
 ASGI_APPLICATION = 'school_project.asgi.application'
 
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer'
+# Meetings live in one process with the in-memory layer. Set REDIS_URL (e.g.
+# redis://localhost:6379/0) to route groups and per-peer channels through
+# Redis instead, so a meeting can span any number of daphne workers behind a
+# plain, non-sticky load balancer.
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [{
+                    'address': REDIS_URL,
+                    # redis-py fails a command outright once its pool is full,
+                    # so leave room for a join storm's concurrent sends
+                    'max_connections': int(os.environ.get('CHANNEL_LAYER_MAX_CONNECTIONS', 1000)),
+                    # Receives block in BZPOPMIN for 5 s; redis-py's own 5 s
+                    # socket timeout would kill the consumer (close 1011)
+                    # whenever Redis answers them a little late
+                    'socket_timeout': 30,
+                }],
+                'prefix': os.environ.get('CHANNEL_LAYER_PREFIX', 'asgi'),
+                # Messages buffered per channel; a 100-student join storm
+                # queues well over the default 100
+                'capacity': int(os.environ.get('CHANNEL_LAYER_CAPACITY', 1500)),
+            },
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer'
+        }
     }
-}
 
 
 # Database
@@ -168,6 +198,24 @@ LOGOUT_REDIRECT_URL = 'login'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Camera service on this host. Feeds are read from its shared-memory frame
+# exports when CAMERA_SHARED_FRAMES is on; the HTTP proxy is the fallback
+CAMERA_SERVICE_URL = 'http://localhost:8001'
+CAMERA_SHARED_FRAMES = True
+
+# Seconds a proxied camera snapshot is reused before asking the camera service again
+CAMERA_SNAPSHOT_TTL = 1
+
+# Seconds between background health rounds (camera service + a TCP check per camera)
+CAMERA_HEALTH_INTERVAL = 10
+
+# Server-side forwarding for large meetings (meetings/sfu.py, needs aiortc).
+# Off by default. When on, meetings with more than MEETING_SFU_THRESHOLD
+# participants leave the peer-to-peer mesh. Only used with the in-memory
+# channel layer: SFU rooms live in one process.
+MEETING_SFU_ENABLED = os.environ.get('MEETING_SFU_ENABLED', '') == '1'
+MEETING_SFU_THRESHOLD = 8
+
 # Logging configuration
 LOGGING = {
     'version': 1,
@@ -190,6 +238,11 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'meetings': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
         'django': {
             'handlers': ['console'],
             'level': 'INFO',